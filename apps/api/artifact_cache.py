@@ -0,0 +1,204 @@
+"""Memoized generation of output artifacts.
+
+An artifact (output.pdf, result.pdf, ...) is recorded in the job's
+artifacts.json together with a hash of every input that produced it. A
+request whose inputs hash to the recorded key gets the existing file back
+without rendering. Identical requests that arrive while a render is running
+wait for that render instead of starting their own; requests with different
+keys for the same file name take turns, so neither overwrites the other's
+file or records its key against the other's output.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import weakref
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_MANIFEST = "artifacts.json"
+# Bump when generation changes in a way that invalidates existing artifacts
+ARTIFACT_CACHE_VERSION = 1
+
+# (path, mtime_ns, size) -> sha256, so unchanged assets are hashed once per process
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+_inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+# (job_dir, name) -> lock held while that file is produced and recorded
+_name_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+MD_ASSET_REF_RE = re.compile(r"""(?:\./)?md_assets/([^)\s"']+)""")
+
+
+def file_hash(path: Optional[Path]) -> Optional[str]:
+    """SHA-256 of a file's content, or None if it does not exist."""
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    memo_key = (str(path), st.st_mtime_ns, st.st_size)
+    digest = _file_hashes.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _file_hashes[memo_key] = digest
+    return digest
+
+
+def files_hash(paths: Iterable[Path]) -> Dict[str, Optional[str]]:
+    """Content hashes of several files keyed by file name."""
+    return {Path(p).name: file_hash(Path(p)) for p in sorted(paths, key=str)}
+
+
+def referenced_assets(markdown: str, assets_dir: Path) -> Dict[str, Optional[str]]:
+    """Content hashes of the md_assets files a markdown document references."""
+    names = set(MD_ASSET_REF_RE.findall(markdown))
+    return {name: file_hash(assets_dir / name) for name in sorted(names)}
+
+
+def renderer_versions() -> Dict[str, Any]:
+    """Versions of everything that renders artifacts."""
+    versions = {"artifact_cache": ARTIFACT_CACHE_VERSION, "pymupdf": fitz.VersionBind}
+    try:
+        from importlib.metadata import version
+        versions["playwright"] = version("playwright")
+    except Exception:
+        versions["playwright"] = None
+    return versions
+
+
+def artifact_key(kind: str, **inputs: Any) -> str:
+    """
+    Hash of an artifact's kind, inputs and renderer versions.
+
+    Args:
+        kind: What is generated (e.g. "generate", "pdf-from-markdown")
+        **inputs: Content hashes and parameters that change the output
+
+    Returns:
+        Hex digest identifying the artifact
+    """
+    payload = {"kind": kind, "inputs": inputs, "versions": renderer_versions()}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ArtifactManifest:
+    """Per-job artifacts.json: artifact name -> {key, size, sha256, created_at, meta}."""
+
+    def __init__(self, job_dir: Path):
+        self.job_dir = Path(job_dir)
+        self.path = self.job_dir / ARTIFACT_MANIFEST
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded entry of artifact `name`, if any."""
+        return self._load().get(name)
+
+    def lookup(self, name: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored meta if artifact `name` exists and was made from `key`.
+
+        The file must still have the recorded size and content hash (hashes
+        are memoized per mtime, so an unchanged file is not re-read).
+        """
+        entry = self.entry(name)
+        if not entry or entry.get("key") != key:
+            return None
+        path = self.job_dir / name
+        try:
+            if path.stat().st_size != entry.get("size"):
+                return None
+        except OSError:
+            return None
+        if entry.get("sha256") is not None and file_hash(path) != entry["sha256"]:
+            return None
+        return entry.get("meta", {})
+
+    def record(self, name: str, key: str, meta: Dict[str, Any]) -> None:
+        """Record that artifact `name` was generated from `key`."""
+        try:
+            entries = self._load()
+            entries[name] = {
+                "key": key,
+                "size": (self.job_dir / name).stat().st_size,
+                "sha256": file_hash(self.job_dir / name),
+                "created_at": time.time(),
+                "meta": meta,
+            }
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2, default=str)
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Failed to record artifact {name}: {e}")
+
+
+async def memoized(
+    job_dir: Path,
+    name: str,
+    key: str,
+    produce: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Return a cached artifact or generate it once.
+
+    Args:
+        job_dir: Job directory holding the artifact
+        name: Artifact file name inside job_dir
+        key: artifact_key of the request
+        produce: Coroutine that writes job_dir/name and returns meta for the response
+
+    Returns:
+        Tuple of (meta, cache status: "hit", "miss" or "coalesced")
+    """
+    manifest = ArtifactManifest(job_dir)
+    meta = manifest.lookup(name, key)
+    if meta is not None:
+        logger.info(f"Artifact cache hit: {job_dir.name}/{name}")
+        return meta, "hit"
+
+    inflight_key = (str(job_dir), name, key)
+    future = _inflight.get(inflight_key)
+    if future is not None:
+        logger.info(f"Joining in-flight render of {job_dir.name}/{name}")
+        return await asyncio.shield(future), "coalesced"
+
+    async def run() -> Dict[str, Any]:
+        lock_key = (str(job_dir), name)
+        lock = _name_locks.get(lock_key)
+        if lock is None:
+            lock = _name_locks[lock_key] = asyncio.Lock()
+        # One producer per file name at a time: a request with another key
+        # would overwrite the file and could record its key against our output
+        async with lock:
+            cached = manifest.lookup(name, key)
+            if cached is not None:
+                return cached
+            result = await produce()
+            manifest.record(name, key, result)
+            return result
+
+    # Runs to completion even if the requester disconnects, so waiters still get it
+    future = asyncio.ensure_future(run())
+    _inflight[inflight_key] = future
+    future.add_done_callback(lambda _: _inflight.pop(inflight_key, None))
+    return await asyncio.shield(future), "miss"
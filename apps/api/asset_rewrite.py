@@ -0,0 +1,86 @@
+"""Single-pass rewriting of md_assets references in markdown and HTML.
+
+Each document is tokenized once by one combined regex and emitted piece by
+piece, so the cost is linear in the document size however many images it
+has. The markdown pass replaces OCR-annotated images with overlay
+containers; the HTML pass points every md_assets src/href at the asset
+API and can wrap <img> tags (with their overlays) in the same walk.
+"""
+
+import re
+from typing import Callable, Iterator, Optional
+
+# ![alt](md_assets/name) or ![alt](./md_assets/name)
+MD_ASSET_IMAGE_RE = re.compile(r"!\[[^\]\n]*\]\((?:\./)?md_assets/([^)\s]+)\)")
+# A whole <img> tag, or any other src=/href= attribute pointing into md_assets
+HTML_ASSET_RE = re.compile(r"""<img\b[^>]*>|\b(src|href)=(["'])(?:\./)?md_assets/""", re.I)
+IMG_SRC_RE = re.compile(r"""\bsrc=(["'])(?:\./)?md_assets/([^"']+)\1""", re.I)
+
+# (image name) -> replacement markup, or None to keep the image as is
+MarkdownImageRewrite = Callable[[str], Optional[str]]
+# (image name, <img> tag with rewritten src) -> replacement markup, or None to keep the tag
+ImgTagRewrite = Callable[[str, str], Optional[str]]
+
+
+def iter_markdown_images(markdown: str, rewrite: MarkdownImageRewrite) -> Iterator[str]:
+    """
+    Yield markdown with md_assets images replaced by rewrite(name).
+
+    Args:
+        markdown: Markdown document
+        rewrite: Returns replacement markup for an image, or None to keep it
+
+    Yields:
+        Consecutive pieces of the rewritten document
+    """
+    pos = 0
+    for match in MD_ASSET_IMAGE_RE.finditer(markdown):
+        replacement = rewrite(match.group(1))
+        if replacement is None:
+            continue
+        yield markdown[pos:match.start()]
+        yield replacement
+        pos = match.end()
+    yield markdown[pos:]
+
+
+def iter_html_assets(html: str, prefix: str, wrap: Optional[ImgTagRewrite] = None) -> Iterator[str]:
+    """
+    Yield HTML with md_assets URLs rewritten to prefix and <img> tags optionally wrapped.
+
+    Args:
+        html: HTML document
+        prefix: Replacement for the md_assets/ (or ./md_assets/) URL prefix
+        wrap: Called for every <img> showing an md_assets file
+
+    Yields:
+        Consecutive pieces of the rewritten document
+    """
+    pos = 0
+    for match in HTML_ASSET_RE.finditer(html):
+        yield html[pos:match.start()]
+        pos = match.end()
+        if match.group(1):
+            yield f"{match.group(1)}={match.group(2)}{prefix}"
+            continue
+
+        tag = match.group(0)
+        src = IMG_SRC_RE.search(tag)
+        if src is None:
+            yield tag
+            continue
+        quote, image_name = src.group(1), src.group(2)
+        tag = f"{tag[:src.start()]}src={quote}{prefix}{image_name}{quote}{tag[src.end():]}"
+        replacement = wrap(image_name, tag) if wrap is not None else None
+        yield tag if replacement is None else replacement
+    yield html[pos:]
+
+
+def rewrite_markdown_images(markdown: str, rewrite: MarkdownImageRewrite) -> str:
+    """String form of iter_markdown_images."""
+    return "".join(iter_markdown_images(markdown, rewrite))
+
+
+def rewrite_html_assets(html: str, prefix: str, wrap: Optional[ImgTagRewrite] = None) -> str:
+    """String form of iter_html_assets."""
+    return "".join(iter_html_assets(html, prefix, wrap))
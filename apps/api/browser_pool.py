@@ -0,0 +1,319 @@
+"""Long-lived Chromium pool for PDF rendering.
+
+One browser is launched at app startup and kept running. Renders borrow a
+slot (browser context + page) from the pool instead of starting Playwright
+and Chromium per request. Slots are recycled after a number of renders,
+the browser is relaunched if it crashes, and the number of requests
+waiting for a slot is bounded.
+"""
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    from playwright.async_api import async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_RENDERS = 50
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_ACQUIRE_TIMEOUT = 60.0
+
+# Try different browser launch methods in order of preference
+LAUNCH_METHODS = [
+    ("chromium", {}),
+    ("chromium", {"channel": "chrome"}),
+    ("chromium", {"executable_path": "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"}),
+    ("chromium", {"executable_path": "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"})
+]
+
+# Add safe arguments for macOS compatibility
+LAUNCH_ARGS = {
+    "headless": True,
+    "args": [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-gpu"
+    ]
+}
+
+
+class BrowserPoolBusy(RuntimeError):
+    """Raised when the wait queue is full or no slot frees up in time."""
+
+
+def launch_error_hint(error: Exception) -> str:
+    """Human-readable hint for a failed browser launch."""
+    error_details = str(error).lower()
+    if "executable doesn't exist" in error_details:
+        return "Install Playwright Chromium: make api-playwright-install"
+    elif "browser closed" in error_details:
+        return "Browser crashed unexpectedly. Check system resources and try again."
+    elif "permission denied" in error_details:
+        return "Permission issue with browser executable. Check file permissions."
+    elif "sandbox" in error_details and "signal 6" in error_details:
+        return "Sandbox crash. Try installing fresh Playwright browsers or use system Chrome."
+    return "Unknown browser launch error. Check logs for details."
+
+
+async def launch_browser(playwright) -> Any:
+    """
+    Launch Chromium, trying LAUNCH_METHODS in order.
+
+    Args:
+        playwright: Started Playwright instance
+
+    Returns:
+        Connected Browser
+
+    Raises:
+        RuntimeError: If every launch method fails
+    """
+    last_exception = None
+    for browser_type, kwargs in LAUNCH_METHODS:
+        try:
+            logger.info(f"Attempting to launch {browser_type} with args: {kwargs}")
+            launch_args = {**LAUNCH_ARGS, **kwargs}
+            return await getattr(playwright, browser_type).launch(**launch_args)
+        except Exception as e:
+            error_msg = str(e).lower()
+            logger.warning(f"Failed to launch {browser_type} with {kwargs}: {e}")
+            last_exception = e
+
+            # Early exit for certain fatal errors
+            if "permission denied" in error_msg or "access denied" in error_msg:
+                raise RuntimeError(
+                    f"Permission denied when launching browser. "
+                    f"Try: chmod +x /Applications/Google\\ Chrome.app/Contents/MacOS/Google\\ Chrome"
+                ) from e
+            elif "sandbox" in error_msg and ("signal 6" in error_msg or "sigsegv" in error_msg):
+                raise RuntimeError(
+                    f"Sandbox error occurred. "
+                    f"Try: make api-playwright-install or use system Chrome"
+                ) from e
+
+    if last_exception:
+        raise RuntimeError(
+            f"All browser launch attempts failed. Last error: {last_exception}. "
+            f"Debug hint: {launch_error_hint(last_exception)}"
+        ) from last_exception
+    raise RuntimeError("Failed to generate PDF: No working browser found")
+
+
+class _Slot:
+    """A browser context with one page, reused across renders."""
+
+    def __init__(self, context, page, generation: int):
+        self.context = context
+        self.page = page
+        self.generation = generation
+        self.renders = 0
+        self.crashed = False
+        page.on("crash", lambda *_: setattr(self, "crashed", True))
+
+    async def close(self) -> None:
+        try:
+            await self.context.close()
+        except Exception:
+            # Context may already be gone with a crashed browser
+            pass
+
+
+class BrowserPool:
+    """
+    Pool of Chromium pages backed by a single long-lived browser.
+
+    Usage:
+        async with browser_pool.page() as page:
+            await page.set_content(html)
+            pdf_bytes = await page.pdf()
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_renders: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+        launcher: Optional[Callable[[], Awaitable[Any]]] = None
+    ):
+        """
+        Args:
+            size: Number of contexts/pages (default: BROWSER_POOL_SIZE env or 2)
+            max_renders: Renders before a context is recycled (default: BROWSER_POOL_MAX_RENDERS or 50)
+            max_queue: Requests allowed to wait for a slot (default: BROWSER_POOL_MAX_QUEUE or 16)
+            acquire_timeout: Seconds to wait for a slot (default: BROWSER_POOL_ACQUIRE_TIMEOUT or 60)
+            launcher: Coroutine returning a Browser (default: Playwright Chromium with fallbacks)
+        """
+        self.size = size or int(os.getenv("BROWSER_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
+        self.max_renders = max_renders or int(os.getenv("BROWSER_POOL_MAX_RENDERS", str(DEFAULT_MAX_RENDERS)))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("BROWSER_POOL_MAX_QUEUE", str(DEFAULT_MAX_QUEUE)))
+        self.acquire_timeout = acquire_timeout or float(os.getenv("BROWSER_POOL_ACQUIRE_TIMEOUT", str(DEFAULT_ACQUIRE_TIMEOUT)))
+        self._launcher = launcher
+        self._playwright = None
+        self._browser = None
+        self._generation = 0
+        self._idle: Optional[asyncio.Queue] = None
+        self._restart_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self.started = False
+        self.stats = {"renders": 0, "recycled": 0, "restarts": 0, "rejected": 0}
+
+    async def _launch(self) -> Any:
+        if self._launcher is not None:
+            return await self._launcher()
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await launch_browser(self._playwright)
+
+    async def start(self) -> None:
+        """Launch the browser and open all slots. Raises RuntimeError if no browser can start."""
+        if self.started:
+            return
+        if self._launcher is None and not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError(
+                "Playwright not installed. Run: pip install playwright && python -m playwright install chromium"
+            )
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        self._restart_lock = asyncio.Lock()
+        try:
+            self._browser = await self._launch()
+            self._generation += 1
+            for _ in range(self.size):
+                self._idle.put_nowait(await self._new_slot())
+        except Exception:
+            await self.stop()
+            raise
+        self.started = True
+        logger.info(f"Browser pool started: {self.size} pages, recycle after {self.max_renders} renders")
+
+    async def stop(self) -> None:
+        """Close all slots, the browser and Playwright."""
+        self.started = False
+        if self._idle is not None:
+            while not self._idle.empty():
+                await self._idle.get_nowait().close()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Browser pool stopped")
+
+    def usable(self) -> bool:
+        """True if the pool is started and can be used from the current event loop."""
+        if not self.started:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _browser_alive(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _ensure_browser(self) -> None:
+        """Relaunch the browser if it crashed or was disconnected."""
+        if self._browser_alive():
+            return
+        async with self._restart_lock:
+            if self._browser_alive():
+                return
+            logger.warning("Browser not connected, relaunching")
+            self._browser = await self._launch()
+            # Slots from the old browser are replaced when next used
+            self._generation += 1
+            self.stats["restarts"] += 1
+
+    async def _new_slot(self) -> _Slot:
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        return _Slot(context, page, self._generation)
+
+    async def _healthy_slot(self, slot: _Slot) -> _Slot:
+        """Return slot if usable, otherwise a fresh one (relaunching the browser if needed)."""
+        await self._ensure_browser()
+        if slot.generation == self._generation and not slot.crashed and not slot.page.is_closed():
+            return slot
+        await slot.close()
+        return await self._new_slot()
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a page for one render.
+
+        Raises:
+            BrowserPoolBusy: If too many requests are already waiting or the wait times out
+        """
+        if not self._idle.empty():
+            slot = self._idle.get_nowait()
+        else:
+            if self._waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise BrowserPoolBusy(f"Browser pool busy: {self._waiting} requests already waiting")
+            self._waiting += 1
+            try:
+                slot = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                raise BrowserPoolBusy(f"No browser page available within {self.acquire_timeout:.0f}s")
+            finally:
+                self._waiting -= 1
+
+        try:
+            slot = await self._healthy_slot(slot)
+        except Exception:
+            # Keep the pool size constant: hand the stale slot back, it is rebuilt on next use
+            self._idle.put_nowait(slot)
+            raise
+
+        try:
+            yield slot.page
+        finally:
+            slot.renders += 1
+            self.stats["renders"] += 1
+            if slot.renders >= self.max_renders:
+                # Recycle the context to cap memory growth in long-lived pages
+                self.stats["recycled"] += 1
+                await slot.close()
+                try:
+                    slot = await self._new_slot()
+                except Exception as e:
+                    logger.warning(f"Failed to recycle browser context: {e}")
+                    slot.generation = -1  # Rebuilt on next acquire
+            self._idle.put_nowait(slot)
+
+    def health(self) -> Dict[str, Any]:
+        """Pool state for the health endpoint."""
+        return {
+            "started": self.started,
+            "browser_connected": self._browser_alive(),
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "waiting": self._waiting,
+            **self.stats
+        }
+
+
+# Global pool instance, started by the app on startup
+browser_pool = BrowserPool()
+
+
+def pool_enabled() -> bool:
+    """Browser pool can be disabled with BROWSER_POOL_ENABLED=0."""
+    return os.getenv("BROWSER_POOL_ENABLED", "1").lower() not in ("0", "false", "no")
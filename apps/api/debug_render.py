@@ -2,9 +2,11 @@
 
 from pathlib import Path
 from typing import Dict, Any
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageDraw, ImageFont
 import json
 
+from raster_cache import load_raster
+
 
 def render_debug_page_png(job_dir: Path, vision: Dict[str, Any], page_num: int) -> Path:
     """
@@ -32,8 +34,8 @@ def render_debug_page_png(job_dir: Path, vision: Dict[str, Any], page_num: int)
     if not input_image_path.exists():
         raise FileNotFoundError(f"Input image not found: {input_image_path}")
     
-    # Load base image
-    base_image = Image.open(input_image_path)
+    # Load base image from the shared raster (decoded once per page)
+    base_image = load_raster(input_image_path).to_pil()
     draw = ImageDraw.Draw(base_image)
     
     # Try to get a font (fallback to default if not available)
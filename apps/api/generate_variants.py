@@ -0,0 +1,302 @@
+"""Output variants of /api/generate and batch generation.
+
+A variant is one output of a processed job: the HTML PDF, an overlay PDF
+for a given scope/background, or the debug page images. The single
+/api/generate endpoint builds one variant; /api/generate/{job_id}/batch
+builds several from one load of the job data. Page rasters are decoded
+once into the shared raster cache before the variants run, so overlay and
+debug renders (and overlay pool workers, via shared memory) reuse them.
+"""
+
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from artifact_cache import artifact_key, file_hash, files_hash, memoized
+from debug_render import render_all_debug_pages
+from html_render import write_vision_html
+from pdf_generate import render_html_file, resolve_engine
+from pdf_optimize import optimize_pdf_file, validate_optimize_options
+from pdf_overlay_generate import generate_overlay_pdf, OVERLAY_BACKGROUNDS
+from raster_cache import load_raster, raster_cache
+
+logger = logging.getLogger(__name__)
+
+VARIANT_MODES = ("html", "overlay", "debug")
+OVERLAY_SCOPES = ("headings", "safe", "all")
+MAX_BATCH_VARIANTS = 16
+
+
+class MissingPageImages(FileNotFoundError):
+    """Raised when a variant needs rendered page images that do not exist."""
+
+
+def normalize_variant(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a variant spec and fill in defaults.
+
+    Args:
+        spec: {"mode": "html"|"overlay"|"debug", plus the /api/generate
+            parameters that apply to the mode}
+
+    Returns:
+        Complete variant dict
+
+    Raises:
+        ValueError: If the mode or a parameter is invalid
+    """
+    mode = spec.get("mode", "html")
+    if mode not in VARIANT_MODES:
+        raise ValueError(f"Invalid mode: {mode}. Must be one of: {', '.join(VARIANT_MODES)}")
+    variant: Dict[str, Any] = {"mode": mode}
+    if mode == "debug":
+        return variant
+
+    if mode == "html":
+        variant["engine"] = resolve_engine(spec.get("engine"))
+    else:
+        scope = spec.get("overlay_scope", "headings")
+        if scope not in OVERLAY_SCOPES:
+            raise ValueError(f"Invalid overlay_scope: {scope}. Must be one of: {', '.join(OVERLAY_SCOPES)}")
+        background = spec.get("background", "raster")
+        if background not in OVERLAY_BACKGROUNDS:
+            raise ValueError(f"Invalid background: {background}. Must be one of: {', '.join(OVERLAY_BACKGROUNDS)}")
+        variant.update(
+            overlay_scope=scope,
+            background=background,
+            debug_overlay=bool(spec.get("debug_overlay", False))
+        )
+    optimize_dpi = spec.get("optimize_dpi")
+    if optimize_dpi is not None and (isinstance(optimize_dpi, bool) or not isinstance(optimize_dpi, int)):
+        raise ValueError(f"Invalid optimize_dpi: {optimize_dpi!r}. Must be an integer")
+    variant.update(
+        optimize=bool(spec.get("optimize", False)),
+        optimize_dpi=optimize_dpi,
+        linearize=bool(spec.get("linearize", False))
+    )
+    validate_optimize_options(variant["optimize"], variant["optimize_dpi"], variant["linearize"])
+    return variant
+
+
+def variant_output_name(variant: Dict[str, Any], batch: bool = False) -> str:
+    """
+    File name of a variant's artifact inside the job directory.
+
+    /api/generate keeps its historical names; batch overlay variants carry
+    scope and background in the name so they do not overwrite each other.
+    """
+    mode = variant["mode"]
+    if mode == "html":
+        return "output.pdf"
+    if mode == "debug":
+        return "pages/debug_page_*.png"
+    suffix = "_debug" if variant["debug_overlay"] else ""
+    if batch:
+        return f"output_overlay_{variant['overlay_scope']}_{variant['background']}{suffix}.pdf"
+    return f"output_overlay{suffix}.pdf"
+
+
+def variant_cache_key(
+    variant: Dict[str, Any],
+    job_dir: Path,
+    job_data: Dict[str, Any],
+    source_file: Path,
+    title: str
+) -> str:
+    """Artifact key of a PDF variant: everything that changes the output."""
+    pages = files_hash((job_dir / "pages").glob("page_*.png"))
+    if variant["mode"] == "html":
+        inputs = {"engine": variant["engine"], "pages": pages}
+    else:
+        input_path = Path(job_data["input_path"]) if job_data.get("input_path") else None
+        inputs = {
+            "overlay_scope": variant["overlay_scope"],
+            "background": variant["background"],
+            "dpi": job_data.get("dpi", 144),
+            "pages": pages if variant["background"] == "raster" else None,
+            "input_pdf": file_hash(input_path) if variant["background"] == "vector" else None
+        }
+    return artifact_key(
+        "generate",
+        source=file_hash(source_file),
+        title=title,
+        mode=variant["mode"],
+        optimize=[variant["optimize"], variant["optimize_dpi"], variant["linearize"]],
+        **inputs
+    )
+
+
+async def render_variant(
+    variant: Dict[str, Any],
+    job_dir: Path,
+    job_data: Dict[str, Any],
+    vision_data: Dict[str, Any],
+    title: str,
+    output_name: str,
+    report_path: Optional[Path] = None
+) -> Dict[str, Any]:
+    """
+    Build one PDF variant into job_dir/output_name.
+
+    Args:
+        variant: Normalized variant (see normalize_variant)
+        job_dir: Job directory
+        job_data: Loaded job.json
+        vision_data: Loaded edited.json / vision.json
+        title: Document title
+        output_name: Artifact file name inside job_dir
+        report_path: Overlay report file (default: job_dir/overlay_report.json)
+
+    Returns:
+        Meta dict with engine and optimization report
+
+    Raises:
+        MissingPageImages: If HTML mode finds no rendered page images
+    """
+    output_pdf_path = job_dir / output_name
+    engine_used = None
+    if variant["mode"] == "html":
+        if not (job_dir / "pages" / "page_1.png").exists():
+            raise MissingPageImages("Run /api/process first (missing rendered page images)")
+
+        # Stream HTML to disk with page images linked from pages/
+        render_html_path = job_dir / "render.html"
+        linked_images = write_vision_html(render_html_path, vision_data, title, job_dir)
+        if linked_images == 0:
+            raise RuntimeError("HTML render missing page images; check pages/page_*.png exists")
+        logger.info(f"render.html written with {linked_images} linked page images")
+
+        # Chromium reads the PNGs from disk, Story lays them out itself
+        pdf_bytes, engine_used = await render_html_file(render_html_path, engine=variant["engine"])
+    else:
+        pdf_bytes = await asyncio.to_thread(
+            generate_overlay_pdf,
+            job_dir,
+            vision_data,
+            job_data.get("dpi", 144),
+            debug=variant["debug_overlay"],
+            overlay_scope=variant["overlay_scope"],
+            background=variant["background"],
+            input_pdf_path=Path(job_data["input_path"]) if job_data.get("input_path") else None,
+            report_path=report_path
+        )
+
+    with open(output_pdf_path, "wb") as f:
+        f.write(pdf_bytes)
+
+    optimization = None
+    if variant["optimize"]:
+        optimization = await asyncio.to_thread(
+            optimize_pdf_file,
+            output_pdf_path,
+            target_dpi=variant["optimize_dpi"],
+            linearize=variant["linearize"]
+        )
+    # The recipe lets the retention collector drop the file and rebuild it later
+    return {"engine": engine_used, "optimization": optimization, "recipe": {"kind": "generate", "variant": variant}}
+
+
+def preload_page_rasters(job_dir: Path) -> int:
+    """
+    Decode page_N.png files into the shared raster cache, in page order.
+
+    Stops before the cache budget would be exceeded, so preloading never
+    evicts the first pages before they are used; later pages are decoded
+    lazily by the stage that needs them.
+
+    Returns:
+        Number of pages preloaded
+    """
+    pages = sorted((job_dir / "pages").glob("page_*.png"), key=lambda p: int(p.stem.split("_")[1]))
+    used = largest = count = 0
+    for path in pages:
+        if count and used + largest > raster_cache.max_memory_bytes:
+            logger.info(f"Preloaded {count} of {len(pages)} page rasters (raster cache budget reached)")
+            break
+        raster = load_raster(path)
+        size = raster.nbytes + len(raster.png_bytes or b"")
+        used += size
+        largest = max(largest, size)
+        count += 1
+    return count
+
+
+async def _run_variant(
+    variant: Dict[str, Any],
+    job_dir: Path,
+    job_data: Dict[str, Any],
+    vision_data: Dict[str, Any],
+    source_file: Path,
+    title: str
+) -> Dict[str, Any]:
+    """Build one batch variant and describe the result for the manifest."""
+    name = variant_output_name(variant, batch=True)
+    entry: Dict[str, Any] = {**variant, "output": name}
+    started = time.perf_counter()
+    try:
+        if variant["mode"] == "debug":
+            entry["debug_pages"] = await asyncio.to_thread(render_all_debug_pages, job_dir, vision_data)
+            entry["cache"] = None
+        else:
+            key = variant_cache_key(variant, job_dir, job_data, source_file, title)
+            meta, entry["cache"] = await memoized(
+                job_dir, name, key,
+                # Concurrent overlay variants must not share overlay_report.json
+                lambda: render_variant(
+                    variant, job_dir, job_data, vision_data, title, name,
+                    report_path=job_dir / name.replace("output_", "report_").replace(".pdf", ".json")
+                )
+            )
+            entry.update(
+                engine=meta.get("engine"),
+                optimization=meta.get("optimization"),
+                size=(job_dir / name).stat().st_size
+            )
+        entry["status"] = "done"
+    except Exception as e:
+        logger.error(f"Batch variant {name} failed: {e}")
+        entry.update(status="error", error=str(e))
+    entry["duration_ms"] = round((time.perf_counter() - started) * 1000)
+    return entry
+
+
+async def generate_batch(
+    variants: List[Dict[str, Any]],
+    job_dir: Path,
+    job_data: Dict[str, Any],
+    vision_data: Dict[str, Any],
+    source_file: Path,
+    title: str
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Build several variants of a job concurrently from one load of its data.
+
+    Args:
+        variants: Normalized variants (see normalize_variant)
+        job_dir: Job directory
+        job_data: Loaded job.json
+        vision_data: Loaded edited.json / vision.json
+        source_file: File vision_data was read from (part of the artifact keys)
+        title: Document title
+
+    Returns:
+        Tuple of (manifest entries in request order, number of preloaded page rasters)
+
+    Raises:
+        ValueError: If two variants would write the same artifact
+    """
+    names = [variant_output_name(v, batch=True) for v in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Variants write the same output: {', '.join(duplicates)}")
+
+    needs_rasters = any(v["mode"] == "debug" or v.get("background") == "raster" for v in variants)
+    preloaded = await asyncio.to_thread(preload_page_rasters, job_dir) if needs_rasters else 0
+
+    manifest = await asyncio.gather(*(
+        _run_variant(variant, job_dir, job_data, vision_data, source_file, title)
+        for variant in variants
+    ))
+    return list(manifest), preloaded
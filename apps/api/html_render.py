@@ -1,10 +1,22 @@
 """HTML rendering utilities for vision analysis results."""
 
+import re
 import json
 import base64
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterator, Optional, Union
 from pathlib import Path
 
+from asset_rewrite import rewrite_markdown_images, rewrite_html_assets
+from markdown_blocks import markdown_to_html
+
+# How page images are referenced by vision HTML:
+#   none  - no page images
+#   link  - relative pages/page_N.png (HTML must be saved in the job directory)
+#   embed - base64 data URLs (self-contained, large)
+PAGE_IMAGE_MODES = ("none", "link", "embed")
+
+LINKED_PAGE_IMAGE_RE = re.compile(r'src="pages/(page_(\d+)\.png)"')
+
 
 def load_translations(job_dir, image_name):
     """Simple fallback for loading translations"""
@@ -19,21 +31,34 @@ def load_translations(job_dir, image_name):
         return []
 
 
-def vision_to_html(vision: Dict[str, Any], title: str, job_dir: Optional[Path] = None, embed_page_images: bool = False) -> str:
+def _embedded_image_src(img_path: Path) -> str:
+    """Base64 data URL for a PNG file."""
+    img_base64 = base64.b64encode(img_path.read_bytes()).decode("utf-8")
+    return f"data:image/png;base64,{img_base64}"
+
+
+def iter_vision_html(
+    vision: Dict[str, Any],
+    title: str,
+    job_dir: Optional[Path] = None,
+    page_images: str = "none"
+) -> Iterator[str]:
     """
-    Convert vision analysis result to readable HTML.
+    Convert vision analysis result to readable HTML, one chunk per page.
     
     Args:
         vision: Vision analysis dictionary
         title: Document title
-        job_dir: Job directory containing pages/page_N.png files (required if embed_page_images=True)
-        embed_page_images: Whether to embed page PNG images as base64 data URLs
+        job_dir: Job directory containing pages/page_N.png files (required unless page_images="none")
+        page_images: One of PAGE_IMAGE_MODES
         
-    Returns:
-        HTML string ready for PDF generation
+    Yields:
+        HTML chunks; joined they form the complete document
     """
-    if embed_page_images and job_dir is None:
-        raise ValueError("job_dir is required when embed_page_images=True")
+    if page_images not in PAGE_IMAGE_MODES:
+        raise ValueError(f"page_images must be one of {PAGE_IMAGE_MODES}")
+    if page_images != "none" and job_dir is None:
+        raise ValueError(f"job_dir is required when page_images={page_images!r}")
     
     html_parts = [
         "<!DOCTYPE html>",
@@ -118,23 +143,25 @@ def vision_to_html(vision: Dict[str, Any], title: str, job_dir: Optional[Path] =
         "<body>",
         f"    <h1>{title}</h1>",
     ]
+    yield "\n".join(html_parts)
     
     # Process pages
     pages = vision.get("pages", [])
     for i, page in enumerate(pages, 1):
-        html_parts.append(f'    <section class="page">')
+        html_parts = [f'    <section class="page">']
         
-        # Embed page image if requested
-        if embed_page_images and job_dir:
+        # Reference or embed page image if requested
+        if page_images != "none":
             page_img_path = job_dir / "pages" / f"page_{i}.png"
             if page_img_path.exists():
                 try:
-                    with open(page_img_path, "rb") as f:
-                        img_bytes = f.read()
-                        img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-                        html_parts.append(f'        <div class="page-image">')
-                        html_parts.append(f'            <img class="page-img" src="data:image/png;base64,{img_base64}" />')
-                        html_parts.append(f'        </div>')
+                    if page_images == "embed":
+                        img_src = _embedded_image_src(page_img_path)
+                    else:
+                        img_src = f"pages/{page_img_path.name}"
+                    html_parts.append(f'        <div class="page-image">')
+                    html_parts.append(f'            <img class="page-img" src="{img_src}" />')
+                    html_parts.append(f'        </div>')
                 except Exception as e:
                     # Silently fail if image can't be read
                     pass
@@ -165,16 +192,124 @@ def vision_to_html(vision: Dict[str, Any], title: str, job_dir: Optional[Path] =
         
         html_parts.append('        </div>')  # close page-text
         html_parts.append("    </section>")  # close page
+        yield "\n" + "\n".join(html_parts)
     
     # Add footer
-    html_parts.append('    <div class="footer">')
+    html_parts = ['    <div class="footer">']
     html_parts.append("        Generated by PDF Translator")
     html_parts.append("    </div>")
     
     html_parts.append("</body>")
     html_parts.append("</html>")
     
-    return "\n".join(html_parts)
+    yield "\n" + "\n".join(html_parts)
+
+
+def vision_to_html(vision: Dict[str, Any], title: str, job_dir: Optional[Path] = None, embed_page_images: bool = False) -> str:
+    """
+    Convert vision analysis result to readable HTML.
+    
+    Args:
+        vision: Vision analysis dictionary
+        title: Document title
+        job_dir: Job directory containing pages/page_N.png files (required if embed_page_images=True)
+        embed_page_images: Whether to embed page PNG images as base64 data URLs
+        
+    Returns:
+        HTML string ready for PDF generation
+    """
+    if embed_page_images and job_dir is None:
+        raise ValueError("job_dir is required when embed_page_images=True")
+    page_images = "embed" if embed_page_images else "none"
+    return "".join(iter_vision_html(vision, title, job_dir=job_dir, page_images=page_images))
+
+
+def write_vision_html(html_path: Path, vision: Dict[str, Any], title: str, job_dir: Path) -> int:
+    """
+    Stream vision HTML to a file in the job directory, linking page images.
+    
+    Only one page of HTML is held in memory at a time. Render the result with
+    page.goto(file://...) so Chromium loads the PNGs straight from disk.
+    
+    Args:
+        html_path: Output HTML path (inside job_dir, so relative links resolve)
+        vision: Vision analysis dictionary
+        title: Document title
+        job_dir: Job directory containing pages/page_N.png files
+        
+    Returns:
+        Number of page images linked
+    """
+    linked = 0
+    tmp_path = html_path.with_suffix(".html.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for chunk in iter_vision_html(vision, title, job_dir=job_dir, page_images="link"):
+            linked += chunk.count('class="page-img"')
+            f.write(chunk)
+    tmp_path.replace(html_path)
+    return linked
+
+
+def iter_self_contained_html(html_path: Path, job_dir: Path) -> Iterator[str]:
+    """
+    Read HTML written by write_vision_html, inlining linked page images as base64.
+    
+    Used for the downloadable variant; images are encoded one at a time
+    while streaming instead of building the whole document in memory.
+    
+    Args:
+        html_path: HTML file with relative pages/page_N.png links
+        job_dir: Job directory the links are relative to
+        
+    Yields:
+        HTML lines with data URLs in place of page image links
+    """
+    pages_dir = job_dir / "pages"
+    
+    def inline(match):
+        img_path = pages_dir / match.group(1)
+        if not img_path.exists():
+            return match.group(0)
+        return f'src="{_embedded_image_src(img_path)}"'
+    
+    with open(html_path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield LINKED_PAGE_IMAGE_RE.sub(inline, line)
+
+
+def _overlay_container(job_dir: Path, image_name: str, image_data: Dict[str, Any]) -> str:
+    """Image wrapper with white OCR boxes (black text) positioned over it."""
+    # Get image dimensions
+    img_path = job_dir / "md_assets" / image_name
+    if img_path.exists():
+        try:
+            from PIL import Image
+            with Image.open(img_path) as img:
+                img_width, img_height = img.size
+        except:
+            img_width, img_height = 800, 600  # fallback
+    else:
+        img_width, img_height = 800, 600  # fallback
+    
+    # Build overlay HTML with white background + black text
+    overlay_html = ""
+    for box in image_data.get('boxes', []):
+        x = box['x']
+        y = box['y']
+        w = box['w']
+        h = box['h']
+        text = box['text']
+        font_size = box.get('fontSize', box.get('font_size', max(8, min(h * 0.8, 24))))
+        
+        overlay_html += f'''
+<div class="ov" style="left:{x}px;top:{y}px;width:{w}px;height:{h}px;font-size:{font_size}px">
+{text}
+</div>'''
+    
+    return f'''<div class="img-wrap" style="width:{img_width}px;height:{img_height}px">
+  <img class="img" src="md_assets/{image_name}" style="width:{img_width}px;height:{img_height}px" />
+  {overlay_html}
+</div>'''
 
 
 def _escape_html(text: str) -> str:
@@ -188,7 +323,13 @@ def _escape_html(text: str) -> str:
     )
 
 
-async def generate_pdf_from_markdown(markdown_path: Path, output_pdf: Path, variant: int = 1):
+async def generate_pdf_from_markdown(
+    markdown_path: Path,
+    output_pdf: Path,
+    variant: int = 1,
+    engine: Optional[str] = None,
+    chunks: Optional[int] = None
+) -> str:
     """
     Convert Markdown to PDF via HTML + Playwright with OCR text overlays.
     
@@ -196,8 +337,13 @@ async def generate_pdf_from_markdown(markdown_path: Path, output_pdf: Path, vari
         markdown_path: Path to markdown file
         output_pdf: Output PDF path
         variant: Overlay approach (1=Markdown replacement, 2=HTML replacement, 3=Canvas)
+        engine: PDF engine, see pdf_generate.PDF_ENGINES (default: PDF_ENGINE env or "auto")
+        chunks: Render long documents in this many parallel Chromium chunks
+            (default: automatic above CHUNKED_RENDER_MIN_BYTES of HTML)
+        
+    Returns:
+        Engine used ("chromium" or "story")
     """
-    import markdown2
     import os
     import re
     import json
@@ -206,136 +352,57 @@ async def generate_pdf_from_markdown(markdown_path: Path, output_pdf: Path, vari
     # 1) Read markdown content
     markdown_content = markdown_path.read_text(encoding='utf-8')
     
-    # 2) Parse images from markdown to get original image names
-    image_matches = re.findall(r'!\[.*?\]\((.*?)\)', markdown_content)
-    image_names = [img for img in image_matches if img.startswith('md_assets/')]
-    image_names = [img.replace('md_assets/', '') for img in image_names]
-    
-    # 3) Get job directory and job ID
+    # 2) Get job directory and job ID
     job_dir = markdown_path.parent
     job_id = job_dir.name  # Assuming job_dir is jobs/{job_id}
     
-    # 4) Get API base URL
+    # 3) Get API base URL
     api_base = os.getenv("API_BASE_URL", "http://localhost:8000")
     prefix = f'{api_base}/api/md-asset/{job_id}/'
     
-    # 5) Load OCR translations if they exist
+    # 4) Load OCR translations if they exist
     ocr_translations = {}
     try:
         ocr_translations = storage_manager.load_ocr_translations(job_id)
     except Exception as e:
         print(f"Warning: Could not load OCR translations: {e}")
     
-    # 6) Apply variant-specific overlay logic
+    # 5) Apply variant-specific overlay logic
     markdown_with_overlays = markdown_content
     
-    if variant == 1:
-        # VARIANT 1: Markdown replacement before HTML conversion
-        print("Using Variant 1: Markdown replacement")
-        for image_name in image_names:
-            if image_name in ocr_translations:
-                # Get image dimensions
-                img_path = job_dir / "md_assets" / image_name
-                if img_path.exists():
-                    try:
-                        from PIL import Image
-                        with Image.open(img_path) as img:
-                            img_width, img_height = img.size
-                    except:
-                        img_width, img_height = 800, 600  # fallback
-                else:
-                    img_width, img_height = 800, 600  # fallback
-                
-                # Build overlay HTML with white background + black text
-                overlay_html = ""
-                image_data = ocr_translations[image_name]
-                if 'boxes' in image_data:
-                    for box in image_data['boxes']:
-                        x = box['x']
-                        y = box['y']
-                        w = box['w']
-                        h = box['h']
-                        text = box['text']
-                        font_size = box.get('fontSize', box.get('font_size', max(8, min(h * 0.8, 24))))
-                        
-                        overlay_html += f'''
-<div class="ov" style="left:{x}px;top:{y}px;width:{w}px;height:{h}px;font-size:{font_size}px">
-{text}
-</div>'''
-                
-                # Replace with proper container
-                pattern = rf'!\[.*?\]\(md_assets/{re.escape(image_name)}\)'
-                replacement = f'''<div class="img-wrap" style="width:{img_width}px;height:{img_height}px">
-  <img class="img" src="md_assets/{image_name}" style="width:{img_width}px;height:{img_height}px" />
-  {overlay_html}
-</div>'''
-                markdown_with_overlays = re.sub(pattern, replacement, markdown_with_overlays)
-    
-    elif variant == 2:
+    if variant == 2:
         # VARIANT 2: HTML replacement after markdown2 conversion
         print("Using Variant 2: HTML replacement")
         # Do nothing here, handle in HTML section below
-        pass
-    
     elif variant == 3:
         # VARIANT 3: Canvas approach (handled in pdf_generate.py)
         print("Using Variant 3: Canvas approach")
         # Do nothing here, handle in pdf_generate.py
-        pass
-    
     else:
-        # Default behavior (existing logic)
-        for image_name in image_names:
-            # Check if we have OCR data for this image
-            if image_name in ocr_translations:
-                # Get image dimensions
-                img_path = job_dir / "md_assets" / image_name
-                if img_path.exists():
-                    try:
-                        from PIL import Image
-                        with Image.open(img_path) as img:
-                            img_width, img_height = img.size
-                    except:
-                        img_width, img_height = 800, 600  # fallback
-                else:
-                    img_width, img_height = 800, 600  # fallback
-                
-                # Build overlay HTML with white background + black text
-                overlay_html = ""
-                image_data = ocr_translations[image_name]
-                if 'boxes' in image_data:
-                    for box in image_data['boxes']:
-                        x = box['x']
-                        y = box['y']
-                        w = box['w']
-                        h = box['h']
-                        text = box['text']
-                        font_size = box.get('fontSize', box.get('font_size', max(8, min(h * 0.8, 24))))
-                        
-                        overlay_html += f'''
-<div class="ov" style="left:{x}px;top:{y}px;width:{w}px;height:{h}px;font-size:{font_size}px">
-{text}
-</div>'''
-                
-                # Replace with proper container
-                pattern = rf'!\[.*?\]\(md_assets/{re.escape(image_name)}\)'
-                replacement = f'''<div class="img-wrap" style="width:{img_width}px;height:{img_height}px">
-  <img class="img" src="md_assets/{image_name}" style="width:{img_width}px;height:{img_height}px" />
-  {overlay_html}
-</div>'''
-                markdown_with_overlays = re.sub(pattern, replacement, markdown_with_overlays)
+        # VARIANT 1 (and default): Markdown replacement before HTML conversion
+        if variant == 1:
+            print("Using Variant 1: Markdown replacement")
+        
+        def container(image_name):
+            if image_name not in ocr_translations:
+                return None
+            return _overlay_container(job_dir, image_name, ocr_translations[image_name])
+        
+        # One pass over the markdown, whatever the number of annotated images
+        markdown_with_overlays = rewrite_markdown_images(markdown_content, container)
     
-    # 7) Convert markdown with overlays to HTML (extras=['tables'] for GFM tables)
-    html_content = markdown2.markdown(markdown_with_overlays, extras=['tables'])
+    # 6) Convert markdown with overlays to HTML (extras=['tables'] for GFM tables);
+    #    only blocks changed since an earlier call are converted again
+    html_content = markdown_to_html(markdown_with_overlays)
     
-    # 8) Apply variant-specific HTML modifications
+    # 7) Apply variant-specific HTML modifications
     if variant == 2:
         # VARIANT 2: HTML replacement after markdown2
         print("Applying Variant 2 HTML replacement")
         # Do nothing for now, handled in markdown processing above
         pass
     
-    # 9) Create HTML template
+    # 8) Create HTML template
     html_template = '''
 <!DOCTYPE html>
 <html>
@@ -425,20 +492,12 @@ async def generate_pdf_from_markdown(markdown_path: Path, output_pdf: Path, vari
 </html>
 '''
 
-    # 10) Replace ALL relative asset paths with absolute API URLs
-    # Handle src attributes (both double and single quotes)
-    html_with_assets = html_template.replace('src="md_assets/', f'src="{prefix}')
-    html_with_assets = html_with_assets.replace("src='md_assets/", f"src='{prefix}")
-    html_with_assets = html_with_assets.replace('src="./md_assets/', f'src="{prefix}')
-    html_with_assets = html_with_assets.replace("src='./md_assets/", f"src='{prefix}")
+    # 9) Replace ALL relative asset paths (src/href, either quote, optional ./)
+    # with absolute API URLs in one pass
+    # (the renderer answers these from disk, see pdf_generate.serve_job_assets)
+    html_with_assets = rewrite_html_assets(html_template, prefix)
     
-    # Handle href attributes for links to assets (both double and single quotes)
-    html_with_assets = html_with_assets.replace('href="md_assets/', f'href="{prefix}')
-    html_with_assets = html_with_assets.replace("href='md_assets/", f"href='{prefix}")
-    html_with_assets = html_with_assets.replace('href="./md_assets/', f'href="{prefix}')
-    html_with_assets = html_with_assets.replace("href='./md_assets/", f"href='{prefix}")
-    
-    # 11) For Variant 3: Add Canvas initialization script
+    # 10) For Variant 3: Add Canvas initialization script
     if variant == 3:
         print("Adding Variant 3 Canvas script")
         # Inject canvas overlay script
@@ -458,16 +517,18 @@ window.overlayCanvas = async (imgSrc, text, x, y, w, h) => {
         # Insert script before </head>
         html_with_assets = html_with_assets.replace('</head>', canvas_script + '</head>')
     
-    # 12) Debug: Log first 5 img src attributes to verify URLs
+    # 11) Debug: Log first 5 img src attributes to verify URLs
     import logging
     logger = logging.getLogger(__name__)
     img_sources = re.findall(r'<img[^>]+src=["\']([^"\']+)', html_with_assets)[:5]
     logger.info(f"First 5 image sources in HTML: {img_sources}")
     
-    # 13) Save intermediate HTML for debugging
+    # 12) Save intermediate HTML for debugging
     html_path = job_dir / "markdown.html"
     html_path.write_text(html_with_assets, encoding='utf-8')
     
-    # 14) Generate PDF using Playwright with file navigation
+    # 13) Generate PDF (Chromium with file navigation, or the Story engine)
     from pdf_generate import generate_pdf_from_html_file
-    await generate_pdf_from_html_file(html_path, output_pdf)
+    return await generate_pdf_from_html_file(
+        html_path, output_pdf, job_id=job_id, assets_dir=job_dir / "md_assets", engine=engine, chunks=chunks
+    )
@@ -0,0 +1,244 @@
+"""SQLite index of jobs, written through by StorageManager.save_job.
+
+job.json stays the source of truth and is still written first. Each save
+also upserts a row with the queryable fields (status, timestamps, sizes,
+model, stage timings) and the job dict itself, so status checks are an
+indexed lookup and GET /api/jobs can page and filter without walking the
+jobs directory. The database runs in WAL mode, so readers never block the
+writer and several API processes can share it.
+
+A row remembers the mtime of the job.json it was built from; a job.json
+changed behind the index's back is re-read and re-indexed on the next load.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOB_INDEX_FILENAME = "jobs.sqlite3"
+MAX_JOBS_PAGE = 200
+
+# Sortable columns of GET /api/jobs
+SORT_COLUMNS = ("created_at", "updated_at", "status", "input_size", "processing_ms")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT,
+    target_language TEXT,
+    model TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    processing_started_at TEXT,
+    processing_finished_at TEXT,
+    processing_ms INTEGER,
+    pages INTEGER,
+    input_size INTEGER,
+    output_size INTEGER,
+    timings TEXT,
+    error TEXT,
+    mtime_ns INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_at);
+"""
+
+# Columns returned by list_jobs (everything but the full job dict)
+SUMMARY_COLUMNS = (
+    "job_id", "status", "target_language", "model", "created_at", "updated_at",
+    "processing_started_at", "processing_finished_at", "processing_ms", "pages",
+    "input_size", "output_size", "timings", "error"
+)
+
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    if not path:
+        return None
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _duration_ms(started: Optional[str], finished: Optional[str]) -> Optional[int]:
+    """Milliseconds between two ISO timestamps written by the API ("...Z")."""
+    if not started or not finished:
+        return None
+    try:
+        start = datetime.fromisoformat(started.rstrip("Z"))
+        end = datetime.fromisoformat(finished.rstrip("Z"))
+    except ValueError:
+        return None
+    return max(0, round((end - start).total_seconds() * 1000))
+
+
+def _mtime_iso(mtime_ns: Optional[int]) -> Optional[str]:
+    """job.json modification time as an ISO timestamp ("...Z", millisecond precision)."""
+    if mtime_ns is None:
+        return None
+    moment = datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(timespec="milliseconds") + "Z"
+
+
+def job_row(job_id: str, job: Dict[str, Any], mtime_ns: Optional[int]) -> Dict[str, Any]:
+    """
+    Index row of a job dict.
+
+    Args:
+        job_id: Job identifier
+        job: Contents of job.json
+        mtime_ns: Modification time of the job.json the dict was written to
+
+    Returns:
+        Column name -> value
+    """
+    started = job.get("processing_started_at")
+    finished = job.get("processing_finished_at")
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "target_language": job.get("target_language"),
+        "model": job.get("openai_model_used"),
+        "created_at": job.get("created_at"),
+        # When job.json last changed, not when it was indexed (re-indexing is not an update)
+        "updated_at": _mtime_iso(mtime_ns),
+        "processing_started_at": started,
+        "processing_finished_at": finished,
+        "processing_ms": _duration_ms(started, finished),
+        "pages": job.get("vision_pages_rendered"),
+        "input_size": _file_size(job.get("input_path")),
+        "output_size": _file_size(job.get("output_path")),
+        "timings": json.dumps(job["timings"]) if job.get("timings") else None,
+        "error": job.get("error"),
+        "mtime_ns": mtime_ns,
+        "data": json.dumps(job, ensure_ascii=False),
+    }
+
+
+class JobIndex:
+    """SQLite (WAL) job index with one connection per thread."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # Rows indexed before updated_at came from job.json's mtime
+                conn.execute(
+                    "UPDATE jobs SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', mtime_ns / 1e9, 'unixepoch') || 'Z' "
+                    "WHERE mtime_ns IS NOT NULL"
+                )
+                conn.execute("PRAGMA user_version = 1")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # job.json is the durable copy; the index can be rebuilt from it
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, job_id: str, job: Dict[str, Any], mtime_ns: Optional[int] = None) -> None:
+        """Insert or replace the row of a job."""
+        row = job_row(job_id, job, mtime_ns)
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{name}" for name in row)
+        with self._connect() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO jobs ({columns}) VALUES ({placeholders})", row)
+
+    def get(self, job_id: str) -> Optional[Tuple[Dict[str, Any], Optional[int]]]:
+        """Return (job dict, indexed job.json mtime_ns), or None if the job is not indexed."""
+        row = self._connect().execute(
+            "SELECT data, mtime_ns FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["data"]), row["mtime_ns"]
+
+    def delete(self, job_id: str) -> None:
+        """Drop the row of a job."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def job_ids(self) -> List[str]:
+        """All indexed job ids."""
+        return [row[0] for row in self._connect().execute("SELECT job_id FROM jobs")]
+
+    def list_jobs(
+        self,
+        statuses: Optional[List[str]] = None,
+        target_language: Optional[str] = None,
+        model: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Page through indexed jobs.
+
+        Args:
+            statuses: Keep jobs with one of these statuses
+            target_language: Keep jobs with this target language
+            model: Keep jobs processed with this model
+            created_after: Keep jobs created at or after this ISO timestamp
+            created_before: Keep jobs created before this ISO timestamp
+            sort: One of SORT_COLUMNS
+            descending: Sort order
+            limit: Page size (at most MAX_JOBS_PAGE)
+            offset: Rows to skip
+
+        Returns:
+            Tuple of (job summaries, total number of matching jobs)
+
+        Raises:
+            ValueError: If sort is not a sortable column
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Invalid sort: {sort}. Must be one of: {', '.join(SORT_COLUMNS)}")
+
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        for column, op, value in (
+            ("target_language", "=", target_language),
+            ("model", "=", model),
+            ("created_at", ">=", created_after),
+            ("created_at", "<", created_before),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM jobs {where} "
+            f"ORDER BY {sort} {'DESC' if descending else 'ASC'}, job_id LIMIT ? OFFSET ?",
+            [*params, max(1, min(limit, MAX_JOBS_PAGE)), max(0, offset)]
+        ).fetchall()
+
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+            jobs.append(job)
+        return jobs, total
@@ -1,14 +1,19 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import os
+import time
+import asyncio
 import logging
 import json
+import hashlib
 import base64
+from urllib.parse import quote
 from dotenv import load_dotenv
 from storage import storage_manager, PROJECT_ROOT, resolve_storage_dir
+from job_index import SORT_COLUMNS, MAX_JOBS_PAGE
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -17,13 +22,28 @@ from pdf_render import render_pdf_to_pngs
 from openai_vision import analyze_document_images, translate_image_with_openai_vision
 from openai import OpenAI
 import base64
-from html_render import vision_to_html, generate_pdf_from_markdown
-from pdf_generate import html_to_pdf_bytes_async
-from pdf_overlay_generate import generate_overlay_pdf
+from asset_rewrite import iter_html_assets
+from markdown_blocks import markdown_to_html
+from html_render import iter_self_contained_html, LINKED_PAGE_IMAGE_RE, generate_pdf_from_markdown
+from pdf_generate import resolve_engine
+from artifact_cache import artifact_key, file_hash, referenced_assets, memoized
+from browser_pool import browser_pool, pool_enabled, BrowserPoolBusy
+from pdf_overlay_generate import OVERLAY_BACKGROUNDS
+from generate_variants import (
+    normalize_variant, variant_output_name, variant_cache_key, render_variant,
+    generate_batch, MissingPageImages, MAX_BATCH_VARIANTS
+)
 from debug_render import render_all_debug_pages
+from retention import (
+    collect_garbage, retention_loop, restore_page_images, restore_debug_pages,
+    restore_render_html, restore_markdown_images, restore_output
+)
 from pdf_to_markdown import pdf_to_markdown_with_assets
-from ocr_service import perform_ocr_on_image
+from markdown_cache import MARKDOWN_CACHE_DIRNAME
+from ocr_service import is_supported_ocr_lang, perform_ocr_on_image
+from ocr_merge import MERGE_LEVELS
 from preview_overlay import generate_preview_overlay
+from pdf_optimize import MIN_TARGET_DPI, optimize_pdf_file, validate_optimize_options
 
 # Pydantic models for OCR translations
 class Box(BaseModel):
@@ -43,6 +63,10 @@ class BoxesPayload(BaseModel):
 class VisionTranslatePayload(BaseModel):
     target_language: str
 
+# Pydantic model for batch generation
+class BatchGeneratePayload(BaseModel):
+    variants: List[Dict[str, Any]]
+
 # Load environment variables with priority: apps/api/.env → .env
 from pathlib import Path
 api_env_path = Path(__file__).parent / ".env"
@@ -80,13 +104,109 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def artifact_response(job_id: str, rel_path: str, media_type: str, filename: str, disposition: str = "attachment"):
+    """
+    Stream a job file from the storage backend.
+    
+    Args:
+        job_id: Job identifier
+        rel_path: Path of the file inside the job directory
+        media_type: Response content type
+        filename: File name for Content-Disposition
+        disposition: "attachment" or "inline"
+        
+    Returns:
+        StreamingResponse reading the object in chunks
+    """
+    info = storage_manager.artifact_info(job_id, rel_path)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{rel_path} not found for job {job_id}"
+        )
+    quoted = quote(filename)
+    if quoted == filename:
+        content_disposition = f'{disposition}; filename="{filename}"'
+    else:
+        content_disposition = f"{disposition}; filename*=utf-8''{quoted}"
+    return StreamingResponse(
+        storage_manager.artifact_stream(job_id, rel_path),
+        media_type=media_type,
+        headers={"Content-Length": str(info.size), "Content-Disposition": content_disposition}
+    )
+
+
+async def ensure_md_asset(job_id: str, image_name: str) -> None:
+    """
+    Re-extract markdown images removed by the retention policy before a handler reads one from disk.
+    
+    Args:
+        job_id: Job identifier
+        image_name: File name inside the job's md_assets directory
+    """
+    job_dir = storage_manager.jobs_dir / job_id
+    if (job_dir / "md_assets" / image_name).exists() or not storage_manager.job_exists(job_id):
+        return
+    await asyncio.to_thread(restore_markdown_images, job_dir, storage_manager.load_job(job_id))
+
+
+@app.on_event("startup")
+async def start_browser_pool():
+    """Launch the shared Chromium pool so PDF renders skip browser cold start."""
+    if not pool_enabled():
+        logger.info("Browser pool disabled (BROWSER_POOL_ENABLED=0)")
+        return
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # PDF generation falls back to launching a browser per request
+        logger.warning(f"Browser pool not started: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_browser_pool():
+    """Close the shared Chromium pool."""
+    await browser_pool.stop()
+
+
+retention_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_retention():
+    """Run the artifact garbage collector in the background (RETENTION_INTERVAL_MINUTES, 0 disables)."""
+    global retention_task
+    interval = float(os.getenv("RETENTION_INTERVAL_MINUTES", "60"))
+    if interval <= 0:
+        logger.info("Artifact retention disabled (RETENTION_INTERVAL_MINUTES=0)")
+        return
+    retention_task = asyncio.create_task(retention_loop(
+        storage_manager.jobs_dir, interval, markdown_cache_dir=storage_manager.base_dir / MARKDOWN_CACHE_DIRNAME
+    ))
+
+
+@app.on_event("shutdown")
+async def stop_retention():
+    """Stop the background garbage collector."""
+    if retention_task is not None:
+        retention_task.cancel()
+
+
+@app.on_event("shutdown")
+async def flush_publishes():
+    """Finish uploading job files to the storage backend before exiting."""
+    await asyncio.to_thread(storage_manager.wait_for_publishes)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "service": "document-translator-api",
-        "version": "0.1.0"
+        "version": "0.1.0",
+        "browser_pool": browser_pool.health()
     }
 
 @app.post("/api/translate")
@@ -183,6 +303,95 @@ async def get_job_status(job_id: str):
         )
 
 
+@app.get("/api/jobs")
+async def list_jobs(
+    status_filter: Optional[str] = Query(None, alias="status", description="Comma-separated statuses"),
+    target_language: Optional[str] = Query(None),
+    model: Optional[str] = Query(None, description="OpenAI model used for processing"),
+    created_after: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    created_before: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    sort: str = Query("created_at", description=f"One of: {', '.join(SORT_COLUMNS)}"),
+    order: str = Query("desc", description="asc or desc"),
+    limit: int = Query(50, ge=1, le=MAX_JOBS_PAGE),
+    offset: int = Query(0, ge=0)
+):
+    """
+    List jobs from the job index, newest first by default
+    
+    Args:
+        status_filter: Keep jobs with one of these statuses
+        target_language: Keep jobs with this target language
+        model: Keep jobs processed with this model
+        created_after: Keep jobs created at or after this time
+        created_before: Keep jobs created before this time
+        sort: Column to sort by
+        order: Sort order
+        limit: Page size
+        offset: Jobs to skip
+        
+    Returns:
+        JSON with total count, page bounds and job summaries
+    """
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort: {sort}. Must be one of: {', '.join(SORT_COLUMNS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid order: must be asc or desc"
+        )
+    
+    statuses = [s.strip() for s in status_filter.split(",") if s.strip()] if status_filter else None
+    jobs, total = await asyncio.to_thread(
+        storage_manager.job_index.list_jobs,
+        statuses=statuses,
+        target_language=target_language,
+        model=model,
+        created_after=created_after,
+        created_before=created_before,
+        sort=sort,
+        descending=order == "desc",
+        limit=limit,
+        offset=offset
+    )
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "jobs": jobs
+    }
+
+
+@app.post("/api/storage/gc")
+async def run_garbage_collection(
+    dry_run: bool = Query(True, description="Only report what would be removed"),
+    quota_mb: Optional[float] = Query(None, ge=0, description="Override STORAGE_QUOTA_MB for this run")
+):
+    """
+    Apply the artifact retention policy now
+    
+    Derived artifacts past their class TTL are removed, then the least
+    recently used ones while storage is over the quota. Inputs and edits
+    are never removed; removed artifacts are rebuilt when next requested.
+    
+    Args:
+        dry_run: Report without deleting (default)
+        quota_mb: Quota for this run in MB
+        
+    Returns:
+        JSON retention report
+    """
+    return await asyncio.to_thread(
+        collect_garbage,
+        storage_manager.jobs_dir,
+        dry_run=dry_run,
+        quota=int(quota_mb * 1024 * 1024) if quota_mb is not None else None,
+        markdown_cache_dir=storage_manager.base_dir / MARKDOWN_CACHE_DIRNAME
+    )
+
+
 @app.post("/api/process/{job_id}")
 async def process_job(
     job_id: str,
@@ -250,6 +459,7 @@ async def process_job(
         pages_dir = job_dir / "pages"
         
         # Render PDF to PNGs
+        stage_started = time.perf_counter()
         png_paths = render_pdf_to_pngs(
             input_pdf_path=input_pdf_path,
             out_dir=pages_dir,
@@ -262,9 +472,11 @@ async def process_job(
         
         # Record number of pages rendered
         vision_pages_rendered = len(png_paths)
+        timings = {**job_data.get("timings", {}), "render_ms": round((time.perf_counter() - stage_started) * 1000)}
         
         # Attempt OpenAI analysis
         try:
+            stage_started = time.perf_counter()
             vision_result = analyze_document_images(
                 image_paths=png_paths,
                 target_language=target_language,
@@ -275,6 +487,7 @@ async def process_job(
             
             # Record processing finish time
             processing_finished_at = datetime.utcnow().isoformat() + "Z"
+            timings["vision_ms"] = round((time.perf_counter() - stage_started) * 1000)
             
             # Add metadata
             vision_result["meta"] = {
@@ -297,7 +510,9 @@ async def process_job(
                 "error": None,
                 "processing_finished_at": processing_finished_at,
                 "vision_pages_rendered": vision_pages_rendered,
-                "openai_model_used": model
+                "openai_model_used": model,
+                "dpi": dpi,
+                "timings": timings
             })
             
             logger.info(f"Job {job_id} completed successfully")
@@ -349,7 +564,12 @@ async def generate_pdf(
     job_id: str, 
     mode: str = Query("html", description="Generation mode: 'html' or 'overlay'"),
     debug_overlay: bool = Query(False, description="Enable debug mode for overlay (red outlines)"),
-    overlay_scope: str = Query("headings", description="Overlay replacement scope: 'headings', 'safe', or 'all'")
+    overlay_scope: str = Query("headings", description="Overlay replacement scope: 'headings', 'safe', or 'all'"),
+    background: str = Query("raster", description="Overlay background: 'raster' (page images) or 'vector' (original PDF pages)"),
+    engine: Optional[str] = Query(None, description="PDF engine for HTML rendering: 'auto', 'chromium' or 'story' (default: PDF_ENGINE or auto)"),
+    optimize: bool = Query(False, description="Post-process the PDF: downsample/recompress images, dedupe objects"),
+    optimize_dpi: Optional[int] = Query(None, ge=MIN_TARGET_DPI, description="Target image DPI for optimization (default: PDF_OPTIMIZE_DPI or 150)"),
+    linearize: bool = Query(False, description="Linearize the optimized PDF for fast first-page display")
 ):
     """
     Generate PDF from vision analysis result.
@@ -361,6 +581,9 @@ async def generate_pdf(
     Query Parameters:
     - mode: "html" (default) or "overlay"
     - overlay_scope: "headings" (default), "safe", or "all"
+    - background: "raster" (default) or "vector" (overlay mode only)
+    - engine: "auto" (default), "chromium" or "story" (html mode only)
+    - optimize / optimize_dpi / linearize: optional size optimization of the output
     
     Process:
     - Reads vision.json or edited.json
@@ -379,6 +602,19 @@ async def generate_pdf(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid overlay_scope. Must be one of: {', '.join(valid_scopes)}"
         )
+    if background not in OVERLAY_BACKGROUNDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid background. Must be one of: {', '.join(OVERLAY_BACKGROUNDS)}"
+        )
+    try:
+        engine = resolve_engine(engine)
+        validate_optimize_options(optimize, optimize_dpi, linearize)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     # Check if job exists
     if not storage_manager.job_exists(job_id):
         raise HTTPException(
@@ -430,98 +666,73 @@ async def generate_pdf(
     # Generate document title
     title = job_data.get("filename", f"Document {job_id}")
     
-    try:
+    # Page images may have been collected by the retention policy
+    await asyncio.to_thread(restore_page_images, job_dir, job_data)
+    
+    variant = normalize_variant({
+        "mode": mode,
+        "engine": engine,
+        "overlay_scope": overlay_scope,
+        "background": background,
+        "debug_overlay": debug_overlay,
+        "optimize": optimize,
+        "optimize_dpi": optimize_dpi,
+        "linearize": linearize
+    })
+    output_filename = variant_output_name(variant)
+    # Everything that changes the output goes into the artifact key
+    cache_key = variant_cache_key(variant, job_dir, job_data, source_file, title)
+    
+    async def produce() -> Dict[str, Any]:
+        result = await render_variant(variant, job_dir, job_data, vision_data, title, output_filename)
+        output_pdf_path = job_dir / output_filename
+        
+        # Update job data (keep render_html_path if it exists from previous HTML generation)
+        updated_job_data = {**job_data, "output_path": str(output_pdf_path)}
+        if result["optimization"] is not None:
+            updated_job_data["pdf_optimization"] = {
+                **job_data.get("pdf_optimization", {}),
+                output_filename: result["optimization"]
+            }
         if mode == "html":
-            # Check if page images exist before rendering
-            pages_dir = job_dir / "pages"
-            first_page_image = pages_dir / "page_1.png"
-            if not first_page_image.exists():
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Run /api/process first (missing rendered page images)"
-                )
-            
-            # Generate HTML with embedded page images (always embed)
-            html_content = vision_to_html(vision_data, title, job_dir=job_dir, embed_page_images=True)
-            render_html_path = job_dir / "render.html"
-            
-            with open(render_html_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            
-            # Verify embedded images are present
-            if "data:image/png;base64," not in html_content:
-                # Save the problematic HTML for debugging
-                with open(render_html_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-                
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="HTML render missing embedded images; check pages/page_*.png exists"
-                )
-            
-            # Log first img tag snippet for verification
-            import re
-            img_match = re.search(r'<img[^>]+src="data:image/png;base64,[^"]+"', html_content)
-            if img_match:
-                logger.info(f"Embedded image found: {img_match.group()[:300]}...")
-            else:
-                logger.warning("No embedded image tag found in HTML")
-            
-            # Generate PDF using Playwright
-            pdf_bytes = await html_to_pdf_bytes_async(html_content)
-            output_pdf_path = job_dir / "output.pdf"
-            
-            with open(output_pdf_path, "wb") as f:
-                f.write(pdf_bytes)
-            
-            # Update job data
+            updated_job_data["render_html_path"] = str(job_dir / "render.html")
+            updated_job_data["pdf_engine"] = result["engine"]
+        storage_manager.save_job(job_id, updated_job_data)
+        
+        logger.info(f"{mode} PDF generated for job {job_id}" + (f" with {result['engine']} engine" if result["engine"] else ""))
+        return result
+    
+    try:
+        result, cache_status = await memoized(job_dir, output_filename, cache_key, produce)
+        if cache_status == "hit":
+            # Point the job at the cached artifact again (another mode may have replaced output_path)
             storage_manager.save_job(job_id, {
-                **job_data,
-                "render_html_path": str(render_html_path),
-                "output_path": str(output_pdf_path)
+                **storage_manager.load_job(job_id),
+                "output_path": str(job_dir / output_filename)
             })
-            
-            logger.info(f"HTML PDF generated for job {job_id}")
-            
-        else:  # mode == "overlay"
-            # Generate overlay PDF using PyMuPDF
-            # Get DPI from job metadata or use default
-            dpi = job_data.get("dpi", 144)
-            
-            pdf_bytes = generate_overlay_pdf(
-                job_dir, 
-                vision_data, 
-                dpi, 
-                debug=debug_overlay,
-                overlay_scope=overlay_scope
-            )
-            output_filename = "output_overlay_debug.pdf" if debug_overlay else "output_overlay.pdf"
-            output_pdf_path = job_dir / output_filename
-            
-            with open(output_pdf_path, "wb") as f:
-                f.write(pdf_bytes)
-            
-            # Update job data (keep render_html_path if it exists from previous HTML generation)
-            updated_job_data = {
-                **job_data,
-                "output_path": str(output_pdf_path)
-            }
-            
-            # Preserve render_html_path if it exists
-            if "render_html_path" in job_data:
-                updated_job_data["render_html_path"] = job_data["render_html_path"]
-                
-            storage_manager.save_job(job_id, updated_job_data)
-            
-            logger.info(f"Overlay PDF generated for job {job_id}")
         
         return {
             "job_id": job_id,
             "status": "done",
             "output": "pdf",
-            "mode": mode
+            "mode": mode,
+            "engine": result.get("engine"),
+            "optimization": result.get("optimization"),
+            "cache": cache_status
         }
         
+    except HTTPException:
+        raise
+    except MissingPageImages as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except BrowserPoolBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except RuntimeError as e:
         if "chromium" in str(e).lower() or "playwright" in str(e).lower():
             error_msg = f"{str(e)}. Run: make api-playwright-install"
@@ -541,6 +752,106 @@ async def generate_pdf(
         )
 
 
+
+@app.post("/api/generate/{job_id}/batch")
+async def generate_pdf_batch(job_id: str, payload: BatchGeneratePayload):
+    """
+    Generate several output variants of a job in one pass.
+    
+    Job data and vision/edited JSON are read once and page images are
+    decoded once; the variants then run concurrently on the shared data.
+    
+    Body:
+        {"variants": [{"mode": "html", "engine": "story"},
+                      {"mode": "overlay", "overlay_scope": "all", "background": "vector"},
+                      {"mode": "debug"}]}
+        Each variant takes the /api/generate parameters for its mode.
+    
+    Returns:
+        Manifest with one entry per variant (output file, cache status,
+        engine, size, duration or error), in request order
+    """
+    if not payload.variants or len(payload.variants) > MAX_BATCH_VARIANTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Provide between 1 and {MAX_BATCH_VARIANTS} variants"
+        )
+    try:
+        variants = [normalize_variant(spec) for spec in payload.variants]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not storage_manager.job_exists(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+    job_data = storage_manager.load_job(job_id)
+    if job_data.get("status") != "done":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Job must be in 'done' status. Run /api/process first."
+        )
+    
+    job_dir = storage_manager.jobs_dir / job_id
+    
+    # Priority: edited.json > vision.json
+    edited_json_path = job_dir / "edited.json"
+    source_file = edited_json_path if edited_json_path.exists() else job_dir / "vision.json"
+    if not source_file.exists():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Vision data not found. Run /api/process first."
+        )
+    try:
+        with open(source_file, "r", encoding="utf-8") as f:
+            vision_data = json.load(f)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read vision data: {e}"
+        )
+    
+    title = job_data.get("filename", f"Document {job_id}")
+    await asyncio.to_thread(restore_page_images, job_dir, job_data)
+    try:
+        manifest, preloaded = await generate_batch(variants, job_dir, job_data, vision_data, source_file, title)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # One job.json update for the whole batch
+    done = [entry for entry in manifest if entry["status"] == "done"]
+    outputs = {
+        entry["output"]: str(job_dir / entry["output"])
+        for entry in done if entry["mode"] != "debug"
+    }
+    updated_job_data = {**job_data, "outputs": {**job_data.get("outputs", {}), **outputs}}
+    optimization = {entry["output"]: entry["optimization"] for entry in done if entry.get("optimization")}
+    if optimization:
+        updated_job_data["pdf_optimization"] = {**job_data.get("pdf_optimization", {}), **optimization}
+    html_entry = next((entry for entry in done if entry["mode"] == "html"), None)
+    if html_entry is not None:
+        updated_job_data.update(
+            render_html_path=str(job_dir / "render.html"),
+            output_path=outputs[html_entry["output"]],
+            pdf_engine=html_entry["engine"]
+        )
+    storage_manager.save_job(job_id, updated_job_data)
+    
+    logger.info(f"Batch for job {job_id}: {len(done)}/{len(manifest)} variants, {preloaded} page rasters shared")
+    return {
+        "job_id": job_id,
+        "status": "done" if len(done) == len(manifest) else "partial" if done else "error",
+        "pages_preloaded": preloaded,
+        "variants": manifest
+    }
+
 @app.get("/api/page-image/{job_id}/{page_num}")
 async def get_page_image(job_id: str, page_num: int):
     """
@@ -567,24 +878,23 @@ async def get_page_image(job_id: str, page_num: int):
             detail=f"Job {job_id} not found"
         )
     
-    # Build image path
     job_dir = storage_manager.jobs_dir / job_id
-    pages_dir = job_dir / "pages"
-    image_path = pages_dir / f"page_{page_num}.png"
+    rel_path = f"pages/page_{page_num}.png"
+    
+    # Rebuild page images removed by the retention policy
+    if storage_manager.artifact_info(job_id, rel_path) is None:
+        await asyncio.to_thread(restore_page_images, job_dir, storage_manager.load_job(job_id))
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
     
     # Check if file exists
-    if not image_path.exists():
+    if storage_manager.artifact_info(job_id, rel_path) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Page image {page_num} not found for job {job_id}"
         )
     
-    # Return file response
-    return FileResponse(
-        image_path,
-        media_type="image/png",
-        filename=f"page_{page_num}.png"
-    )
+    # Stream from the storage backend
+    return artifact_response(job_id, rel_path, "image/png", f"page_{page_num}.png")
 
 
 @app.get("/api/debug-page-image/{job_id}/{page_num}")
@@ -613,33 +923,36 @@ async def get_debug_page_image(job_id: str, page_num: int):
             detail=f"Job {job_id} not found"
         )
     
-    # Build debug image path
     job_dir = storage_manager.jobs_dir / job_id
-    pages_dir = job_dir / "pages"
-    debug_image_path = pages_dir / f"debug_page_{page_num}.png"
+    rel_path = f"pages/debug_page_{page_num}.png"
+    
+    # Rebuild debug images removed by the retention policy
+    if storage_manager.artifact_info(job_id, rel_path) is None:
+        await asyncio.to_thread(restore_debug_pages, job_dir, storage_manager.load_job(job_id))
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
     
     # Check if debug file exists
-    if not debug_image_path.exists():
+    if storage_manager.artifact_info(job_id, rel_path) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Debug page image {page_num} not found for job {job_id}"
         )
     
-    # Return file response
-    return FileResponse(
-        debug_image_path,
-        media_type="image/png",
-        filename=f"debug_page_{page_num}.png"
-    )
+    # Stream from the storage backend
+    return artifact_response(job_id, rel_path, "image/png", f"debug_page_{page_num}.png")
 
 
 @app.get("/api/render-html/{job_id}")
-async def get_render_html(job_id: str):
+async def get_render_html(
+    job_id: str,
+    self_contained: bool = Query(False, description="Inline page images as base64 for a standalone download")
+):
     """
     Get rendered HTML for a job - returns render.html content
     
     Args:
         job_id: Job identifier
+        self_contained: Stream a downloadable file with page images embedded
         
     Returns:
         HTML content of render.html
@@ -654,15 +967,38 @@ async def get_render_html(job_id: str):
     job_dir = storage_manager.jobs_dir / job_id
     render_html_path = job_dir / "render.html"
     
-    if not render_html_path.exists():
+    # Rebuild render.html (and its page images) if the retention policy removed them
+    if storage_manager.artifact_info(job_id, "render.html") is None:
+        await asyncio.to_thread(restore_render_html, job_dir, storage_manager.load_job(job_id))
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
+    
+    if storage_manager.artifact_info(job_id, "render.html") is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rendered HTML not found. Run /api/generate with mode=html first."
         )
     
+    if self_contained:
+        # The page images are embedded from local files; fetch them if this node lacks them
+        await asyncio.to_thread(storage_manager.hydrate_job, job_id)
+        # Encode one page image at a time instead of building the whole document
+        return StreamingResponse(
+            iter_self_contained_html(render_html_path, job_dir),
+            media_type="text/html",
+            headers={"Content-Disposition": f'attachment; filename="render_{job_id}.html"'}
+        )
+    
     try:
-        with open(render_html_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
+        html_content = await asyncio.to_thread(
+            lambda: b"".join(storage_manager.artifact_stream(job_id, "render.html")).decode("utf-8")
+        )
+        
+        # Page images are linked relative to the job dir; point them at the API
+        api_base = os.getenv("API_BASE_URL", "http://localhost:8000")
+        html_content = LINKED_PAGE_IMAGE_RE.sub(
+            lambda m: f'src="{api_base}/api/page-image/{job_id}/{m.group(2)}"',
+            html_content
+        )
         
         # Return as HTML response
         from fastapi.responses import Response
@@ -769,8 +1105,15 @@ async def get_markdown_asset(job_id: str, asset: str):
             detail="Invalid asset path"
         )
     
+    rel_path = f"md_assets/{asset_path.relative_to(assets_dir).as_posix()}"
+    
+    # Re-extract images removed by the retention policy
+    if storage_manager.artifact_info(job_id, rel_path) is None:
+        await asyncio.to_thread(restore_markdown_images, job_dir, storage_manager.load_job(job_id))
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
+    
     # Check if file exists
-    if not asset_path.exists():
+    if storage_manager.artifact_info(job_id, rel_path) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Asset {asset} not found for job {job_id}"
@@ -785,12 +1128,8 @@ async def get_markdown_asset(job_id: str, asset: str):
     elif asset_path.suffix.lower() == ".webp":
         media_type = "image/webp"
     
-    # Return file response
-    return FileResponse(
-        asset_path,
-        media_type=media_type,
-        filename=asset_path.name
-    )
+    # Stream from the storage backend
+    return artifact_response(job_id, rel_path, media_type, asset_path.name)
 
 
 @app.get("/api/debug/paths")
@@ -850,7 +1189,16 @@ async def get_job_result(job_id: str, mode: str = None):
             output_file = Path(output_path)
             filename = "translated.pdf"
         
-        if not output_file.exists():
+        # Outputs live at the top of the job directory (paths may come from another node)
+        rel_path = output_file.name
+        
+        # Rebuild an output PDF removed by the retention policy
+        if storage_manager.artifact_info(job_id, rel_path) is None:
+            job_dir = storage_manager.jobs_dir / job_id
+            await restore_output(job_dir, job_data, rel_path)
+            await asyncio.to_thread(storage_manager.publish_job, job_id)
+        
+        if storage_manager.artifact_info(job_id, rel_path) is None:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Output file not found"
@@ -858,20 +1206,12 @@ async def get_job_result(job_id: str, mode: str = None):
         
         # Check file extension to determine response type
         if output_file.suffix.lower() == ".pdf":
-            # Return PDF file
-            return FileResponse(
-                output_file,
-                media_type="application/pdf",
-                filename=filename,
-                headers={
-                    "Content-Disposition": f"inline; filename=\"{filename}\""
-                }
-            )
+            # Stream the PDF from the storage backend
+            return artifact_response(job_id, rel_path, "application/pdf", filename, disposition="inline")
         else:
             # Return vision.json content (backward compatibility)
-            with open(output_file, "r", encoding="utf-8") as f:
-                vision_data = json.load(f)
-            return vision_data
+            content = await asyncio.to_thread(lambda: b"".join(storage_manager.artifact_stream(job_id, rel_path)))
+            return json.loads(content)
             
     except FileNotFoundError:
         raise HTTPException(
@@ -1028,8 +1368,14 @@ async def convert_pdf_to_markdown(job_id: str):
         # Get job directory
         job_dir = storage_manager.jobs_dir / job_id
         
-        # Convert PDF to Markdown
-        result = pdf_to_markdown_with_assets(input_pdf_path, job_dir)
+        # Convert PDF to Markdown (CPU-bound, keep the event loop free)
+        stage_started = time.perf_counter()
+        result = await asyncio.to_thread(
+            pdf_to_markdown_with_assets,
+            input_pdf_path,
+            job_dir,
+            cache_dir=storage_manager.base_dir / MARKDOWN_CACHE_DIRNAME
+        )
         
         # Update job data with markdown info
         updated_job_data = {
@@ -1038,7 +1384,11 @@ async def convert_pdf_to_markdown(job_id: str):
             "markdown_assets_dir": result["assets_dir"],
             "has_markdown": True,
             "markdown_chars": result["chars"],
-            "markdown_images_count": result["images_count"]
+            "markdown_images_count": result["images_count"],
+            "timings": {
+                **job_data.get("timings", {}),
+                "markdown_ms": round((time.perf_counter() - stage_started) * 1000)
+            }
         }
         storage_manager.save_job(job_id, updated_job_data)
         
@@ -1048,7 +1398,9 @@ async def convert_pdf_to_markdown(job_id: str):
             "job_id": job_id,
             "markdown_path": result["markdown_path"],
             "images_count": result["images_count"],
-            "chars": result["chars"]
+            "chars": result["chars"],
+            "pages_converted": result["pages_converted"],
+            "pages_cached": result["pages_cached"]
         }
         
     except Exception as e:
@@ -1114,7 +1466,9 @@ async def debug_render(job_id: str):
     
     try:
         # Generate debug images for all pages
+        await asyncio.to_thread(restore_page_images, job_dir, job_data)
         debug_count = render_all_debug_pages(job_dir, vision_data)
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
         
         logger.info(f"Generated {debug_count} debug page images for job {job_id}")
         
@@ -1133,16 +1487,29 @@ async def debug_render(job_id: str):
 
 
 @app.post("/api/pdf-from-markdown-with-ocr/{job_id}")
-async def pdf_from_markdown_with_ocr(job_id: str, payload: dict):
+async def pdf_from_markdown_with_ocr(
+    job_id: str,
+    payload: dict,
+    optimize: bool = Query(False, description="Post-process the PDF: downsample/recompress images, dedupe objects"),
+    optimize_dpi: Optional[int] = Query(None, ge=MIN_TARGET_DPI, description="Target image DPI for optimization (default: PDF_OPTIMIZE_DPI or 150)"),
+    linearize: bool = Query(False, description="Linearize the optimized PDF for fast first-page display"),
+    engine: Optional[str] = Query(None, description="PDF engine: 'auto', 'chromium' or 'story' (default: PDF_ENGINE or auto)"),
+    chunks: Optional[int] = Query(None, ge=1, description="Render in up to N parallel Chromium chunks (default: automatic for long documents)")
+):
     """
     Generate PDF from Markdown content with OCR overlays using Variant 1 approach.
     
     Args:
         job_id: Job identifier
         payload: { "markdown": "full markdown text" }
+        optimize: Post-process the PDF to reduce its size (see pdf_optimize)
+        optimize_dpi: Target image DPI for optimization
+        linearize: Linearize the optimized PDF
+        engine: PDF engine (Chromium, Story or auto with fallback)
+        chunks: Split long documents at top-level headings and render chunks in parallel
         
     Returns:
-        JSON with status and pdf_path
+        JSON with status, pdf_path and optimization report (if requested)
     """
     # Validate input
     markdown_content = payload.get("markdown")
@@ -1152,6 +1519,15 @@ async def pdf_from_markdown_with_ocr(job_id: str, payload: dict):
             detail="Missing 'markdown' field in request body"
         )
     
+    try:
+        engine = resolve_engine(engine)
+        validate_optimize_options(optimize, optimize_dpi, linearize)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
     # Check if job exists
     if not storage_manager.job_exists(job_id):
         raise HTTPException(
@@ -1161,30 +1537,70 @@ async def pdf_from_markdown_with_ocr(job_id: str, payload: dict):
     
     job_dir = storage_manager.jobs_dir / job_id
     
-    # 1) Save markdown to jobs/{job_id}/markdown_for_ocr_overlay.md
     markdown_path = job_dir / "markdown_for_ocr_overlay.md"
-    markdown_path.write_text(markdown_content, encoding='utf-8')
-    
-    # 2) Define output PDF path
     output_pdf = job_dir / "result_ocr_overlay.pdf"
     
-    # 3) Generate PDF from markdown with OCR overlays (Variant 1)
-    try:
+    # Extracted images may have been collected by the retention policy
+    await asyncio.to_thread(restore_markdown_images, job_dir, storage_manager.load_job(job_id))
+    
+    cache_key = artifact_key(
+        "pdf-from-markdown-with-ocr",
+        markdown=hashlib.sha256(markdown_content.encode("utf-8")).hexdigest(),
+        ocr_translations=file_hash(job_dir / "ocr_translations.json"),
+        assets=referenced_assets(markdown_content, job_dir / "md_assets"),
+        engine=engine,
+        chunks=chunks,
+        optimize=[optimize, optimize_dpi, linearize]
+    )
+    
+    async def produce() -> Dict[str, Any]:
+        # 1) Save markdown to jobs/{job_id}/markdown_for_ocr_overlay.md
+        markdown_path.write_text(markdown_content, encoding='utf-8')
+        
+        # 2) Generate PDF from markdown with OCR overlays (Variant 1)
         from html_render import generate_pdf_from_markdown
-        await generate_pdf_from_markdown(markdown_path, output_pdf, variant=1)
+        engine_used = await generate_pdf_from_markdown(
+            markdown_path, output_pdf, variant=1, engine=engine, chunks=chunks
+        )
         
-        # Update job status
+        # 3) Update job status
         job_data = storage_manager.load_job(job_id)
         job_data["pdf_from_markdown_with_ocr_status"] = "completed"
         job_data["pdf_from_markdown_with_ocr_path"] = str(output_pdf.relative_to(storage_manager.base_dir))
+        job_data["pdf_engine"] = engine_used
+        optimization = None
+        if optimize:
+            optimization = optimize_pdf_file(output_pdf, target_dpi=optimize_dpi, linearize=linearize)
+            job_data["pdf_optimization"] = {**job_data.get("pdf_optimization", {}), output_pdf.name: optimization}
         storage_manager.save_job(job_id, job_data)
+        return {"engine": engine_used, "optimization": optimization, "recipe": {
+            "kind": "markdown",
+            "source": markdown_path.name,
+            "variant": 1,
+            "engine": engine,
+            "chunks": chunks,
+            "optimize": [optimize, optimize_dpi, linearize]
+        }}
+    
+    try:
+        result, cache_status = await memoized(job_dir, output_pdf.name, cache_key, produce)
         
         return {
             "status": "completed",
             "pdf_path": str(output_pdf.relative_to(storage_manager.base_dir)),
-            "message": "PDF with OCR overlays generated successfully"
+            "message": "PDF with OCR overlays generated successfully",
+            "engine": result.get("engine"),
+            "optimization": result.get("optimization"),
+            "cache": cache_status
         }
         
+    except HTTPException:
+        raise
+    except BrowserPoolBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except RuntimeError as e:
         error_msg = str(e)
         logger.error(f"PDF generation with OCR failed for job {job_id}: {error_msg}")
@@ -1240,16 +1656,29 @@ async def pdf_from_markdown_with_ocr(job_id: str, payload: dict):
 
 
 @app.post("/api/pdf-from-markdown/{job_id}")
-async def pdf_from_markdown(job_id: str, payload: dict):
+async def pdf_from_markdown(
+    job_id: str,
+    payload: dict,
+    optimize: bool = Query(False, description="Post-process the PDF: downsample/recompress images, dedupe objects"),
+    optimize_dpi: Optional[int] = Query(None, ge=MIN_TARGET_DPI, description="Target image DPI for optimization (default: PDF_OPTIMIZE_DPI or 150)"),
+    linearize: bool = Query(False, description="Linearize the optimized PDF for fast first-page display"),
+    engine: Optional[str] = Query(None, description="PDF engine: 'auto', 'chromium' or 'story' (default: PDF_ENGINE or auto)"),
+    chunks: Optional[int] = Query(None, ge=1, description="Render in up to N parallel Chromium chunks (default: automatic for long documents)")
+):
     """
     Generate PDF from Markdown content with robust error handling.
     
     Args:
         job_id: Job identifier
         payload: { "markdown": "full markdown text" }
+        optimize: Post-process the PDF to reduce its size (see pdf_optimize)
+        optimize_dpi: Target image DPI for optimization
+        linearize: Linearize the optimized PDF
+        engine: PDF engine (Chromium, Story or auto with fallback)
+        chunks: Split long documents at top-level headings and render chunks in parallel
         
     Returns:
-        JSON with status and pdf_path
+        JSON with status, pdf_path and optimization report (if requested)
     """
     # Validate input
     markdown_content = payload.get("markdown")
@@ -1259,6 +1688,15 @@ async def pdf_from_markdown(job_id: str, payload: dict):
             detail="Missing 'markdown' field in request body"
         )
     
+    try:
+        engine = resolve_engine(engine)
+        validate_optimize_options(optimize, optimize_dpi, linearize)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
     # Check if job exists
     if not storage_manager.job_exists(job_id):
         raise HTTPException(
@@ -1268,29 +1706,67 @@ async def pdf_from_markdown(job_id: str, payload: dict):
     
     job_dir = storage_manager.jobs_dir / job_id
     
-    # 1) Save markdown to jobs/{job_id}/markdown_for_pdf.md
     markdown_path = job_dir / "markdown_for_pdf.md"
-    markdown_path.write_text(markdown_content, encoding='utf-8')
-    
-    # 2) Define output PDF path
     output_pdf = job_dir / "result.pdf"
     
-    # 3) Generate PDF from markdown with detailed error handling
-    try:
-        await generate_pdf_from_markdown(markdown_path, output_pdf)
+    # Extracted images may have been collected by the retention policy
+    await asyncio.to_thread(restore_markdown_images, job_dir, storage_manager.load_job(job_id))
+    
+    cache_key = artifact_key(
+        "pdf-from-markdown",
+        markdown=hashlib.sha256(markdown_content.encode("utf-8")).hexdigest(),
+        ocr_translations=file_hash(job_dir / "ocr_translations.json"),
+        assets=referenced_assets(markdown_content, job_dir / "md_assets"),
+        engine=engine,
+        chunks=chunks,
+        optimize=[optimize, optimize_dpi, linearize]
+    )
+    
+    async def produce() -> Dict[str, Any]:
+        # 1) Save markdown to jobs/{job_id}/markdown_for_pdf.md
+        markdown_path.write_text(markdown_content, encoding='utf-8')
+        
+        # 2) Generate PDF from markdown
+        engine_used = await generate_pdf_from_markdown(markdown_path, output_pdf, engine=engine, chunks=chunks)
         
-        # Update job status
+        # 3) Update job status
         job_data = storage_manager.load_job(job_id)
         job_data["pdf_from_markdown_status"] = "completed"
         job_data["pdf_from_markdown_path"] = str(output_pdf.relative_to(storage_manager.base_dir))
+        job_data["pdf_engine"] = engine_used
+        optimization = None
+        if optimize:
+            optimization = optimize_pdf_file(output_pdf, target_dpi=optimize_dpi, linearize=linearize)
+            job_data["pdf_optimization"] = {**job_data.get("pdf_optimization", {}), output_pdf.name: optimization}
         storage_manager.save_job(job_id, job_data)
+        return {"engine": engine_used, "optimization": optimization, "recipe": {
+            "kind": "markdown",
+            "source": markdown_path.name,
+            "variant": 1,
+            "engine": engine,
+            "chunks": chunks,
+            "optimize": [optimize, optimize_dpi, linearize]
+        }}
+    
+    try:
+        result, cache_status = await memoized(job_dir, output_pdf.name, cache_key, produce)
         
         return {
             "status": "completed",
             "pdf_path": str(output_pdf.relative_to(storage_manager.base_dir)),
-            "message": "PDF generated successfully"
+            "message": "PDF generated successfully",
+            "engine": result.get("engine"),
+            "optimization": result.get("optimization"),
+            "cache": cache_status
         }
         
+    except HTTPException:
+        raise
+    except BrowserPoolBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except RuntimeError as e:
         # Handle specific Playwright/Chromium errors with detailed diagnostics
         error_msg = str(e)
@@ -1348,7 +1824,12 @@ async def pdf_from_markdown(job_id: str, payload: dict):
 
 
 @app.post("/api/ocr/{job_id}/{image_name}")
-async def ocr_image(job_id: str, image_name: str):
+async def ocr_image(
+    job_id: str,
+    image_name: str,
+    merge_level: Optional[str] = Query(None, description="Box merging level: 'word', 'line' or 'paragraph'"),
+    lang: Optional[str] = Query(None, description="Language of the text in the image (e.g. 'en', 'ru')")
+):
     """
     Perform OCR on an image from md_assets and return text with bounding boxes.
     Also includes saved translations if they exist.
@@ -1356,10 +1837,23 @@ async def ocr_image(job_id: str, image_name: str):
     Args:
         job_id: Job identifier
         image_name: Image filename (e.g., page1_img1.png)
+        merge_level: Box merging level (default: OCR_MERGE_LEVEL env or "paragraph")
+        lang: OCR language, routes to the per-language model (default: OCR_DEFAULT_LANG env)
         
     Returns:
         JSON with image_url, ocr_boxes, and translations
     """
+    if merge_level is not None and merge_level not in MERGE_LEVELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid merge_level. Must be one of: {', '.join(MERGE_LEVELS)}"
+        )
+    if not is_supported_ocr_lang(lang):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported OCR language: {lang}"
+        )
+    
     # Check if job exists
     if not storage_manager.job_exists(job_id):
         raise HTTPException(
@@ -1387,6 +1881,9 @@ async def ocr_image(job_id: str, image_name: str):
             detail="Invalid image path"
         )
     
+    # Re-extract it if the retention policy removed it
+    await ensure_md_asset(job_id, image_name)
+    
     # Check if image exists
     if not image_path.exists():
         raise HTTPException(
@@ -1396,7 +1893,7 @@ async def ocr_image(job_id: str, image_name: str):
     
     # Perform OCR
     try:
-        ocr_boxes = perform_ocr_on_image(image_path)
+        ocr_boxes = perform_ocr_on_image(image_path, merge_level=merge_level, lang=lang)
         
         # Construct image URL
         api_base = os.getenv("API_BASE_URL", "http://localhost:8000")
@@ -1433,6 +1930,7 @@ async def vision_translate(job_id: str, image_name: str):
         # Use storage manager to get correct path
         job_dir = storage_manager.jobs_dir / job_id
         image_path = job_dir / "md_assets" / image_name
+        await ensure_md_asset(job_id, image_name)
         
         if not image_path.exists():
             logger.error(f"❌ FILE NOT FOUND: {image_path}")
@@ -1538,11 +2036,12 @@ async def vision_translate(job_id: str, image_name: str):
             # Add a small indicator that this is a vision-processed image
             draw.text((10, img.height - 20), "AI TRANSLATED", fill=(0, 128, 0), font=font)
             
-            output_filename = image_name.replace('.png', '_translated.png')
+            output_filename = f"{Path(image_name).stem}_translated.png"
             output_path = job_dir / "md_assets" / output_filename
             img.save(output_path, 'PNG')
         
         logger.info(f"✅ [SAVED] {output_filename} ({output_path.stat().st_size} bytes)")
+        storage_manager.schedule_publish(job_id)
         
         return {"original_image_name": image_name, "translated_image_name": output_filename, "target_language": "russian"}
     except Exception as e:
@@ -1610,8 +2109,9 @@ async def save_edited_image(job_id: str, payload: dict):
         
         job_dir = storage_manager.jobs_dir / job_id
         original_path = job_dir / "md_assets" / image_name
-        final_filename = image_name.replace('.png', '_final.png')
+        final_filename = f"{Path(image_name).stem}_final.png"
         final_path = job_dir / "md_assets" / final_filename
+        await ensure_md_asset(job_id, image_name)
         
         # Load original image
         from PIL import Image, ImageDraw, ImageFont
@@ -1724,6 +2224,7 @@ async def save_edited_image(job_id: str, payload: dict):
             img.save(final_path, 'PNG')
         
         logger.info(f"✅ [FINAL IMAGE SAVED] {final_filename}")
+        storage_manager.schedule_publish(job_id)
         return {"final_image_name": final_filename}
         
     except Exception as e:
@@ -1856,6 +2357,7 @@ async def save_ocr_translations(job_id: str, image_name: str, payload: BoxesPayl
         
         # Save file
         trans_file.write_text(json.dumps(data, indent=2))
+        storage_manager.schedule_publish(job_id)
         print(f"File saved successfully")
         
         # Verify save
@@ -1884,6 +2386,7 @@ async def download_html_with_ocr(job_id: str, filename: str = None):
     try:
         # Get job directory
         job_dir = storage_manager.jobs_dir / job_id
+        await asyncio.to_thread(restore_markdown_images, job_dir, storage_manager.load_job(job_id))
         
         # Try to get markdown content from different possible locations
         markdown_content = None
@@ -1911,14 +2414,9 @@ async def download_html_with_ocr(job_id: str, filename: str = None):
             # OCR translations are optional
             pass
         
-        # Generate HTML with OCR overlays using existing function
-        from html_render import generate_pdf_from_markdown
-        import markdown2
-        import os
-        import re
-        
-        # Convert markdown to HTML (extras=['tables'] for GFM tables)
-        html_content = markdown2.markdown(markdown_content, extras=['tables'])
+        # Convert markdown to HTML (extras=['tables'] for GFM tables), reusing
+        # the HTML of blocks that did not change since the last export
+        html_content = markdown_to_html(markdown_content)
         
         # Get API base URL for asset paths
         api_base = os.getenv("API_BASE_URL", "http://localhost:8000")
@@ -1977,76 +2475,43 @@ async def download_html_with_ocr(job_id: str, filename: str = None):
 </html>
 '''
         
-        # Replace asset paths with API URLs
-        html_with_assets = html_template.replace('src="md_assets/', f'src="{prefix}')
-        html_with_assets = html_with_assets.replace("src='md_assets/", f"src='{prefix}")
-        html_with_assets = html_with_assets.replace('src="./md_assets/', f'src="{prefix}')
-        html_with_assets = html_with_assets.replace("src='./md_assets/", f"src='{prefix}")
-        
-        # Add OCR text overlays for images
-        if ocr_translations:
-            img_pattern = r'<img[^>]+src=["\']([^"\']+/md_assets/([^"\']+\.\w+))["\'][^>]*/?>'
-            matches = list(re.finditer(img_pattern, html_with_assets))
+        def wrap_with_overlays(image_name, img_tag):
+            # Check if we have OCR data for this image
+            translations = ocr_translations.get(image_name)
+            if not translations:
+                return None
+            ocr_result = translations.get('ocr_result', {})
+            text_translations = translations.get('translations', {})
+            if not ocr_result or 'ocr_boxes' not in ocr_result:
+                return None
             
-            # Process matches in reverse order to avoid offset issues
-            for match in reversed(matches):
-                full_src = match.group(1)
-                image_name = match.group(2)
-                start_pos = match.start()
-                end_pos = match.end()
+            # Build overlay divs
+            overlay_divs = []
+            for i, box in enumerate(ocr_result['ocr_boxes']):
+                # Get translated text or original
+                translated_text = text_translations.get(str(i), box['text'])
                 
-                # Check if we have OCR data for this image
-                if image_name in ocr_translations:
-                    translations = ocr_translations[image_name]
-                    ocr_result = translations.get('ocr_result', {})
-                    text_translations = translations.get('translations', {})
+                # Get bounding box coordinates
+                if len(box['bbox']) >= 4:
+                    x1, y1, x2, y2 = box['bbox'][:4]
+                    width = x2 - x1
+                    height = y2 - y1
                     
-                    if ocr_result and 'ocr_boxes' in ocr_result:
-                        # Create container div
-                        container_start = '<div class="ocr-container">'
-                        container_end = '</div>'
-                        
-                        # Build overlay divs
-                        overlay_divs = []
-                        for i, box in enumerate(ocr_result['ocr_boxes']):
-                            # Get translated text or original
-                            translated_text = text_translations.get(str(i), box['text'])
-                            
-                            # Get bounding box coordinates
-                            if len(box['bbox']) >= 4:
-                                x1, y1, x2, y2 = box['bbox'][:4]
-                                width = x2 - x1
-                                height = y2 - y1
-                                
-                                # Calculate font size based on box height
-                                font_size = max(8, min(height * 0.8, 24))
-                                
-                                overlay_div = (
-                                    f'<div class="ocr-overlay" '
-                                    f'style="left: {x1}px; top: {y1}px; '
-                                    f'width: {width}px; height: {height}px; '
-                                    f'font-size: {font_size}px; line-height: 1; '
-                                    f'display: flex; align-items: center;">'
-                                    f'{translated_text}'
-                                    f'</div>'
-                                )
-                                overlay_divs.append(overlay_div)
-                        
-                        # Replace the img tag with container + img + overlays
-                        img_tag = match.group(0)
-                        replacement = (
-                            container_start + 
-                            img_tag + 
-                            ''.join(overlay_divs) + 
-                            container_end
-                        )
-                        
-                        # Update HTML
-                        html_with_assets = (
-                            html_with_assets[:start_pos] + 
-                            replacement + 
-                            html_with_assets[end_pos:]
-                        )
+                    # Calculate font size based on box height
+                    font_size = max(8, min(height * 0.8, 24))
+                    
+                    overlay_divs.append(
+                        f'<div class="ocr-overlay" '
+                        f'style="left: {x1}px; top: {y1}px; '
+                        f'width: {width}px; height: {height}px; '
+                        f'font-size: {font_size}px; line-height: 1; '
+                        f'display: flex; align-items: center;">'
+                        f'{translated_text}'
+                        f'</div>'
+                    )
+            
+            # Container + img + overlays
+            return '<div class="ocr-container">' + img_tag + ''.join(overlay_divs) + '</div>'
         
         # Save HTML file
         if filename:
@@ -2055,15 +2520,14 @@ async def download_html_with_ocr(job_id: str, filename: str = None):
             html_filename = f"document_with_ocr_{job_id}.html"
         
         html_path = job_dir / html_filename
-        html_path.write_text(html_with_assets, encoding='utf-8')
+        # Rewrite asset URLs to the API and add OCR overlays in one streaming pass
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.writelines(iter_html_assets(html_template, prefix, wrap_with_overlays if ocr_translations else None))
         
         logger.info(f"Generated HTML file for job {job_id}: {html_filename}")
         
-        return FileResponse(
-            path=str(html_path),
-            filename=html_filename,
-            media_type='text/html'
-        )
+        await asyncio.to_thread(storage_manager.publish_job, job_id)
+        return artifact_response(job_id, html_filename, "text/html", html_filename)
         
     except HTTPException:
         raise
@@ -2103,6 +2567,7 @@ async def preview_overlay(job_id: str, image_name: str):
     try:
         job_dir = storage_manager.jobs_dir / job_id
         png_path = job_dir / "md_assets" / image_name
+        await ensure_md_asset(job_id, image_name)
         
         # Check if image exists
         if not png_path.exists():
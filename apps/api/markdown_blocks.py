@@ -0,0 +1,193 @@
+"""Incremental markdown → HTML conversion.
+
+The markdown is split into top-level blocks at blank lines where the
+split cannot change the result (not inside fences, HTML blocks or
+comments, lists or blockquotes). Each block is converted with markdown2 on its own and its
+HTML is cached under a hash of the block, so after an edit only the
+changed blocks are converted again. Documents with reference-style link
+definitions are converted whole, since those resolve across blocks.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import markdown2
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_EXTRAS = ("tables",)
+DEFAULT_BLOCK_CACHE_MB = 64
+
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+# A blank line followed by one of these continues the previous block
+CONTINUATION_RE = re.compile(r"^(\s|[-*+]\s|\d+[.)]\s|>)")
+LINK_DEFINITION_RE = re.compile(r"^ {0,3}\[[^\]]+\]:\s*\S", re.M)
+# markdown2's block-level tags (its _block_tags_a) plus HTML5 sectioning tags
+BLOCK_TAGS = (
+    "blockquote|body|dd|del|div|dl|dt|fieldset|form|h[1-6]|head|html|iframe|ins|li|math|noscript|"
+    "ol|p|pre|script|style|table|tfoot|ul|section|article|aside|header|footer|nav|main|figure|details|summary"
+)
+BLOCK_TAG_OPEN_RE = re.compile(rf"<({BLOCK_TAGS})\b", re.I)
+BLOCK_TAG_CLOSE_RE = re.compile(rf"</({BLOCK_TAGS})\s*>", re.I)
+
+
+def _strip_comments(line: str, in_comment: bool) -> tuple:
+    """
+    Remove HTML comment text from a line.
+
+    Returns:
+        Tuple of (line without comments, whether a comment is still open at the end)
+    """
+    visible = []
+    pos = 0
+    while pos <= len(line):
+        if in_comment:
+            end = line.find("-->", pos)
+            if end < 0:
+                break
+            pos = end + 3
+            in_comment = False
+        else:
+            start = line.find("<!--", pos)
+            if start < 0:
+                visible.append(line[pos:])
+                break
+            visible.append(line[pos:start])
+            pos = start + 4
+            in_comment = True
+    return "".join(visible), in_comment
+
+
+def split_blocks(markdown: str) -> List[str]:
+    """
+    Split markdown into top-level blocks that convert independently.
+
+    Args:
+        markdown: Markdown document
+
+    Returns:
+        Blocks in document order (joined by blank lines they give the same HTML)
+    """
+    if LINK_DEFINITION_RE.search(markdown):
+        return [markdown]
+
+    blocks: List[str] = []
+    current: List[str] = []
+    fence: Optional[str] = None
+    html_depth = 0
+    in_comment = False
+    after_blank = False
+
+    for line in markdown.split("\n"):
+        if fence is None and not line.strip():
+            after_blank = True
+            current.append(line)
+            continue
+
+        if after_blank and fence is None and html_depth <= 0 and not in_comment and not CONTINUATION_RE.match(line):
+            block = "\n".join(current).strip("\n")
+            if block.strip():
+                blocks.append(block)
+            current = []
+            html_depth = 0
+        after_blank = False
+        current.append(line)
+
+        fence_match = FENCE_RE.match(line)
+        if fence_match:
+            marker = fence_match.group(1)
+            if fence is None:
+                fence = marker[0] * 3
+            elif marker.startswith(fence):
+                fence = None
+        elif fence is None:
+            visible, in_comment = _strip_comments(line, in_comment)
+            html_depth += len(BLOCK_TAG_OPEN_RE.findall(visible)) - len(BLOCK_TAG_CLOSE_RE.findall(visible))
+
+    block = "\n".join(current).strip("\n")
+    if block.strip():
+        blocks.append(block)
+    return blocks
+
+
+class BlockHtmlCache:
+    """LRU of block HTML keyed by block content hash, bounded by memory."""
+
+    def __init__(self, max_memory_mb: Optional[int] = None):
+        """
+        Args:
+            max_memory_mb: Memory limit (default: MARKDOWN_BLOCK_CACHE_MB env or 64)
+        """
+        if max_memory_mb is None:
+            max_memory_mb = int(os.getenv("MARKDOWN_BLOCK_CACHE_MB", str(DEFAULT_BLOCK_CACHE_MB)))
+        self.max_bytes = max_memory_mb * 1024 * 1024
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(block: str, extras: Sequence[str]) -> str:
+        raw = "\x00".join(extras) + "\x00" + block
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return html
+
+    def put(self, key: str, html: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = html
+            self._bytes += len(html)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Global block cache, shared by all requests in this process
+block_cache = BlockHtmlCache()
+
+
+def markdown_to_html(markdown: str, extras: Sequence[str] = MARKDOWN_EXTRAS) -> str:
+    """
+    Convert markdown to HTML, re-converting only blocks not seen before.
+
+    Args:
+        markdown: Markdown document
+        extras: markdown2 extras
+
+    Returns:
+        HTML fragment, same as markdown2.markdown(markdown, extras=extras)
+    """
+    extras = list(extras)
+    parts = []
+    converted = 0
+    for block in split_blocks(markdown):
+        key = BlockHtmlCache.key(block, extras)
+        html = block_cache.get(key)
+        if html is None:
+            html = markdown2.markdown(block, extras=extras)
+            block_cache.put(key, html)
+            converted += 1
+        parts.append(html)
+    logger.info(f"Markdown to HTML: {converted} of {len(parts)} blocks converted")
+    # Each block's HTML ends with a newline; blocks are separated by a blank line
+    return "\n".join(parts)
@@ -0,0 +1,118 @@
+"""Per-page cache of PDF → Markdown fragments.
+
+pymupdf4llm converts pages independently, so layout.md can be assembled
+from per-page fragments. Each fragment is stored under a hash of the page
+content (content stream, images, fonts, form XObjects, links), the
+converter versions and the conversion options. The cache is content
+addressed and shared by all jobs: re-running a conversion, or converting
+the same PDF in another job, only converts pages whose key is new.
+"""
+
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import fitz  # PyMuPDF
+import pymupdf4llm
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_CACHE_DIRNAME = "markdown_cache"
+# Bump when fragment generation changes in a way that invalidates cached pages
+MARKDOWN_CACHE_VERSION = 1
+
+
+def converter_version() -> Dict[str, Any]:
+    """Versions of everything that shapes a fragment."""
+    return {
+        "cache": MARKDOWN_CACHE_VERSION,
+        "pymupdf4llm": getattr(pymupdf4llm, "__version__", None),
+        "pymupdf": fitz.VersionBind,
+        # The layout engine and the font-size heuristics produce different markdown
+        "layout": getattr(pymupdf4llm, "IdentifyHeaders", None) is None,
+    }
+
+
+def _xref_digest(doc: fitz.Document, xref: int, memo: Dict[int, bytes]) -> bytes:
+    """Digest of a PDF object and its stream, computed once per xref."""
+    digest = memo.get(xref)
+    if digest is None:
+        h = hashlib.sha256(doc.xref_object(xref, compressed=True).encode("utf-8", "replace"))
+        if doc.xref_is_stream(xref):
+            h.update(doc.xref_stream_raw(xref) or b"")
+        memo[xref] = digest = h.digest()
+    return digest
+
+
+def page_content_hash(doc: fitz.Document, page: fitz.Page, memo: Dict[int, bytes]) -> str:
+    """
+    Hash of everything on a page that the markdown converter reads.
+
+    Args:
+        doc: Document the page belongs to
+        page: Page to hash
+        memo: Per-document xref digests, shared across pages (logos, fonts)
+
+    Returns:
+        Hex digest of the page content
+    """
+    h = hashlib.sha256(page.read_contents())
+    h.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    xrefs = {img[0] for img in page.get_images(full=True)}
+    xrefs |= {font[0] for font in page.get_fonts(full=True) if font[0] > 0}
+    xrefs |= {xobj[0] for xobj in page.get_xobjects()}
+    for xref in sorted(xrefs):
+        h.update(_xref_digest(doc, xref, memo))
+    links = [(link.get("kind"), tuple(link["from"]), link.get("uri"), link.get("page")) for link in page.get_links()]
+    h.update(repr(links).encode("utf-8"))
+    return h.hexdigest()
+
+
+def fragment_key(content_hash: str, **options: Any) -> str:
+    """
+    Cache key of a page fragment.
+
+    Args:
+        content_hash: page_content_hash of the page
+        **options: Conversion options that change the output
+
+    Returns:
+        Hex digest identifying the fragment
+    """
+    payload = {"content": content_hash, "converter": converter_version(), "options": options}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class MarkdownPageCache:
+    """Directory of <key[:2]>/<key>.md fragments shared by all jobs."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.md"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached fragment or None."""
+        try:
+            text = self._path(key).read_text(encoding="utf-8")
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store a fragment (atomically, so concurrent jobs never read a partial file)."""
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{id(text)}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to cache markdown fragment {key}: {e}")
@@ -0,0 +1,214 @@
+"""Merge word-level OCR boxes into lines and paragraphs using a uniform grid index."""
+
+import math
+from typing import List, Dict, Any, Tuple, Iterable
+
+# Merge policy constants (expressed as multiples of the typical text height)
+LINE_MAX_GAP_RATIO = 1.0          # Max horizontal gap between words on one line
+LINE_MIN_V_OVERLAP = 0.5          # Min vertical overlap (fraction of the smaller height)
+PARA_MAX_GAP_RATIO = 0.8          # Max vertical gap between lines of one paragraph
+PARA_MAX_HEIGHT_RATIO = 1.6       # Max height ratio between lines of one paragraph
+PARA_MIN_H_OVERLAP = 0.3          # Min horizontal overlap (fraction of the narrower line)
+MERGE_LEVELS = ("word", "line", "paragraph")
+
+
+class _UnionFind:
+    """Minimal disjoint-set structure with path halving."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self) -> List[List[int]]:
+        buckets: Dict[int, List[int]] = {}
+        for i in range(len(self.parent)):
+            buckets.setdefault(self.find(i), []).append(i)
+        return list(buckets.values())
+
+
+class _GridIndex:
+    """Uniform grid spatial index over axis-aligned boxes."""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = max(1.0, float(cell_size))
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def _cell_range(self, x1: float, y1: float, x2: float, y2: float) -> Iterable[Tuple[int, int]]:
+        cs = self.cell_size
+        for cx in range(int(math.floor(x1 / cs)), int(math.floor(x2 / cs)) + 1):
+            for cy in range(int(math.floor(y1 / cs)), int(math.floor(y2 / cs)) + 1):
+                yield cx, cy
+
+    def insert(self, idx: int, bbox: List[float]) -> None:
+        for cell in self._cell_range(*bbox):
+            self.cells.setdefault(cell, []).append(idx)
+
+    def query(self, x1: float, y1: float, x2: float, y2: float) -> set:
+        found = set()
+        for cell in self._cell_range(x1, y1, x2, y2):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+def _height(bbox: List[float]) -> float:
+    return bbox[3] - bbox[1]
+
+
+def _width(bbox: List[float]) -> float:
+    return bbox[2] - bbox[0]
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def _same_line(a: List[float], b: List[float]) -> bool:
+    """Check whether two word boxes belong to the same text line."""
+    min_h = min(_height(a), _height(b))
+    if min_h <= 0:
+        return False
+    v_overlap = min(a[3], b[3]) - max(a[1], b[1])
+    if v_overlap < LINE_MIN_V_OVERLAP * min_h:
+        return False
+    h_gap = max(a[0], b[0]) - min(a[2], b[2])
+    return h_gap <= LINE_MAX_GAP_RATIO * max(_height(a), _height(b))
+
+
+def _same_paragraph(a: List[float], b: List[float]) -> bool:
+    """Check whether two line boxes belong to the same paragraph."""
+    ha, hb = _height(a), _height(b)
+    if ha <= 0 or hb <= 0:
+        return False
+    if max(ha, hb) / min(ha, hb) > PARA_MAX_HEIGHT_RATIO:
+        return False
+    v_gap = max(a[1], b[1]) - min(a[3], b[3])
+    if v_gap > PARA_MAX_GAP_RATIO * min(ha, hb):
+        return False
+    # Lines that overlap vertically are side by side (e.g. columns), not stacked
+    if v_gap < -0.5 * min(ha, hb):
+        return False
+    h_overlap = min(a[2], b[2]) - max(a[0], b[0])
+    return h_overlap >= PARA_MIN_H_OVERLAP * min(_width(a), _width(b))
+
+
+def _cluster(boxes: List[Dict[str, Any]], margin_ratio: float, predicate) -> List[List[int]]:
+    """
+    Group boxes into connected components of `predicate` using a grid index.
+
+    Only boxes whose expanded bbox falls into a shared grid cell are compared,
+    so the cost stays near-linear in the number of boxes.
+    """
+    n = len(boxes)
+    uf = _UnionFind(n)
+    if n < 2:
+        return uf.groups()
+
+    median_h = _median([max(1.0, _height(b["bbox"])) for b in boxes])
+    grid = _GridIndex(cell_size=median_h * 2)
+    for i, box in enumerate(boxes):
+        grid.insert(i, box["bbox"])
+
+    for i, box in enumerate(boxes):
+        x1, y1, x2, y2 = box["bbox"]
+        pad = margin_ratio * max(_height(box["bbox"]), median_h)
+        for j in grid.query(x1 - pad, y1 - pad, x2 + pad, y2 + pad):
+            # Thresholds depend on both heights, so test pairs from both sides
+            if j == i or uf.find(i) == uf.find(j):
+                continue
+            if predicate(box["bbox"], boxes[j]["bbox"]):
+                uf.union(i, j)
+    return uf.groups()
+
+
+def _combine(members: List[Dict[str, Any]], separator: str) -> Dict[str, Any]:
+    """Build a single OCR box from its members (already in reading order)."""
+    text = separator.join(m["text"] for m in members)
+    weights = [max(1, len(m["text"])) for m in members]
+    confidence = sum(m["confidence"] * w for m, w in zip(members, weights)) / sum(weights)
+    return {
+        "text": text,
+        "bbox": [
+            int(min(m["bbox"][0] for m in members)),
+            int(min(m["bbox"][1] for m in members)),
+            int(max(m["bbox"][2] for m in members)),
+            int(max(m["bbox"][3] for m in members)),
+        ],
+        "confidence": float(confidence),
+    }
+
+
+def _reading_order(boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(boxes, key=lambda b: (b["bbox"][1], b["bbox"][0]))
+
+
+def merge_words_into_lines(boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group word-level OCR boxes into text lines.
+
+    Args:
+        boxes: List of dictionaries with 'text', 'bbox' and 'confidence' keys
+
+    Returns:
+        List of line boxes in the same format, in reading order
+    """
+    valid = [b for b in boxes if b.get("bbox") and len(b["bbox"]) == 4]
+    lines = []
+    for group in _cluster(valid, LINE_MAX_GAP_RATIO, _same_line):
+        members = sorted((valid[i] for i in group), key=lambda b: b["bbox"][0])
+        lines.append(_combine(members, " "))
+    return _reading_order(lines)
+
+
+def merge_lines_into_paragraphs(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group line-level OCR boxes into paragraphs.
+
+    Args:
+        lines: List of line boxes with 'text', 'bbox' and 'confidence' keys
+
+    Returns:
+        List of paragraph boxes in the same format, in reading order
+    """
+    valid = [b for b in lines if b.get("bbox") and len(b["bbox"]) == 4]
+    paragraphs = []
+    for group in _cluster(valid, PARA_MAX_GAP_RATIO, _same_paragraph):
+        members = _reading_order([valid[i] for i in group])
+        paragraphs.append(_combine(members, " "))
+    return _reading_order(paragraphs)
+
+
+def merge_ocr_boxes(boxes: List[Dict[str, Any]], level: str = "paragraph") -> List[Dict[str, Any]]:
+    """
+    Merge OCR boxes up to the requested level.
+
+    Args:
+        boxes: Word- or line-level boxes with 'text', 'bbox' and 'confidence' keys
+        level: "word" (no merging), "line" or "paragraph"
+
+    Returns:
+        List of merged boxes with 'text', 'bbox' and 'confidence' keys
+    """
+    if level not in MERGE_LEVELS:
+        raise ValueError(f"Invalid merge level: {level}. Must be one of: {', '.join(MERGE_LEVELS)}")
+
+    if level == "word" or not boxes:
+        return boxes
+
+    lines = merge_words_into_lines(boxes)
+    if level == "line":
+        return lines
+    return merge_lines_into_paragraphs(lines)
@@ -0,0 +1,198 @@
+"""Per-language OCR model registry with a memory-bounded LRU."""
+
+import gc
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OCR_LANG = "en"
+DEFAULT_MODEL_MEMORY_MB = 2048
+
+# Common language codes → PaddleOCR model names
+PADDLE_LANG_ALIASES = {
+    "en": "en",
+    "eng": "en",
+    "english": "en",
+    "ru": "ru",
+    "rus": "ru",
+    "russian": "ru",
+    "de": "german",
+    "german": "german",
+    "fr": "fr",
+    "french": "fr",
+    "es": "es",
+    "spanish": "es",
+    "it": "it",
+    "italian": "it",
+    "pt": "pt",
+    "uk": "uk",
+    "ja": "japan",
+    "japan": "japan",
+    "ko": "korean",
+    "korean": "korean",
+    "zh": "ch",
+    "ch": "ch",
+    "chinese": "ch",
+}
+
+
+# Model names PaddleOCR ships recognition models for
+PADDLE_LANGS = frozenset({
+    "ch", "en", "chinese_cht", "korean", "japan", "fr", "german", "es", "pt", "it", "ru", "uk",
+    "be", "bg", "latin", "arabic", "cyrillic", "devanagari", "ta", "te", "ka", "kn", "hi", "mr",
+    "ne", "fa", "ur", "ug", "ku", "ar", "af", "az", "bs", "cs", "cy", "da", "et", "ga", "hr",
+    "hu", "id", "is", "lt", "lv", "mi", "ms", "mt", "nl", "no", "oc", "pi", "pl", "ro", "rs_latin",
+    "sk", "sl", "sq", "sv", "sw", "tl", "tr", "uz", "vi", "mn", "abq", "ady", "kbd", "ava", "dar",
+    "inh", "che", "lbe", "lez", "tab", "rs_cyrillic", "sa", "bh", "mai", "ang", "bho", "mah",
+    "sck", "new", "gom",
+})
+
+
+def normalize_paddle_lang(lang: Optional[str]) -> str:
+    """Map a user-facing language code to a PaddleOCR model name."""
+    if not lang:
+        lang = os.getenv("OCR_DEFAULT_LANG", DEFAULT_OCR_LANG)
+    key = lang.strip().lower()
+    return PADDLE_LANG_ALIASES.get(key, key)
+
+
+def is_supported_paddle_lang(lang: Optional[str]) -> bool:
+    """Whether PaddleOCR has a model for a user-facing language code."""
+    return normalize_paddle_lang(lang) in PADDLE_LANGS
+
+
+def _resident_memory_bytes() -> int:
+    """Return the current resident set size of this process (0 if unknown)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class OCRModelRegistry:
+    """
+    Lazily load one OCR model per language and keep the most recently used
+    ones in memory, evicting the least recently used when the resident
+    memory attributed to models exceeds the budget.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        max_memory_mb: Optional[int] = None,
+        memory_probe: Callable[[], int] = _resident_memory_bytes
+    ):
+        """
+        Args:
+            loader: Factory that builds a model for a language code
+            max_memory_mb: Memory budget for loaded models (default: OCR_MODEL_MEMORY_MB env or 2048)
+            memory_probe: Callable returning current resident memory in bytes
+        """
+        if max_memory_mb is None:
+            max_memory_mb = int(os.getenv("OCR_MODEL_MEMORY_MB", str(DEFAULT_MODEL_MEMORY_MB)))
+        self.loader = loader
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.memory_probe = memory_probe
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._known_sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, lang: str) -> Any:
+        """
+        Return the model for a language, loading it on first use.
+
+        Loading runs outside the registry lock so cache hits for other
+        languages are not blocked; concurrent requests for the same
+        language wait on a per-language lock and share one load.
+
+        Args:
+            lang: Language code (already normalized for the engine)
+
+        Returns:
+            Loaded OCR model instance
+        """
+        with self._lock:
+            model = self._hit(lang)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(lang, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                model = self._hit(lang)
+                if model is not None:
+                    return model
+                self.stats["misses"] += 1
+                self._make_room(self._expected_size(lang))
+
+            before = self.memory_probe()
+            model = self.loader(lang)
+            size = max(0, self.memory_probe() - before)
+
+            with self._lock:
+                self._models[lang] = model
+                self._sizes[lang] = size
+                self._known_sizes[lang] = size
+                logger.info(f"Loaded OCR model '{lang}' (~{size // (1024 * 1024)} MB resident)")
+
+                # The estimate may have been off; trim again but keep the new model
+                self._make_room(0, keep=lang)
+                return model
+
+    def _hit(self, lang: str) -> Any:
+        """Return a loaded model and mark it most recently used (caller holds the lock)."""
+        model = self._models.get(lang)
+        if model is not None:
+            self._models.move_to_end(lang)
+            self.stats["hits"] += 1
+        return model
+
+    def _expected_size(self, lang: str) -> int:
+        if lang in self._known_sizes:
+            return self._known_sizes[lang]
+        if self._sizes:
+            return sum(self._sizes.values()) // len(self._sizes)
+        return 0
+
+    def _make_room(self, incoming: int, keep: Optional[str] = None) -> None:
+        """Evict least recently used models until `incoming` bytes fit in the budget."""
+        while self._models and self.memory_in_use() + incoming > self.max_memory_bytes:
+            lang = next(iter(self._models))
+            if lang == keep:
+                break
+            self.evict(lang)
+
+    def evict(self, lang: str) -> bool:
+        """Drop a loaded model. Returns True if it was loaded."""
+        with self._lock:
+            model = self._models.pop(lang, None)
+            if model is None:
+                return False
+            self._sizes.pop(lang, None)
+            self.stats["evictions"] += 1
+            del model
+            gc.collect()
+            logger.info(f"Evicted OCR model '{lang}'")
+            return True
+
+    def memory_in_use(self) -> int:
+        """Resident memory attributed to currently loaded models, in bytes."""
+        return sum(self._sizes.values())
+
+    def loaded_languages(self) -> list:
+        """Loaded languages, least recently used first."""
+        return list(self._models.keys())
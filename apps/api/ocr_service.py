@@ -2,11 +2,31 @@
 
 import os
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 import logging
 
+from ocr_merge import merge_ocr_boxes
+from ocr_models import OCRModelRegistry, is_supported_paddle_lang, normalize_paddle_lang
+from raster_cache import load_raster
+
 logger = logging.getLogger(__name__)
 
+# Language codes → Tesseract traineddata names
+TESSERACT_LANG_ALIASES = {
+    "en": "eng",
+    "ru": "rus",
+    "de": "deu",
+    "fr": "fra",
+    "es": "spa",
+    "it": "ita",
+    "pt": "por",
+    "uk": "ukr",
+    "ja": "jpn",
+    "ko": "kor",
+    "zh": "chi_sim",
+}
+DEFAULT_TESSERACT_LANG = "eng+rus"  # English and Russian
+
 # Try to import PaddleOCR first, fallback to Tesseract
 def _detect_ocr_engine():
     """Detect and test available OCR engines."""
@@ -49,7 +69,8 @@ class OCRService:
     
     def __init__(self):
         self.ocr_engine, self.ocr_imports = OCR_ENGINE, OCR_IMPORTS
-        self.ocr = None
+        self.models = None
+        self._tesseract_langs = None
         self._initialize_ocr()
     
     def _initialize_ocr(self):
@@ -57,17 +78,22 @@ class OCRService:
         if self.ocr_engine == "paddleocr":
             try:
                 PaddleOCR = self.ocr_imports
-                # Initialize PaddleOCR with English and Russian support
-                self.ocr = PaddleOCR(
-                    lang='en',
-                    use_angle_cls=True,
-                    show_log=False
+                # PaddleOCR models are single-language: load one per language on demand
+                self.models = OCRModelRegistry(
+                    loader=lambda lang: PaddleOCR(
+                        lang=lang,
+                        use_angle_cls=True,
+                        show_log=False
+                    )
                 )
+                # Load the default language up front so startup failures surface early.
+                # No reference is kept: the registry alone owns models so eviction frees them.
+                self.models.get(normalize_paddle_lang(None))
                 logger.info("PaddleOCR initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize PaddleOCR: {e}")
                 self.ocr_engine = None
-                self.ocr = None
+                self.models = None
         elif self.ocr_engine == "tesseract":
             try:
                 pytesseract, _ = self.ocr_imports
@@ -78,12 +104,45 @@ class OCRService:
                 logger.error(f"Tesseract not available: {e}")
                 self.ocr_engine = None
     
-    def extract_text_with_bboxes(self, image_path: Path) -> List[Dict[str, Any]]:
+    def supports_lang(self, lang: Optional[str]) -> bool:
+        """
+        Whether the active engine can read text in a language.
+
+        Args:
+            lang: User-facing language code (Tesseract also accepts "eng+rus" style codes)
+
+        Returns:
+            True if OCR can run for the language (also when no engine is available,
+            which is reported separately)
+        """
+        if not lang or self.ocr_engine is None:
+            return True
+        if self.ocr_engine == "paddleocr":
+            return is_supported_paddle_lang(lang)
+        if self._tesseract_langs is None:
+            pytesseract, _ = self.ocr_imports
+            try:
+                self._tesseract_langs = set(pytesseract.get_languages(config=""))
+            except Exception as e:
+                logger.warning(f"Could not list Tesseract languages: {e}")
+                return True
+        codes = TESSERACT_LANG_ALIASES.get(lang.lower(), lang).split("+")
+        return all(code in self._tesseract_langs for code in codes)
+
+    def extract_text_with_bboxes(
+        self,
+        image_path: Path,
+        merge_level: Optional[str] = None,
+        lang: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Extract text and bounding boxes from an image.
         
         Args:
             image_path: Path to the image file
+            lang: Language of the text in the image (default: OCR_DEFAULT_LANG env or "en";
+                  Tesseract falls back to English + Russian)
+            merge_level: "word", "line" or "paragraph" (default: OCR_MERGE_LEVEL env or "paragraph")
             
         Returns:
             List of dictionaries with 'text', 'bbox', and 'confidence' keys
@@ -94,21 +153,41 @@ class OCRService:
         if self.ocr_engine is None:
             raise RuntimeError("No OCR engine available. Install paddleocr or pytesseract.")
         
+        if not self.supports_lang(lang):
+            raise ValueError(f"Unsupported OCR language: {lang}")
+        
         if self.ocr_engine == "paddleocr":
-            return self._extract_with_paddleocr(image_path)
+            boxes = self._extract_with_paddleocr(image_path, lang)
         elif self.ocr_engine == "tesseract":
-            return self._extract_with_tesseract(image_path)
+            boxes = self._extract_with_tesseract(image_path, lang)
         else:
             raise RuntimeError("Unsupported OCR engine")
+        
+        # Group word/line boxes into larger units to cut translation and drawing calls
+        if merge_level is None:
+            merge_level = os.getenv("OCR_MERGE_LEVEL", "paragraph")
+        merged = merge_ocr_boxes(boxes, level=merge_level)
+        if len(merged) != len(boxes):
+            logger.info(f"Merged {len(boxes)} OCR boxes into {len(merged)} ({merge_level} level)")
+        return merged
     
-    def _extract_with_paddleocr(self, image_path: Path) -> List[Dict[str, Any]]:
+    def _extract_with_paddleocr(self, image_path: Path, lang: Optional[str] = None) -> List[Dict[str, Any]]:
         """Extract text using PaddleOCR."""
-        if self.ocr is None:
+        if self.models is None:
             raise RuntimeError("PaddleOCR not initialized")
             
         try:
+            # Route to the model for this language (loaded lazily, LRU-evicted)
+            ocr = self.models.get(normalize_paddle_lang(lang))
+            
+            # Feed the decoded raster (BGR array) instead of making PaddleOCR re-read the file
+            try:
+                image_input = load_raster(image_path).to_array(bgr=True)
+            except ImportError:
+                image_input = str(image_path)
+            
             # Run OCR
-            result = self.ocr.ocr(str(image_path), cls=True)
+            result = ocr.ocr(image_input, cls=True)
             
             boxes = []
             if result and result[0]:
@@ -138,22 +217,21 @@ class OCRService:
             logger.error(f"PaddleOCR failed on {image_path}: {e}")
             raise RuntimeError(f"OCR failed: {e}")
     
-    def _extract_with_tesseract(self, image_path: Path) -> List[Dict[str, Any]]:
+    def _extract_with_tesseract(self, image_path: Path, lang: Optional[str] = None) -> List[Dict[str, Any]]:
         """Extract text using Tesseract."""
         if self.ocr_engine != "tesseract" or self.ocr_imports is None:
             raise RuntimeError("Tesseract not available")
             
         try:
-            _, Image = self.ocr_imports
-            # Open image
-            image = Image.open(image_path)
+            # Use the decoded raster shared with other stages
+            image = load_raster(image_path).to_pil()
             
             pytesseract, _ = self.ocr_imports
             # Run OCR with bounding box data
             data = pytesseract.image_to_data(
                 image,
                 output_type=pytesseract.Output.DICT,
-                lang='eng+rus'  # English and Russian
+                lang=TESSERACT_LANG_ALIASES.get(lang.lower(), lang) if lang else DEFAULT_TESSERACT_LANG
             )
             
             boxes = []
@@ -193,14 +271,25 @@ class OCRService:
 ocr_service = OCRService()
 
 
-def perform_ocr_on_image(image_path: Path) -> List[Dict[str, Any]]:
+def perform_ocr_on_image(
+    image_path: Path,
+    merge_level: Optional[str] = None,
+    lang: Optional[str] = None
+) -> List[Dict[str, Any]]:
     """
     Perform OCR on an image and return text with bounding boxes.
     
     Args:
         image_path: Path to the image file
+        lang: Language of the text in the image (selects the OCR model)
+        merge_level: "word", "line" or "paragraph" (default: OCR_MERGE_LEVEL env or "paragraph")
         
     Returns:
         List of dictionaries with 'text', 'bbox', and 'confidence' keys
     """
-    return ocr_service.extract_text_with_bboxes(image_path)
\ No newline at end of file
+    return ocr_service.extract_text_with_bboxes(image_path, merge_level=merge_level, lang=lang)
+
+
+def is_supported_ocr_lang(lang: Optional[str]) -> bool:
+    """Whether the active OCR engine has a model for a language code."""
+    return ocr_service.supports_lang(lang)
@@ -11,6 +11,7 @@ import logging
 from PIL import Image
 import io
 
+from raster_cache import raster_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +26,13 @@ def encode_png_to_data_url(path: Path) -> str:
     Returns:
         Data URL string in format: data:image/png;base64,...
     """
-    with open(path, "rb") as f:
-        image_bytes = f.read()
+    # Reuse the bytes kept by the renderer when available
+    cached = raster_cache.get(path)
+    if cached is not None and cached.png_bytes:
+        image_bytes = cached.png_bytes
+    else:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
     
     encoded = base64.b64encode(image_bytes).decode("utf-8")
     return f"data:image/png;base64,{encoded}"
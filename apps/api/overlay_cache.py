@@ -0,0 +1,104 @@
+"""Per-page cache of generated overlay pages.
+
+Each overlaid page is stored as a compressed single-page PDF (background
+and covers, without the overlay font) plus its report stats and text runs,
+keyed by a hash of everything that affects its rendering (blocks, scope,
+DPI, background, font). After an edit only the pages whose key changed
+are rendered again; the rest are spliced in from the cache.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_CACHE_DIRNAME = "overlay_cache"
+# Bump when page rendering changes in a way that invalidates cached pages
+OVERLAY_CACHE_VERSION = 2
+
+
+def file_stamp(path: Optional[Path]) -> Optional[list]:
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+
+def page_cache_key(page_data: Dict[str, Any], **params: Any) -> str:
+    """
+    Hash of a page's blocks and the generation parameters.
+
+    Args:
+        page_data: Vision data for the page (page number and blocks)
+        **params: Anything else that changes the output (scope, dpi, background, ...)
+
+    Returns:
+        Hex digest identifying the rendered page
+    """
+    payload = {
+        "version": OVERLAY_CACHE_VERSION,
+        "page": page_data.get("page"),
+        "blocks": page_data.get("blocks", []),
+        "params": params,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class OverlayPageCache:
+    """Directory of page_N.<key>.pdf / page_N.<key>.json pairs for one output variant."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _paths(self, page_num: int, key: str) -> Tuple[Path, Path]:
+        stem = f"page_{page_num}.{key}"
+        return self.cache_dir / f"{stem}.pdf", self.cache_dir / f"{stem}.json"
+
+    def get(self, page_num: int, key: str) -> Optional[Tuple[bytes, Dict[str, Any], List[list]]]:
+        """Return (single-page PDF bytes, page stats, text runs) or None if not cached."""
+        pdf_path, stats_path = self._paths(page_num, key)
+        try:
+            with open(stats_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            pdf_bytes = pdf_path.read_bytes()
+            page_stats, text_runs = entry["stats"], entry["text"]
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return pdf_bytes, page_stats, text_runs
+
+    def put(self, page_num: int, key: str, pdf_bytes: bytes, page_stats: Dict[str, Any], text_runs: List[list]) -> None:
+        """Store a rendered page and drop older entries for the same page."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        pdf_path, stats_path = self._paths(page_num, key)
+        try:
+            # Write PDF before stats: an entry counts as present once its stats exist
+            entry = json.dumps({"stats": page_stats, "text": text_runs}, ensure_ascii=False).encode("utf-8")
+            for path, data in ((pdf_path, pdf_bytes), (stats_path, entry)):
+                tmp_path = path.with_suffix(path.suffix + ".tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to cache overlay page {page_num}: {e}")
+            return
+        self._prune(page_num, keep=key)
+
+    def _prune(self, page_num: int, keep: str) -> None:
+        for path in self.cache_dir.glob(f"page_{page_num}.*"):
+            if path.name.split(".")[1] != keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,214 @@
+"""Chunked rendering of long HTML documents.
+
+A long document is split at top-level headings and page-break markers into
+a few chunks of similar size. The chunks are rendered concurrently (each in
+its own pooled Chromium page) and the PDFs are merged with PyMuPDF.
+
+Links between chunks cannot be resolved by the renderer. They are rewritten
+to placeholder URIs, and every target gets a 1px placeholder link of its
+own. After merging, both are turned back into internal GoTo links pointing
+at the target's page and position.
+"""
+
+import re
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+CHUNK_LINK_BASE = "https://pdf-chunk.invalid/"
+ANCHOR_PREFIX = CHUNK_LINK_BASE + "anchor/"
+TARGET_PREFIX = CHUNK_LINK_BASE + "target/"
+
+# Split before every <h1> and at explicit page breaks
+SPLIT_RE = re.compile(
+    r"<h1[\s>]|<!--\s*pagebreak\s*-->"
+    r"|<[a-z][a-z0-9]*\b[^>]*style=\"[^\"]*(?:page-break-before:\s*always|break-before:\s*page)[^\"]*\"[^>]*>",
+    re.I
+)
+BODY_RE = re.compile(r"<body[^>]*>(.*)</body>", re.S | re.I)
+ID_RE = re.compile(r"\bid=\"([^\"]+)\"")
+HREF_RE = re.compile(r"href=\"#([^\"]+)\"")
+
+TARGET_MARKER = '<a class="chunk-target" href="{href}" style="display:inline-block;width:1px;height:1px"></a>'
+CONTINUATION_CSS = {
+    "top": "<style>body { margin-top: 0 !important; padding-top: 0 !important; }</style>",
+    "bottom": "<style>body { margin-bottom: 0 !important; padding-bottom: 0 !important; }</style>",
+}
+
+
+def _sections(body: str) -> List[str]:
+    """Split body HTML at heading / page-break boundaries."""
+    cuts = [m.start() for m in SPLIT_RE.finditer(body) if m.start() > 0]
+    bounds = [0] + cuts + [len(body)]
+    return [body[a:b] for a, b in zip(bounds, bounds[1:]) if body[a:b].strip()]
+
+
+def _group(sections: List[str], chunks: int) -> List[str]:
+    """Group consecutive sections into at most `chunks` parts of similar length."""
+    total = sum(len(s) for s in sections)
+    target = total / chunks
+    groups, current, size = [], [], 0
+    for section in sections:
+        # Start a new group when most of this section lies past the next boundary
+        if current and len(groups) < chunks - 1 and size + len(section) / 2 > target * (len(groups) + 1):
+            groups.append("".join(current))
+            current = []
+        current.append(section)
+        size += len(section)
+    if current:
+        groups.append("".join(current))
+    return groups
+
+
+def _link_across_chunks(parts: List[str]) -> List[str]:
+    """Rewrite links whose target lives in another chunk to placeholder URIs."""
+    ids = [set(ID_RE.findall(part)) for part in parts]
+    owner = {}
+    for index, part_ids in enumerate(ids):
+        for anchor in part_ids:
+            owner.setdefault(anchor, index)
+
+    targets: Dict[int, set] = {}
+    linked = []
+    for index, part in enumerate(parts):
+        def rewrite(match, index=index):
+            anchor = match.group(1)
+            if anchor in ids[index] or anchor not in owner:
+                return match.group(0)
+            targets.setdefault(owner[anchor], set()).add(anchor)
+            return f'href="{ANCHOR_PREFIX}{quote(anchor)}"'
+        linked.append(HREF_RE.sub(rewrite, part))
+
+    for index, anchors in targets.items():
+        for anchor in anchors:
+            marker = TARGET_MARKER.format(href=TARGET_PREFIX + quote(anchor))
+            linked[index] = re.sub(
+                rf"(<[^>]*\bid=\"{re.escape(anchor)}\"[^>]*>)",
+                lambda m: m.group(1) + marker,
+                linked[index],
+                count=1
+            )
+    return linked
+
+
+def split_html(html: str, chunks: int) -> Optional[List[str]]:
+    """
+    Split an HTML document into standalone chunk documents.
+
+    Args:
+        html: Complete HTML document
+        chunks: Maximum number of chunks
+
+    Returns:
+        List of HTML documents in order, or None if the document cannot be split
+    """
+    match = BODY_RE.search(html)
+    if chunks < 2 or not match:
+        return None
+    sections = _sections(match.group(1))
+    if len(sections) < 2:
+        return None
+
+    parts = _link_across_chunks(_group(sections, chunks))
+    if len(parts) < 2:
+        return None
+
+    head, tail = html[:match.start(1)], html[match.end(1):]
+    documents = []
+    for index, part in enumerate(parts):
+        # Later chunks continue on a fresh page: drop the body margin Chromium applies only once
+        css = ""
+        if index > 0:
+            css += CONTINUATION_CSS["top"]
+        if index < len(parts) - 1:
+            css += CONTINUATION_CSS["bottom"]
+        chunk_head = head.replace("</head>", css + "</head>", 1) if "</head>" in head else head
+        documents.append(chunk_head + part + tail)
+    return documents
+
+
+def merge_chunk_pdfs(pdfs: List[bytes]) -> Tuple[bytes, int]:
+    """
+    Concatenate chunk PDFs and resolve links between chunks.
+
+    Args:
+        pdfs: Chunk PDFs in document order
+
+    Returns:
+        Tuple of (merged PDF bytes, number of cross-chunk links resolved)
+    """
+    merged = fitz.open()
+    try:
+        for data in pdfs:
+            with fitz.open(stream=data, filetype="pdf") as part:
+                # Links inside a chunk are kept and re-targeted by insert_pdf
+                merged.insert_pdf(part)
+
+        targets = {}
+        anchors = []
+        for page in merged:
+            for link in page.get_links():
+                uri = link.get("uri") or ""
+                if uri.startswith(TARGET_PREFIX):
+                    targets.setdefault(unquote(uri[len(TARGET_PREFIX):]), (page.number, link["from"].top_left))
+                    page.delete_link(link)
+                elif uri.startswith(ANCHOR_PREFIX):
+                    anchors.append((page.number, link))
+
+        resolved = 0
+        for page_number, link in anchors:
+            page = merged[page_number]
+            page.delete_link(link)
+            target = targets.get(unquote(link["uri"][len(ANCHOR_PREFIX):]))
+            if target is None:
+                continue
+            page.insert_link({"kind": fitz.LINK_GOTO, "from": link["from"], "page": target[0], "to": target[1]})
+            resolved += 1
+
+        return merged.tobytes(garbage=3, deflate=True), resolved
+    finally:
+        merged.close()
+
+
+async def render_chunked(
+    html_path: Path,
+    render: Callable[[Path], Awaitable[bytes]],
+    chunks: int
+) -> Optional[bytes]:
+    """
+    Render an HTML file in concurrent chunks and merge the results.
+
+    Chunk files are written next to html_path so relative URLs keep working.
+
+    Args:
+        html_path: HTML file to render
+        render: Coroutine rendering one HTML file to PDF bytes
+        chunks: Maximum number of chunks
+
+    Returns:
+        Merged PDF bytes, or None if the document has nothing to split at
+    """
+    documents = split_html(html_path.read_text(encoding="utf-8"), chunks)
+    if documents is None:
+        return None
+
+    paths = []
+    try:
+        for index, document in enumerate(documents, 1):
+            path = html_path.with_name(f"{html_path.stem}.chunk{index}{html_path.suffix}")
+            path.write_text(document, encoding="utf-8")
+            paths.append(path)
+        pdfs = await asyncio.gather(*(render(path) for path in paths))
+    finally:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    merged, resolved = await asyncio.to_thread(merge_chunk_pdfs, list(pdfs))
+    logger.info(f"Rendered {html_path.name} in {len(paths)} chunks ({resolved} cross-chunk links)")
+    return merged
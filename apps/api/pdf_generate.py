@@ -1,10 +1,13 @@
-"""PDF generation utilities using Playwright."""
+"""PDF generation utilities using Playwright, with a PyMuPDF Story fallback."""
 
+import os
 import asyncio
 import logging
 import sys
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
 from pathlib import Path
+from urllib.parse import unquote, urlsplit
 
 try:
     from playwright.async_api import async_playwright
@@ -12,12 +15,129 @@ try:
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
 
+from browser_pool import browser_pool, launch_browser, BrowserPoolBusy
+from story_pdf import html_file_to_pdf_bytes_story
+from pdf_chunks import render_chunked
+
 logger = logging.getLogger(__name__)
 
+# "auto" uses Chromium when it can be started and falls back to Story
+PDF_ENGINES = ("auto", "chromium", "story")
+
+# HTML files at least this large are rendered by Chromium in parallel chunks
+DEFAULT_CHUNKED_RENDER_MIN_BYTES = 1_000_000
+
+PDF_OPTIONS = {
+    "format": "A4",
+    "print_background": True,
+    "prefer_css_page_size": True,
+    "margin": {
+        "top": "0mm",
+        "right": "0mm",
+        "bottom": "0mm",
+        "left": "0mm"
+    }
+}
+
+
+MD_ASSET_PATH = "/api/md-asset/{job_id}/"
+
+
+def resolve_asset_path(url: str, job_id: str, assets_dir: Path) -> Optional[Path]:
+    """
+    Map an md-asset API URL to a file inside the job's assets directory.
+
+    Args:
+        url: Requested URL (any host; only the path is used)
+        job_id: Job identifier the assets belong to
+        assets_dir: Directory holding the job's assets
+
+    Returns:
+        Path to the asset, or None if the URL is not an asset of this job,
+        escapes assets_dir or the file does not exist
+    """
+    marker = MD_ASSET_PATH.format(job_id=job_id)
+    path = unquote(urlsplit(url).path)
+    index = path.find(marker)
+    if index < 0:
+        return None
+
+    root = assets_dir.resolve()
+    candidate = (root / path[index + len(marker):]).resolve()
+    # Same path traversal protection as the /api/md-asset endpoint
+    if root not in candidate.parents or not candidate.is_file():
+        return None
+    return candidate
+
+
+@asynccontextmanager
+async def serve_job_assets(page, job_id: str, assets_dir: Path):
+    """
+    Answer md-asset requests from disk while the block is active.
+
+    Chromium would otherwise fetch every image over HTTP from this API while
+    the API is awaiting the render (a deadlock on single-worker deployments).
+    The route is removed on exit because pooled pages are reused.
+
+    Args:
+        page: Playwright page
+        job_id: Job whose assets are served
+        assets_dir: Directory holding the job's assets
+    """
+    pattern = f"**{MD_ASSET_PATH.format(job_id=job_id)}**"
+    served = {"hits": 0, "missing": 0}
+
+    async def handler(route):
+        asset_path = resolve_asset_path(route.request.url, job_id, assets_dir)
+        if asset_path is None:
+            served["missing"] += 1
+            await route.fulfill(status=404, body="Asset not found")
+        else:
+            served["hits"] += 1
+            await route.fulfill(path=str(asset_path))
+
+    await page.route(pattern, handler)
+    try:
+        yield served
+    finally:
+        try:
+            await page.unroute(pattern, handler)
+        except Exception:
+            # Page may have crashed; the pool replaces it on next use
+            pass
+        logger.info(f"Served {served['hits']} assets from disk ({served['missing']} missing)")
+
+
+@asynccontextmanager
+async def _render_page():
+    """
+    Yield a Chromium page for one render.
+
+    Uses the app's browser pool when it is running on this event loop;
+    otherwise (CLI, pool disabled or failed to start) launches a browser
+    for this render only.
+    """
+    if browser_pool.usable():
+        async with browser_pool.page() as page:
+            yield page
+        return
+
+    if not PLAYWRIGHT_AVAILABLE:
+        raise RuntimeError(
+            "Playwright not installed. Run: pip install playwright && python -m playwright install chromium"
+        )
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        try:
+            yield await browser.new_page()
+        finally:
+            await browser.close()
+
 
 async def html_to_pdf_bytes_async(html: str) -> bytes:
     """
-    Convert HTML string to PDF bytes using Playwright with fallback mechanisms.
+    Convert HTML string to PDF bytes using Playwright.
     
     Args:
         html: HTML content as string
@@ -27,104 +147,20 @@ async def html_to_pdf_bytes_async(html: str) -> bytes:
         
     Raises:
         RuntimeError: If Playwright or browser is not available
+        BrowserPoolBusy: If the browser pool queue is full
     """
-    if not PLAYWRIGHT_AVAILABLE:
-        raise RuntimeError(
-            "Playwright not installed. Run: pip install playwright && python -m playwright install chromium"
-        )
-    
-    # Try different browser launch methods in order of preference
-    launch_methods = [
-        ("chromium", {}),
-        ("chromium", {"channel": "chrome"}),
-        ("chromium", {"executable_path": "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"}),
-        ("chromium", {"executable_path": "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"})
-    ]
-    
-    last_exception = None
-    
-    for browser_type, kwargs in launch_methods:
-        try:
-            logger.info(f"Attempting to launch {browser_type} with args: {kwargs}")
-            
-            async with async_playwright() as p:
-                # Add safe arguments for macOS compatibility
-                launch_args = {
-                    "headless": True,
-                    "args": [
-                        "--no-sandbox",
-                        "--disable-setuid-sandbox", 
-                        "--disable-dev-shm-usage",
-                        "--disable-gpu"
-                    ]
-                }
-                launch_args.update(kwargs)
-                
-                browser = await getattr(p, browser_type).launch(**launch_args)
-                try:
-                    page = await browser.new_page()
-                    
-                    # Set content and wait for network idle
-                    await page.set_content(html, wait_until="networkidle")
-                    
-                    # Generate PDF
-                    pdf_bytes = await page.pdf(
-                        format="A4",
-                        print_background=True,
-                        prefer_css_page_size=True,
-                        margin={
-                            "top": "0mm",
-                            "right": "0mm", 
-                            "bottom": "0mm",
-                            "left": "0mm"
-                        }
-                    )
-                    
-                    logger.info(f"Successfully generated PDF using {browser_type}")
-                    return pdf_bytes
-                finally:
-                    await browser.close()
-                    
-        except Exception as e:
-            error_msg = str(e).lower()
-            logger.warning(f"Failed to launch {browser_type} with {kwargs}: {e}")
-            last_exception = e
-            
-            # Early exit for certain fatal errors
-            if "permission denied" in error_msg or "access denied" in error_msg:
-                raise RuntimeError(
-                    f"Permission denied when launching browser. "
-                    f"Try: chmod +x /Applications/Google\ Chrome.app/Contents/MacOS/Google\ Chrome"
-                ) from e
-            elif "sandbox" in error_msg and ("signal 6" in error_msg or "sigsegv" in error_msg):
-                raise RuntimeError(
-                    f"Sandbox error occurred. "
-                    f"Try: make api-playwright-install or use system Chrome"
-                ) from e
-            
-            # Continue to next method
-            continue
-    
-    # If all methods failed
-    if last_exception:
-        error_details = str(last_exception)
-        if "executable doesn't exist" in error_details.lower():
-            debug_hint = "Install Playwright Chromium: make api-playwright-install"
-        elif "browser closed" in error_details.lower():
-            debug_hint = "Browser crashed unexpectedly. Check system resources and try again."
-        elif "permission denied" in error_details.lower():
-            debug_hint = "Permission issue with browser executable. Check file permissions."
-        elif "sandbox" in error_details.lower() and "signal 6" in error_details.lower():
-            debug_hint = "Sandbox crash. Try installing fresh Playwright browsers or use system Chrome."
-        else:
-            debug_hint = "Unknown browser launch error. Check logs for details."
-            
-        raise RuntimeError(
-            f"All browser launch attempts failed. Last error: {error_details}. "
-            f"Debug hint: {debug_hint}"
-        ) from last_exception
-    
-    raise RuntimeError("Failed to generate PDF: No working browser found")
+    async with _render_page() as page:
+        # Pooled pages are reused: reset media emulation from earlier renders
+        await page.emulate_media(media="print")
+        
+        # Set content and wait for network idle
+        await page.set_content(html, wait_until="networkidle")
+        
+        # Generate PDF
+        pdf_bytes = await page.pdf(**PDF_OPTIONS)
+        
+        logger.info("Successfully generated PDF using chromium")
+        return pdf_bytes
 
 
 # Keep sync wrapper for CLI usage only
@@ -145,117 +181,171 @@ def html_to_pdf_bytes_sync(html: str) -> bytes:
 html_to_pdf_bytes = html_to_pdf_bytes_async
 
 
-async def generate_pdf_from_html_file(html_path: Path, output_pdf: Path):
+async def html_file_to_pdf_bytes_async(
+    html_path: Path,
+    media: str = "print",
+    job_id: Optional[str] = None,
+    assets_dir: Optional[Path] = None
+) -> bytes:
     """
-    Generate PDF from HTML file using Playwright with fallback mechanisms.
-    This ensures relative assets are resolved correctly.
+    Convert an HTML file to PDF bytes by navigating to it.
+    
+    Unlike html_to_pdf_bytes_async the document is not pushed through
+    set_content, and relative images are loaded by Chromium from disk.
     
     Args:
-        html_path: Path to HTML file
-        output_pdf: Output PDF path
+        html_path: Path to HTML file (relative links resolve against its directory)
+        media: CSS media type to emulate
+        job_id: Job whose md-asset URLs are answered from assets_dir
+        assets_dir: Directory with the job's assets (enables request interception)
+        
+    Returns:
+        PDF content as bytes
+        
+    Raises:
+        RuntimeError: If Playwright or browser is not available
+        BrowserPoolBusy: If the browser pool queue is full
     """
-    if not PLAYWRIGHT_AVAILABLE:
-        raise RuntimeError(
-            "Playwright not installed. Run: pip install playwright && python -m playwright install chromium"
-        )
+    async with _render_page() as page:
+        # Pooled pages are reused: set media emulation for this render
+        await page.emulate_media(media=media)
+        url = f"file://{html_path.resolve()}"
+        # Only local files are referenced, so the load event is enough
+        if job_id and assets_dir is not None:
+            async with serve_job_assets(page, job_id, assets_dir):
+                await page.goto(url, wait_until="load")
+        else:
+            await page.goto(url, wait_until="load")
+        
+        pdf_bytes = await page.pdf(**PDF_OPTIONS)
+        
+        logger.info("Successfully generated PDF using chromium")
+        return pdf_bytes
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """
+    Validate a requested PDF engine, defaulting to PDF_ENGINE env or "auto".
     
-    # Try different browser launch methods in order of preference
-    launch_methods = [
-        ("chromium", {}),
-        ("chromium", {"channel": "chrome"}),
-        ("chromium", {"executable_path": "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"}),
-        ("chromium", {"executable_path": "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"})
-    ]
+    Raises:
+        ValueError: If the engine is not one of PDF_ENGINES
+    """
+    engine = (engine or os.getenv("PDF_ENGINE", "auto")).lower()
+    if engine not in PDF_ENGINES:
+        raise ValueError(f"Invalid engine. Must be one of: {', '.join(PDF_ENGINES)}")
+    return engine
+
+
+def chromium_available() -> bool:
+    """True if a Chromium render can at least be attempted."""
+    return browser_pool.usable() or PLAYWRIGHT_AVAILABLE
+
+
+def auto_chunk_count(html_path: Path) -> int:
+    """
+    Number of chunks for a Chromium render of html_path.
     
-    last_exception = None
+    Files smaller than CHUNKED_RENDER_MIN_BYTES (default 1 MB) are rendered
+    whole; larger ones are split into CHUNKED_RENDER_CHUNKS chunks (default:
+    one per browser pool page).
+    """
+    min_bytes = int(os.getenv("CHUNKED_RENDER_MIN_BYTES", str(DEFAULT_CHUNKED_RENDER_MIN_BYTES)))
+    if html_path.stat().st_size < min_bytes:
+        return 1
+    return int(os.getenv("CHUNKED_RENDER_CHUNKS", str(max(2, browser_pool.size))))
+
+
+async def render_html_file(
+    html_path: Path,
+    engine: Optional[str] = None,
+    media: str = "print",
+    job_id: Optional[str] = None,
+    assets_dir: Optional[Path] = None,
+    chunks: Optional[int] = None
+) -> Tuple[bytes, str]:
+    """
+    Render an HTML file to PDF with the selected engine.
+    
+    Args:
+        html_path: Path to HTML file
+        engine: One of PDF_ENGINES (default: PDF_ENGINE env or "auto")
+        media: CSS media type to emulate
+        job_id: Job whose md-asset URLs are served from assets_dir
+        assets_dir: Directory with the job's assets
+        chunks: Chromium only: render in up to this many parallel chunks
+            (default: auto_chunk_count; 1 renders the file whole)
+        
+    Returns:
+        Tuple of (PDF bytes, engine actually used)
+        
+    Raises:
+        ValueError: If the engine name is invalid
+        RuntimeError: If Chromium was requested explicitly and is not available
+        BrowserPoolBusy: If the browser pool queue is full
+    """
+    engine = resolve_engine(engine)
     
-    for browser_type, kwargs in launch_methods:
+    if engine == "auto" and not chromium_available():
+        logger.info("Chromium not available, using Story engine")
+        engine = "story"
+    
+    if engine != "story":
+        async def render(path: Path) -> bytes:
+            return await html_file_to_pdf_bytes_async(path, media=media, job_id=job_id, assets_dir=assets_dir)
+        
         try:
-            logger.info(f"Attempting to launch {browser_type} with args: {kwargs}")
-            
-            async with async_playwright() as p:
-                # Add safe arguments for macOS compatibility
-                launch_args = {
-                    "headless": True,
-                    "args": [
-                        "--no-sandbox",
-                        "--disable-setuid-sandbox",
-                        "--disable-dev-shm-usage", 
-                        "--disable-gpu"
-                    ]
-                }
-                launch_args.update(kwargs)
-                
-                browser = await getattr(p, browser_type).launch(**launch_args)
-                try:
-                    page = await browser.new_page()
-                    
-                    # Navigate to the HTML file (ensures relative paths work)
-                    await page.goto(f"file://{html_path.resolve()}", wait_until="networkidle")
-                    await page.emulate_media(media="screen")
-                    
-                    # Generate PDF
-                    pdf_bytes = await page.pdf(
-                        format="A4",
-                        print_background=True,
-                        prefer_css_page_size=True,
-                        margin={
-                            "top": "0mm",
-                            "right": "0mm",
-                            "bottom": "0mm", 
-                            "left": "0mm"
-                        }
-                    )
-                    
-                    # Write to output file
-                    output_pdf.parent.mkdir(parents=True, exist_ok=True)
-                    output_pdf.write_bytes(pdf_bytes)
-                    
-                    logger.info(f"Successfully generated PDF using {browser_type}")
-                    return
-                finally:
-                    await browser.close()
-                    
+            if chunks is None:
+                chunks = auto_chunk_count(html_path)
+            pdf_bytes = await render_chunked(html_path, render, chunks) if chunks > 1 else None
+            if pdf_bytes is None:
+                pdf_bytes = await render(html_path)
+            return pdf_bytes, "chromium"
+        except BrowserPoolBusy:
+            # Capacity problem, not a broken browser: let the caller answer 503
+            raise
         except Exception as e:
-            error_msg = str(e).lower()
-            logger.warning(f"Failed to launch {browser_type} with {kwargs}: {e}")
-            last_exception = e
-            
-            # Early exit for certain fatal errors
-            if "permission denied" in error_msg or "access denied" in error_msg:
-                raise RuntimeError(
-                    f"Permission denied when launching browser. "
-                    f"Try: chmod +x /Applications/Google\ Chrome.app/Contents/MacOS/Google\ Chrome"
-                ) from e
-            elif "sandbox" in error_msg and ("signal 6" in error_msg or "sigsegv" in error_msg):
-                raise RuntimeError(
-                    f"Sandbox error occurred. "
-                    f"Try: make api-playwright-install or use system Chrome"
-                ) from e
-            
-            # Continue to next method
-            continue
+            if engine == "chromium":
+                raise
+            logger.warning(f"Chromium render failed, falling back to Story engine: {e}")
     
-    # If all methods failed
-    if last_exception:
-        error_details = str(last_exception)
-        if "executable doesn't exist" in error_details.lower():
-            debug_hint = "Install Playwright Chromium: make api-playwright-install"
-        elif "browser closed" in error_details.lower():
-            debug_hint = "Browser crashed unexpectedly. Check system resources and try again."
-        elif "permission denied" in error_details.lower():
-            debug_hint = "Permission issue with browser executable. Check file permissions."
-        elif "sandbox" in error_details.lower() and "signal 6" in error_details.lower():
-            debug_hint = "Sandbox crash. Try installing fresh Playwright browsers or use system Chrome."
-        else:
-            debug_hint = "Unknown browser launch error. Check logs for details."
-            
-        raise RuntimeError(
-            f"All browser launch attempts failed. Last error: {error_details}. "
-            f"Debug hint: {debug_hint}"
-        ) from last_exception
+    # Story layout is CPU-bound; keep it off the event loop
+    pdf_bytes = await asyncio.to_thread(
+        html_file_to_pdf_bytes_story, html_path, media=media, job_id=job_id, assets_dir=assets_dir
+    )
+    return pdf_bytes, "story"
+
+
+async def generate_pdf_from_html_file(
+    html_path: Path,
+    output_pdf: Path,
+    job_id: Optional[str] = None,
+    assets_dir: Optional[Path] = None,
+    engine: Optional[str] = None,
+    chunks: Optional[int] = None
+) -> str:
+    """
+    Generate PDF from HTML file.
+    This ensures relative assets are resolved correctly.
     
-    raise RuntimeError("Failed to generate PDF: No working browser found")
+    Args:
+        html_path: Path to HTML file
+        output_pdf: Output PDF path
+        job_id: Job whose md-asset URLs are answered from assets_dir
+        assets_dir: Directory with the job's assets (enables request interception)
+        engine: One of PDF_ENGINES (default: PDF_ENGINE env or "auto")
+        chunks: Parallel Chromium chunks (default: automatic for large files)
+        
+    Returns:
+        Engine used ("chromium" or "story")
+    """
+    pdf_bytes, engine_used = await render_html_file(
+        html_path, engine=engine, media="screen", job_id=job_id, assets_dir=assets_dir, chunks=chunks
+    )
+    
+    # Write to output file
+    output_pdf.parent.mkdir(parents=True, exist_ok=True)
+    output_pdf.write_bytes(pdf_bytes)
+    return engine_used
 
 
 async def generate_pdf_from_html(html_path: Path, output_pdf: Path):
@@ -0,0 +1,210 @@
+"""Optional post-processing of generated PDFs to reduce their size.
+
+Steps: downsample images to a print DPI, recompress them as JPEG, then
+garbage-collect, deflate and deduplicate objects. Linearization is done
+by MuPDF when it still supports it, otherwise by qpdf if installed.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DPI = 150
+MIN_TARGET_DPI = 36          # Below this downsampled images are unreadable
+DEFAULT_JPEG_QUALITY = 80
+DPI_THRESHOLD_MARGIN = 1.1   # Leave images alone unless they exceed the target by 10%
+MIN_IMAGE_SIDE_PX = 16       # Tiny images (icons, rules) are not worth recompressing
+
+
+def validate_optimize_options(optimize: bool, target_dpi: Optional[int], linearize: bool) -> None:
+    """
+    Check the optimize / optimize_dpi / linearize request parameters.
+
+    Raises:
+        ValueError: If the DPI is below MIN_TARGET_DPI or linearize is requested without optimize
+    """
+    if target_dpi is not None and target_dpi < MIN_TARGET_DPI:
+        raise ValueError(f"Invalid optimize_dpi: {target_dpi}. Must be at least {MIN_TARGET_DPI}")
+    if linearize and not optimize:
+        raise ValueError("linearize requires optimize=true")
+
+
+def _rewrite_images(doc: "fitz.Document", target_dpi: int, quality: int) -> int:
+    """Downsample images to target_dpi and recompress them as JPEG.
+
+    Scaling is to the exact target (Document.rewrite_images only subsamples
+    by integer factors, which leaves a 288 DPI page image untouched at 150).
+
+    Returns:
+        Number of images replaced
+    """
+    rewritten = 0
+    done = set()
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, smask = img[0], img[1]
+            if xref in done or smask:
+                # Images with soft masks need alpha, which JPEG cannot carry
+                continue
+            done.add(xref)
+            rects = page.get_image_rects(xref)
+            if not rects:
+                continue
+            pix = fitz.Pixmap(doc, xref)
+            if pix.width < MIN_IMAGE_SIDE_PX or pix.height < MIN_IMAGE_SIDE_PX:
+                continue
+            if pix.n - pix.alpha not in (1, 3):
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+
+            # Effective resolution at the largest placement on the page
+            rect = max(rects, key=lambda r: r.width * r.height)
+            dpi = pix.width / max(rect.width / 72, 1e-6)
+            if dpi > target_dpi * DPI_THRESHOLD_MARGIN:
+                scale = target_dpi / dpi
+                pix = fitz.Pixmap(pix, max(1, int(pix.width * scale)), max(1, int(pix.height * scale)), None)
+
+            page.replace_image(xref, stream=pix.tobytes("jpeg", jpg_quality=quality))
+            rewritten += 1
+    return rewritten
+
+
+def _linearize_with_qpdf(pdf_bytes: bytes) -> Optional[bytes]:
+    """Linearize with qpdf if it is on PATH. Returns None when unavailable or failed."""
+    qpdf = shutil.which("qpdf")
+    if not qpdf:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "in.pdf"
+        dst = Path(tmp) / "out.pdf"
+        src.write_bytes(pdf_bytes)
+        result = subprocess.run([qpdf, "--linearize", str(src), str(dst)], capture_output=True, timeout=120)
+        # qpdf exit code 3 means success with warnings
+        if result.returncode not in (0, 3) or not dst.exists():
+            logger.warning(f"qpdf linearization failed: {result.stderr.decode(errors='replace').strip()}")
+            return None
+        return dst.read_bytes()
+
+
+def optimize_pdf_bytes(
+    pdf_bytes: bytes,
+    target_dpi: int = DEFAULT_TARGET_DPI,
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+    linearize: bool = False
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Optimize a PDF held in memory.
+
+    Args:
+        pdf_bytes: Input PDF content
+        target_dpi: Images above this effective resolution are downsampled to it
+        jpeg_quality: JPEG quality (1-100) for recompressed images
+        linearize: Linearize for fast first-page display (MuPDF or qpdf)
+
+    Returns:
+        Tuple of (optimized PDF bytes, report dict with before/after sizes)
+
+    Raises:
+        ValueError: If target_dpi is below MIN_TARGET_DPI or jpeg_quality is outside 1-100
+    """
+    if target_dpi < MIN_TARGET_DPI:
+        raise ValueError(f"target_dpi must be at least {MIN_TARGET_DPI}, got {target_dpi}")
+    if not 1 <= jpeg_quality <= 100:
+        raise ValueError(f"jpeg_quality must be between 1 and 100, got {jpeg_quality}")
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        images_before = len({img[0] for page in doc for img in page.get_images()})
+        images_rewritten = _rewrite_images(doc, target_dpi, jpeg_quality)
+
+        save_options = dict(garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, clean=True)
+        try:
+            # Object streams need MuPDF >= 1.22
+            optimized = doc.tobytes(use_objstms=1, **save_options)
+        except TypeError:
+            optimized = doc.tobytes(**save_options)
+    finally:
+        doc.close()
+
+    linearized = False
+    if linearize:
+        try:
+            with fitz.open(stream=optimized, filetype="pdf") as lin_doc:
+                optimized = lin_doc.tobytes(garbage=4, deflate=True, linear=True)
+            linearized = True
+        except Exception:
+            # Newer MuPDF releases dropped linearization
+            qpdf_bytes = _linearize_with_qpdf(optimized)
+            if qpdf_bytes is not None:
+                optimized = qpdf_bytes
+                linearized = True
+            else:
+                logger.warning("Linearization not available (MuPDF dropped it and qpdf is not installed)")
+
+    # Never return something bigger than what we were given
+    if len(optimized) >= len(pdf_bytes) and not linearized:
+        optimized = pdf_bytes
+
+    report = {
+        "original_bytes": len(pdf_bytes),
+        "optimized_bytes": len(optimized),
+        "saved_ratio": round(1 - len(optimized) / len(pdf_bytes), 4) if pdf_bytes else 0.0,
+        "target_dpi": target_dpi,
+        "jpeg_quality": jpeg_quality,
+        "images": images_before,
+        "images_rewritten": images_rewritten,
+        "linearized": linearized
+    }
+    return optimized, report
+
+
+def optimize_pdf_file(
+    pdf_path: Path,
+    target_dpi: Optional[int] = None,
+    jpeg_quality: Optional[int] = None,
+    linearize: bool = False
+) -> Dict[str, Any]:
+    """
+    Optimize a PDF file in place.
+
+    Args:
+        pdf_path: PDF to rewrite
+        target_dpi: Target image DPI (default: PDF_OPTIMIZE_DPI env or 150)
+        jpeg_quality: JPEG quality (default: PDF_OPTIMIZE_JPEG_QUALITY env or 80)
+        linearize: Linearize for fast first-page display
+
+    Returns:
+        Report dict with original_bytes, optimized_bytes and what was done
+    """
+    if target_dpi is None:
+        target_dpi = int(os.getenv("PDF_OPTIMIZE_DPI", str(DEFAULT_TARGET_DPI)))
+    if jpeg_quality is None:
+        jpeg_quality = int(os.getenv("PDF_OPTIMIZE_JPEG_QUALITY", str(DEFAULT_JPEG_QUALITY)))
+
+    pdf_path = Path(pdf_path)
+    optimized, report = optimize_pdf_bytes(
+        pdf_path.read_bytes(),
+        target_dpi=target_dpi,
+        jpeg_quality=jpeg_quality,
+        linearize=linearize
+    )
+
+    # Atomic replace so a reader never sees a half-written file
+    tmp_path = pdf_path.with_suffix(".pdf.tmp")
+    tmp_path.write_bytes(optimized)
+    tmp_path.replace(pdf_path)
+
+    logger.info(
+        f"Optimized {pdf_path.name}: {report['original_bytes']} → {report['optimized_bytes']} bytes "
+        f"({report['saved_ratio']:.0%} saved)"
+    )
+    return report
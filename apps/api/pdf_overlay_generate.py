@@ -2,9 +2,24 @@
 
 import fitz  # PyMuPDF
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import logging
+import atexit
 import math
 import json
+import os
+
+import numpy as np
+
+from raster_cache import load_raster, attach_raster, raster_cache
+from text_fit import TextFitter, find_overlay_font
+from overlay_cache import OverlayPageCache, OVERLAY_CACHE_DIRNAME, page_cache_key, file_stamp
+
+logger = logging.getLogger(__name__)
 
 # Overlay policy constants
 HEADINGS_SCOPE_TYPES = {"heading", "title"}
@@ -18,6 +33,16 @@ MAX_PARAGRAPH_HEIGHT = 70     # Max height in pixels for paragraphs to be replac
 MIN_W_PX = 8                  # Minimum width in pixels
 MIN_H_PX = 8                  # Minimum height in pixels
 PAD_PX = 2                    # Padding in pixels
+MAX_W_RATIO_ALL = 0.9         # Giant bbox protection in "all" scope
+MAX_H_RATIO_ALL = 0.9
+MAX_AREA_RATIO_ALL = 0.8
+MAX_SAFETY_RATIO = 0.95       # Final safety limit after clamping
+OVERLAY_BACKGROUNDS = ("raster", "vector")
+PARALLEL_MIN_PAGES = 8        # Below this a process pool costs more than it saves
+OVERLAY_MAX_WORKERS = 4       # Size cap of the shared pool (all jobs and variants use it)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
 
 
 def should_replace_block(block: Dict[str, Any], img_width: int, img_height: int, overlay_scope: str) -> tuple[bool, str]:
@@ -116,7 +141,7 @@ def should_replace_block(block: Dict[str, Any], img_width: int, img_height: int,
         area_ratio = (width_px * height_px) / (img_width * img_height)
         
         # Protection against covering faces/images (giant bbox)
-        if width_ratio > 0.9 or height_ratio > 0.9 or area_ratio > 0.8:
+        if width_ratio > MAX_W_RATIO_ALL or height_ratio > MAX_H_RATIO_ALL or area_ratio > MAX_AREA_RATIO_ALL:
             return False, "giant_bbox_protected"
         
         return True, "allowed_in_all_scope"
@@ -125,285 +150,613 @@ def should_replace_block(block: Dict[str, Any], img_width: int, img_height: int,
         return False, "invalid_scope"
 
 
+def _parse_blocks(blocks: List[Dict[str, Any]]) -> tuple:
+    """
+    Load block bboxes and types of a page into arrays.
+
+    Returns:
+        Tuple of (coords, types, pre_reasons): (n, 4) float array, object
+        array of lowercased types, and {index: reason} for blocks rejected
+        before the policy (missing data or unparsable bbox)
+    """
+    n = len(blocks)
+    rows = []
+    types = []
+    pre_reasons: Dict[int, str] = {}
+    for i, block in enumerate(blocks):
+        bbox = block.get("bbox", [])
+        types.append(str(block.get("type", "paragraph")).lower())
+        if not bbox or len(bbox) != 4 or not block.get("text", "").strip():
+            pre_reasons[i] = "invalid_block_data"
+            rows.append((0.0, 0.0, 0.0, 0.0))
+        else:
+            rows.append(bbox)
+
+    try:
+        # Fast path: the whole page converts in one call
+        coords = np.array(rows, dtype=np.float64).reshape(n, 4)
+        # NumPy turns None into NaN where float() raises; re-check those rows only
+        suspect = np.flatnonzero(np.isnan(coords).any(axis=1))
+    except (ValueError, TypeError):
+        coords = np.zeros((n, 4), dtype=np.float64)
+        suspect = range(n)
+    for i in suspect:
+        try:
+            coords[i] = [float(v) for v in rows[i]]
+        except (ValueError, TypeError):
+            coords[i] = 0.0
+            pre_reasons.setdefault(int(i), "parse_error")
+    return coords, np.array(types, dtype=object), pre_reasons
+
+
+def evaluate_blocks(
+    blocks: List[Dict[str, Any]],
+    img_width: int,
+    img_height: int,
+    overlay_scope: str
+) -> Dict[str, Any]:
+    """
+    Vectorized overlay policy and bbox validation for all blocks of a page.
+
+    Gives the same decisions and reasons as checking each block with
+    should_replace_block followed by clamping and the safety limit.
+
+    Args:
+        blocks: Page blocks (dicts with bbox, text, type)
+        img_width: Image width in pixels
+        img_height: Image height in pixels
+        overlay_scope: Scope mode ("headings", "safe", or "all")
+
+    Returns:
+        Dictionary with:
+            - replace: bool array, True for blocks to replace
+            - reasons: list of replacement/skip reasons per block
+            - bbox_px: (n, 4) int array of bboxes clamped to the image
+            - width_px / height_px: int arrays of clamped dimensions
+    """
+    n = len(blocks)
+    coords, types, pre_reasons = _parse_blocks(blocks)
+
+    x1, y1, x2, y2 = coords.T
+    nan = np.isnan(coords).any(axis=1)
+    # Non-finite values cannot be truncated to pixels; treat them like NaN
+    nan |= ~np.isfinite(coords).all(axis=1)
+    invalid_dims = ~nan & ((x1 >= x2) | (y1 >= y2))
+
+    # int() truncation toward zero, as in should_replace_block
+    ix = np.trunc(np.nan_to_num(coords, nan=0.0, posinf=0.0, neginf=0.0)).astype(np.int64)
+    ix1, iy1, ix2, iy2 = ix.T
+    width = ix2 - ix1
+    height = iy2 - iy1
+    too_small = (width < MIN_W_PX) | (height < MIN_H_PX)
+
+    area_px = width * height
+    page_area = img_width * img_height
+    width_ratio = width / img_width
+    height_ratio = height / img_height
+    area_ratio = area_px / page_area
+    small_safe = (width_ratio <= MAX_W_RATIO_SAFE) & (height_ratio <= MAX_H_RATIO_SAFE) & (area_ratio <= MAX_AREA_RATIO_SAFE)
+
+    is_paragraph = types == "paragraph"
+    is_heading = np.isin(types, list(HEADINGS_SCOPE_TYPES))
+    is_safe_type = np.isin(types, list(SAFE_SCOPE_TYPES))
+
+    # Ordered (condition, reason, replace) rules; the first matching one wins
+    rules = [
+        (nan, "nan_coordinates", False),
+        (invalid_dims, "invalid_dimensions", False),
+        (too_small, "too_small", False),
+        (is_paragraph & (height >= MAX_PARAGRAPH_HEIGHT), "paragraph_height_exceeded", False),
+    ]
+    if overlay_scope == "all":
+        rules.append((is_paragraph & small_safe, "small_paragraph_in_all_scope", True))
+    rules += [
+        (is_paragraph & small_safe, "paragraph_not_allowed_in_scope", False),
+        (is_paragraph, "paragraph_too_large", False),
+    ]
+    if overlay_scope == "headings":
+        fits = (width_ratio <= MAX_W_RATIO_HEADINGS) & (height_ratio <= MAX_H_RATIO_HEADINGS)
+        rules += [
+            (is_heading & fits, "allowed_in_headings_scope", True),
+            (is_heading, "heading_too_large", False),
+            (np.ones(n, dtype=bool), "type_not_allowed_in_headings_scope", False),
+        ]
+    elif overlay_scope == "safe":
+        rules += [
+            (is_safe_type & small_safe, "allowed_in_safe_scope", True),
+            (is_safe_type, "block_too_large_for_safe_scope", False),
+            (small_safe, "small_block_allowed_in_safe_scope", True),
+            (np.ones(n, dtype=bool), "block_not_safe", False),
+        ]
+    elif overlay_scope == "all":
+        giant = (width_ratio > MAX_W_RATIO_ALL) | (height_ratio > MAX_H_RATIO_ALL) | (area_ratio > MAX_AREA_RATIO_ALL)
+        rules += [
+            (giant, "giant_bbox_protected", False),
+            (np.ones(n, dtype=bool), "allowed_in_all_scope", True),
+        ]
+    else:
+        rules.append((np.ones(n, dtype=bool), "invalid_scope", False))
+
+    rule_index = np.select([cond for cond, _, _ in rules], np.arange(len(rules)), default=len(rules) - 1)
+    replace = np.array([allowed for _, _, allowed in rules], dtype=bool)[rule_index]
+
+    # Clamp approved boxes to the image and apply the final safety limit
+    clamped = np.stack([
+        np.clip(ix1, 0, img_width), np.clip(iy1, 0, img_height),
+        np.clip(ix2, 0, img_width), np.clip(iy2, 0, img_height)
+    ], axis=1)
+    clamped_w = clamped[:, 2] - clamped[:, 0]
+    clamped_h = clamped[:, 3] - clamped[:, 1]
+    unsafe = replace & ((clamped_w / img_width > MAX_SAFETY_RATIO) | (clamped_h / img_height > MAX_SAFETY_RATIO))
+
+    reason_names = np.array([reason for _, reason, _ in rules] + ["exceeds_safety_limits"], dtype=object)
+    reasons = reason_names[np.where(unsafe, len(rules), rule_index)].tolist()
+    pre_skipped = np.zeros(n, dtype=bool)
+    for i, reason in pre_reasons.items():
+        reasons[i] = reason
+        pre_skipped[i] = True
+    
+    return {
+        "replace": replace & ~unsafe & ~pre_skipped,
+        "reasons": reasons,
+        "bbox_px": clamped,
+        "width_px": clamped_w,
+        "height_px": clamped_h
+    }
+
+
+def _add_raster_page(
+    doc: "fitz.Document",
+    pages_dir: Path,
+    page_num: int,
+    dpi: int,
+    raster_handle: Optional[Dict[str, Any]] = None
+):
+    """Create a page with the rendered page_N.png as background. Returns (page, img_w, img_h)."""
+    bg_image_path = pages_dir / f"page_{page_num}.png"
+    if not bg_image_path.exists():
+        raise FileNotFoundError(f"Background image not found: {bg_image_path}")
+    
+    # Get decoded background (shared with the renderer, no PNG decode on hit).
+    # Pool workers attach to the parent's shared-memory copy instead.
+    bg_raster = attach_raster(raster_handle) if raster_handle else load_raster(bg_image_path)
+    img_width = bg_raster.width
+    img_height = bg_raster.height
+    
+    # Calculate page size in points (1 point = 1/72 inch)
+    # PDF coordinate system: origin at bottom-left
+    page_width_points = img_width * 72 / dpi
+    page_height_points = img_height * 72 / dpi
+    
+    # Create new page
+    page = doc.new_page(width=page_width_points, height=page_height_points)
+    
+    # Insert background image (scaled to fill page)
+    page.insert_image(
+        fitz.Rect(0, 0, page_width_points, page_height_points),
+        pixmap=bg_raster.to_pixmap()
+    )
+    if raster_handle:
+        bg_raster.close()
+    
+    return page, img_width, img_height
+
+
+def _add_vector_page(doc: "fitz.Document", src_doc: "fitz.Document", page_num: int, dpi: int):
+    """Copy the original PDF page (vector content kept). Returns (page, img_w, img_h)."""
+    src_index = page_num - 1
+    if src_index < 0 or src_index >= src_doc.page_count:
+        raise ValueError(f"Page {page_num} not found in input PDF ({src_doc.page_count} pages)")
+    
+    doc.insert_pdf(src_doc, from_page=src_index, to_page=src_index)
+    page = doc[-1]
+    
+    # Work in the visible orientation, same as the rendered PNG the bboxes refer to
+    if page.rotation:
+        page.remove_rotation()
+    
+    # Pixel size of this page as rendered by render_pdf_to_pngs at the same DPI
+    zoom = dpi / 72
+    pixel_rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    
+    return page, pixel_rect.width, pixel_rect.height
+
+
+def _cover_blocks(page: "fitz.Page", rects: List["fitz.Rect"], redact: bool) -> None:
+    """Hide original content under replaced blocks (white fill or true redaction)."""
+    if not redact:
+        for rect in rects:
+            page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1))
+        return
+    
+    for rect in rects:
+        page.add_redact_annot(rect, fill=(1, 1, 1))
+    
+    # Remove only the text under the blocks; keep images and vector graphics
+    redact_kwargs = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+    line_art_none = getattr(fitz, "PDF_REDACT_LINE_ART_NONE", None)
+    if line_art_none is not None:
+        redact_kwargs["graphics"] = line_art_none
+    page.apply_redactions(**redact_kwargs)
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "total_blocks": 0,
+        "replaced_blocks": 0,
+        "skipped_blocks": 0,
+        "skip_reasons": {},
+        "replaced_details": []
+    }
+
+
+def _merge_stats(stats: Dict[str, Any], page_stats: Dict[str, Any]) -> None:
+    """Add one page's statistics to the document totals (call in page order)."""
+    stats["total_blocks"] += page_stats["total_blocks"]
+    stats["replaced_blocks"] += page_stats["replaced_blocks"]
+    stats["skipped_blocks"] += page_stats["skipped_blocks"]
+    for reason, count in page_stats["skip_reasons"].items():
+        stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + count
+    stats["replaced_details"].extend(page_stats["replaced_details"])
+
+
+def _overlay_page(
+    doc: "fitz.Document",
+    page_data: Dict[str, Any],
+    pages_dir: Path,
+    dpi: int,
+    debug: bool,
+    overlay_scope: str,
+    fitter: TextFitter,
+    src_doc: Optional["fitz.Document"] = None,
+    raster_handle: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Append one overlaid page to doc.
+    
+    Args:
+        doc: Target document
+        page_data: Vision data for the page (page number and blocks)
+        pages_dir: Directory with rendered page_N.png files
+        dpi: DPI used when rendering PNG pages
+        debug: Draw red outlines instead of replacing text
+        overlay_scope: Scope of replacement - "headings", "safe", or "all"
+        fitter: Text fitter used to lay out the replacement text
+        src_doc: Original PDF for vector background (None for raster)
+        raster_handle: Shared-memory handle of the background raster (pool workers)
+        
+    Returns:
+        Tuple of (statistics for this page, same layout as overlay_report.json;
+        text runs for TextFitter.write_runs, not yet written to the page)
+    """
+    stats = _new_stats()
+    page_num = page_data["page"]
+    blocks = page_data.get("blocks", [])
+    
+    if src_doc is not None:
+        page, img_width, img_height = _add_vector_page(doc, src_doc, page_num, dpi)
+    else:
+        page, img_width, img_height = _add_raster_page(doc, pages_dir, page_num, dpi, raster_handle)
+    
+    # Calculate scaling factors
+    sx = page.rect.width / img_width  # Scale factor for x coordinates
+    sy = page.rect.height / img_height  # Scale factor for y coordinates
+    
+    # Blocks approved for replacement on this page: (rect, text)
+    placements = []
+    
+    # Policy, validation and clamping for all blocks in one pass
+    decisions = evaluate_blocks(blocks, img_width, img_height, overlay_scope)
+    replace = decisions["replace"]
+    reasons = decisions["reasons"]
+    
+    stats["total_blocks"] = len(blocks)
+    for idx, block in enumerate(blocks):
+        reason = reasons[idx]
+        if not replace[idx]:
+            stats["skipped_blocks"] += 1
+            stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
+            continue
+        
+        text = block.get("text", "")
+        block_type = block.get("type", "paragraph")
+        x1, y1, x2, y2 = (int(v) for v in decisions["bbox_px"][idx])
+        width_px = int(decisions["width_px"][idx])
+        height_px = int(decisions["height_px"][idx])
+        
+        # Scale to PDF page size, pad, and clamp to page bounds
+        pad_x = PAD_PX * sx
+        pad_y = PAD_PX * sy
+        rect = fitz.Rect(
+            x1 * sx - pad_x,
+            y1 * sy - pad_y,
+            x2 * sx + pad_x,
+            y2 * sy + pad_y
+        ) & page.rect
+        
+        if debug:
+            # Debug mode: draw red outline only (NO FILL)
+            page.draw_rect(rect, color=(1, 0, 0), width=0.5)
+            # Add small debug text with block ID and type
+            debug_text = f"[{block_type[:3]}] p{page_num}-b{idx}"
+            page.insert_text(
+                fitz.Point(rect.x0, rect.y0 - 2),
+                debug_text,
+                fontsize=5,
+                color=(1, 0, 0)
+            )
+        else:
+            # Normal mode: cover + text ONLY for approved blocks (drawn per page below)
+            placements.append((rect, text))
+        
+        # Record replaced block details
+        stats["replaced_blocks"] += 1
+        stats["replaced_details"].append({
+            "page": page_num,
+            "block_index": idx,
+            "type": block_type,
+            "bbox_px": [x1, y1, x2, y2],
+            "dimensions_px": {
+                "width": width_px,
+                "height": height_px
+            },
+            "replacement_reason": reason
+        })
+    
+    text_runs = []
+    if placements:
+        # Cover original text now; translations are written into the final document
+        _cover_blocks(page, [rect for rect, _ in placements], redact=src_doc is not None)
+        text_runs = fitter.layout(placements)
+    
+    return stats, text_runs
+
+
+def _render_page_pdf(
+    page_data: Dict[str, Any],
+    pages_dir: Path,
+    dpi: int,
+    debug: bool,
+    overlay_scope: str,
+    fitter: TextFitter,
+    src_doc: Optional["fitz.Document"] = None,
+    raster_handle: Optional[Dict[str, Any]] = None
+) -> tuple:
+    """
+    Render one page (background and covers, no overlay text) into its own single-page PDF.
+
+    The overlay font is left out so cached pages stay small and the merged
+    document embeds it once; the fitted text comes back as runs instead.
+
+    Returns:
+        Tuple of (compressed pdf_bytes, page_stats, text_runs)
+    """
+    doc = fitz.open()
+    try:
+        page_stats, text_runs = _overlay_page(doc, page_data, pages_dir, dpi, debug, overlay_scope, fitter, src_doc, raster_handle)
+        return doc.tobytes(garbage=3, deflate=True), page_stats, text_runs
+    finally:
+        doc.close()
+
+
+_worker_fitter: Optional[TextFitter] = None
+
+
+def _process_fitter() -> TextFitter:
+    """Text fitter of this pool worker: font loaded once per process, widths cached across pages."""
+    global _worker_fitter
+    if _worker_fitter is None:
+        _worker_fitter = TextFitter()
+    return _worker_fitter
+
+
+def _overlay_page_worker(args: tuple) -> tuple:
+    """Process pool entry point: render one page into its own single-page PDF."""
+    page_data, pages_dir, dpi, debug, overlay_scope, src_path, raster_handle = args
+    src_doc = fitz.open(str(src_path)) if src_path else None
+    try:
+        return _render_page_pdf(page_data, pages_dir, dpi, debug, overlay_scope, _process_fitter(), src_doc, raster_handle)
+    finally:
+        if src_doc is not None:
+            src_doc.close()
+
+
+def _pool_size() -> int:
+    """Processes in the shared pool (OVERLAY_WORKERS env, else the cores up to OVERLAY_MAX_WORKERS)."""
+    size = int(os.getenv("OVERLAY_WORKERS", "0"))
+    if size <= 0:
+        size = min(os.cpu_count() or 1, OVERLAY_MAX_WORKERS)
+    return max(1, size)
+
+
+def _overlay_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every overlay generation in this process.
+
+    Started on first use and kept, so workers (and their loaded fonts) are
+    reused, and concurrent jobs or batch variants queue on the same bounded
+    set of processes instead of each starting a pool of their own.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool() -> None:
+    """Shut the shared pool down (a new one starts on next use)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_reset_pool)
+
+
+def _resolve_workers(workers: Optional[int], page_count: int) -> int:
+    """Number of processes to spread pages over (1 means render in this process)."""
+    if workers is None:
+        workers = int(os.getenv("OVERLAY_WORKERS", "0"))
+        if workers <= 0:
+            # Auto: the pool only pays off with several cores and enough pages
+            if page_count < PARALLEL_MIN_PAGES or (os.cpu_count() or 1) < 2:
+                return 1
+            workers = _pool_size()
+    return max(1, min(workers, _pool_size(), page_count))
+
+
 def generate_overlay_pdf(
     job_dir: Path, 
     vision: Dict[str, Any], 
     dpi: int = 144, 
     debug: bool = False,
-    overlay_scope: str = "headings"
+    overlay_scope: str = "headings",
+    background: str = "raster",
+    input_pdf_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    cache: bool = True,
+    report_path: Optional[Path] = None
 ) -> bytes:
     """
-    Generate PDF with background images and overlaid text rectangles.
+    Generate PDF with background pages and overlaid text rectangles.
     
     Args:
-        job_dir: Directory containing pages/page_*.png files
+        job_dir: Directory containing pages/page_*.png files (and input.pdf)
         vision: Vision data dictionary with pages and blocks
         dpi: DPI used when rendering PNG pages (default: 144)
         debug: If True, generate debug overlay with red outlines only
         overlay_scope: Scope of replacement - "headings", "safe", or "all"
+        background: "raster" (rendered page PNGs) or "vector" (original PDF pages)
+        input_pdf_path: Original PDF for vector background (default: job_dir/input.pdf)
+        workers: Processes for page rendering, taken from the shared pool
+            (default: OVERLAY_WORKERS env, or the pool when there are several
+            cores and PARALLEL_MIN_PAGES pages or more need rendering)
+        cache: Reuse unchanged pages from job_dir/overlay_cache (default: True)
+        report_path: Where to write the overlay report (default: job_dir/overlay_report.json)
         
     Returns:
         PDF content as bytes
         
     Process:
         1. For each page in vision data:
-           - Load corresponding page_N.png as background
-           - Create new PDF page with same dimensions
-           - Insert background image
+           - raster: create page from page_N.png as background
+           - vector: copy original PDF page (text stays selectable, size ~ source)
            - For each block:
              * Apply overlay scope policy
              * Validate and filter bbox
              * Scale bbox coordinates to PDF page size
-             * Draw white rectangle (or red outline in debug mode)
-             * Insert text using insert_textbox for proper fitting
+             * Collect rect (or draw red outline in debug mode)
+           - Cover replaced blocks (white fill for raster, redaction for vector)
+           - Fit text with font metrics (text_fit.TextFitter) into text runs
+        2. Each page is rendered as a compressed single-page PDF without the
+           overlay text (in the shared process pool with several workers) and
+           cached with its text runs under a hash of its blocks, scope, DPI
+           and background; pages whose hash is unchanged are taken from cache.
+        3. Pages are merged in order with insert_pdf and their text runs are
+           written with one font, which is then subset once.
     """
-    # Create new PDF document
-    doc = fitz.open()
+    if background not in OVERLAY_BACKGROUNDS:
+        raise ValueError(f"Invalid background: {background}. Must be one of: {', '.join(OVERLAY_BACKGROUNDS)}")
     
     pages_dir = job_dir / "pages"
+    pages = vision.get("pages", [])
     
-    # Statistics for overlay report
-    stats = {
-        "total_blocks": 0,
-        "replaced_blocks": 0,
-        "skipped_blocks": 0,
-        "skip_reasons": {},
-        "replaced_details": []
-    }
+    src_path = None
+    if background == "vector":
+        src_path = Path(input_pdf_path) if input_pdf_path else job_dir / "input.pdf"
+        if not src_path.exists():
+            raise FileNotFoundError(f"Input PDF not found: {src_path}")
     
-    # Process each page
-    for page_data in vision.get("pages", []):
-        page_num = page_data["page"]
-        blocks = page_data.get("blocks", [])
-        
-        # Load background image
-        bg_image_path = pages_dir / f"page_{page_num}.png"
-        if not bg_image_path.exists():
-            raise FileNotFoundError(f"Background image not found: {bg_image_path}")
-        
-        # Get image dimensions
-        bg_pix = fitz.Pixmap(str(bg_image_path))
-        img_width = bg_pix.width
-        img_height = bg_pix.height
-        bg_pix = None  # Free memory
-        
-        # Calculate page size in points (1 point = 1/72 inch)
-        # PDF coordinate system: origin at bottom-left
-        page_width_points = img_width * 72 / dpi
-        page_height_points = img_height * 72 / dpi
-        
-        # Create new page
-        page = doc.new_page(width=page_width_points, height=page_height_points)
-        
-        # Insert background image (scaled to fill page)
-        page.insert_image(
-            fitz.Rect(0, 0, page_width_points, page_height_points),
-            filename=str(bg_image_path)
-        )
-        
-        # Calculate scaling factors
-        sx = page.rect.width / img_width  # Scale factor for x coordinates
-        sy = page.rect.height / img_height  # Scale factor for y coordinates
-        
-        # Process each block
-        for idx, block in enumerate(blocks):
-            stats["total_blocks"] += 1
-            bbox = block.get("bbox", [])
-            text = block.get("text", "")
-            block_type = block.get("type", "paragraph")
-            
-            # Skip invalid blocks
-            if not bbox or len(bbox) != 4 or not text.strip():
-                stats["skipped_blocks"] += 1
-                reason = "invalid_block_data"
-                stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                continue
-            
-            # Apply overlay scope policy
-            should_replace, reason = should_replace_block(block, img_width, img_height, overlay_scope)
-            
-            if not should_replace:
-                stats["skipped_blocks"] += 1
-                stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                continue
-            
-            # Validate bbox coordinates
-            try:
-                x1, y1, x2, y2 = map(float, bbox)
-                # Skip if NaN or invalid coordinates
-                if math.isnan(x1) or math.isnan(y1) or math.isnan(x2) or math.isnan(y2):
-                    stats["skipped_blocks"] += 1
-                    reason = "nan_coordinates"
-                    stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                    continue
-                if x1 >= x2 or y1 >= y2:  # Invalid bbox
-                    stats["skipped_blocks"] += 1
-                    reason = "invalid_bbox_dimensions"
-                    stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                    continue
-            except (ValueError, TypeError):
-                stats["skipped_blocks"] += 1
-                reason = "bbox_parse_error"
-                stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                continue
-            
-            # Convert to integers
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-            
-            # Size sanity checks
-            width_px = x2 - x1
-            height_px = y2 - y1
-            
-            if width_px < MIN_W_PX or height_px < MIN_H_PX:
-                stats["skipped_blocks"] += 1
-                reason = "too_small"
-                stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                continue
-            
-            # Clamp bbox to image boundaries
-            x1 = max(0, min(x1, img_width))
-            y1 = max(0, min(y1, img_height))
-            x2 = max(0, min(x2, img_width))
-            y2 = max(0, min(y2, img_height))
-            
-            # Recalculate dimensions after clamping
-            width_px = x2 - x1
-            height_px = y2 - y1
-            
-            # Ratio checks against page size
-            width_ratio = width_px / img_width
-            height_ratio = height_px / img_height
-            
-            if width_ratio > 0.95 or height_ratio > 0.95:  # Additional safety check
-                stats["skipped_blocks"] += 1
-                reason = "exceeds_safety_limits"
-                stats["skip_reasons"][reason] = stats["skip_reasons"].get(reason, 0) + 1
-                continue
-            
-            # Scale coordinates to PDF page size
-            x1_pdf = x1 * sx
-            y1_pdf = y1 * sy
-            x2_pdf = x2 * sx
-            y2_pdf = y2 * sy
-            
-            # Apply padding in PDF coordinates
-            pad_x = PAD_PX * sx
-            pad_y = PAD_PX * sy
-            
-            rect = fitz.Rect(
-                x1_pdf - pad_x,
-                y1_pdf - pad_y,
-                x2_pdf + pad_x,
-                y2_pdf + pad_y
+    # Per-page cache: unchanged pages are reused, only edited ones re-render
+    page_cache = None
+    keys = [None] * len(pages)
+    if cache:
+        variant = f"{background}-{overlay_scope}-{dpi}" + ("-debug" if debug else "")
+        page_cache = OverlayPageCache(job_dir / OVERLAY_CACHE_DIRNAME / variant)
+        font_file = find_overlay_font()
+        for i, page_data in enumerate(pages):
+            bg_path = src_path or pages_dir / f"page_{page_data['page']}.png"
+            keys[i] = page_cache_key(
+                page_data,
+                overlay_scope=overlay_scope,
+                dpi=dpi,
+                debug=debug,
+                background=background,
+                background_stamp=file_stamp(bg_path),
+                font=str(font_file) if font_file else None
             )
-            
-            # Clamp to page boundaries
-            rect = rect & page.rect  # Intersection with page bounds
-            
-            if debug:
-                # Debug mode: draw red outline only (NO FILL)
-                page.draw_rect(rect, color=(1, 0, 0), width=0.5)
-                # Add small debug text with block ID and type
-                debug_text = f"[{block_type[:3]}] p{page_num}-b{idx}"
-                page.insert_text(
-                    fitz.Point(rect.x0, rect.y0 - 2),
-                    debug_text,
-                    fontsize=5,
-                    color=(1, 0, 0)
-                )
-            else:
-                # Normal mode: white rectangle + black text ONLY for approved blocks
-                # Draw white rectangle to cover original text
-                page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1))
-                
-                # Insert text using insert_textbox for proper fitting
-                font_size = 12
-                min_font_size = 6
-                
-                # Try to fit text with decreasing font sizes
-                while font_size >= min_font_size:
-                    # Try inserting text with current font size
-                    try:
-                        # Create slightly inset rectangle for text
-                        inset_rect = fitz.Rect(
-                            rect.x0 + 2,
-                            rect.y0 + 2,
-                            rect.x1 - 2,
-                            rect.y1 - 2
-                        )
-                        
-                        # Try insert_textbox - it handles word wrapping automatically
-                        rc = page.insert_textbox(
-                            inset_rect,
-                            text,
-                            fontsize=font_size,
-                            fontname="helv",  # Helvetica
-                            color=(0, 0, 0),
-                            align=0  # Left alignment
-                        )
-                        
-                        # If rc >= 0, text was successfully inserted
-                        if rc >= 0:
-                            break
-                    except:
-                        pass
-                    
-                    font_size -= 1
-                
-                # If still doesn't fit, truncate text
-                if font_size < min_font_size:
-                    font_size = min_font_size
-                    # Truncate to fit in available space
-                    max_chars = max(10, int(len(text) * 0.5))  # Conservative estimate
-                    if len(text) > max_chars:
-                        text = text[:max_chars-3] + "..."
-                    
-                    # Final attempt with truncated text
-                    try:
-                        inset_rect = fitz.Rect(
-                            rect.x0 + 2,
-                            rect.y0 + 2,
-                            rect.x1 - 2,
-                            rect.y1 - 2
-                        )
-                        page.insert_textbox(
-                            inset_rect,
-                            text,
-                            fontsize=font_size,
-                            fontname="helv",
-                            color=(0, 0, 0),
-                            align=0
-                        )
-                    except:
-                        # Last resort: simple text insertion at bottom
-                        page.insert_text(
-                            fitz.Point(rect.x0 + 2, rect.y1 - 5),
-                            text[:50] + "..." if len(text) > 50 else text,
-                            fontsize=font_size,
-                            color=(0, 0, 0)
-                        )
-            
-            # Record replaced block details
-            stats["replaced_blocks"] += 1
-            stats["replaced_details"].append({
-                "page": page_num,
-                "block_index": idx,
-                "type": block_type,
-                "bbox_px": [int(x1), int(y1), int(x2), int(y2)],
-                "dimensions_px": {
-                    "width": width_px,
-                    "height": height_px
-                },
-                "replacement_reason": reason
-            })
+    
+    # One fitter for this document: font loaded and embedded once, widths cached
+    fitter = TextFitter()
+    
+    # (pdf_bytes, page_stats, text_runs) per page, in page order
+    results: List[Optional[tuple]] = [None] * len(pages)
+    if page_cache is not None:
+        for i, page_data in enumerate(pages):
+            results[i] = page_cache.get(page_data["page"], keys[i])
+    misses = [i for i, result in enumerate(results) if result is None]
+    
+    workers = _resolve_workers(workers, len(misses))
+    
+    if misses and workers > 1:
+        # Let workers read the already decoded backgrounds from shared memory;
+        # pinned so the cache cannot unlink a segment before a worker attaches
+        bg_paths = [pages_dir / f"page_{pages[i]['page']}.png" for i in misses] if src_path is None else []
+        with raster_cache.pinned(bg_paths) as handles:
+            tasks = [
+                (pages[i], pages_dir, dpi, debug, overlay_scope, src_path, handles[n] if handles else None)
+                for n, i in enumerate(misses)
+            ]
+            logger.info(f"Rendering {len(misses)} of {len(pages)} overlay pages with {workers} workers")
+            try:
+                # map() yields in submission order, so pages and stats stay ordered
+                for i, result in zip(misses, _overlay_pool().map(_overlay_page_worker, tasks)):
+                    results[i] = result
+            except BrokenProcessPool:
+                _reset_pool()
+                raise
+    elif misses:
+        logger.info(f"Rendering {len(misses)} of {len(pages)} overlay pages")
+        src_doc = fitz.open(str(src_path)) if src_path else None
+        try:
+            for i in misses:
+                results[i] = _render_page_pdf(pages[i], pages_dir, dpi, debug, overlay_scope, fitter, src_doc)
+        finally:
+            if src_doc is not None:
+                src_doc.close()
+    
+    if page_cache is not None:
+        for i in misses:
+            page_cache.put(pages[i]["page"], keys[i], *results[i])
+    
+    # Splice pages in order and write their text with one fitter, so the
+    # overlay font is embedded once for the whole document; stats are summed
+    # in the same order
+    doc = fitz.open()
+    stats = _new_stats()
+    for page_pdf, page_stats, text_runs in results:
+        with fitz.open(stream=page_pdf, filetype="pdf") as page_doc:
+            doc.insert_pdf(page_doc)
+        fitter.write_runs(doc[-1], text_runs)
+        _merge_stats(stats, page_stats)
     
     # Save overlay report
-    overlay_report_path = job_dir / "overlay_report.json"
+    overlay_report_path = report_path or job_dir / "overlay_report.json"
     with open(overlay_report_path, "w", encoding="utf-8") as f:
         json.dump(stats, f, indent=2, ensure_ascii=False)
     
-    # Save to bytes
-    pdf_bytes = doc.tobytes()
+    # Embed only the glyphs actually used by the overlay font
+    if stats["replaced_blocks"] and not debug:
+        try:
+            doc.subset_fonts()
+        except Exception as e:
+            logger.warning(f"Font subsetting failed: {e}")
+    
+    # Save to bytes (merged pages: drop unused objects, dedupe resources copied per page)
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
     doc.close()
     
-    return pdf_bytes
\ No newline at end of file
+    return pdf_bytes
@@ -5,6 +5,8 @@ import fitz  # PyMuPDF
 from pathlib import Path
 from typing import List
 
+from raster_cache import raster_cache
+
 
 def render_pdf_to_pngs(
     input_pdf_path: Path, 
@@ -48,6 +50,10 @@ def render_pdf_to_pngs(
         with open(png_path, "wb") as f:
             f.write(png_bytes)
         
+        # Keep the decoded raster for later stages (OCR, overlay, debug)
+        raster_cache.put(png_path, pix, png_bytes=png_bytes)
+        pix = None
+        
         rendered_pages.append(png_path)
     
     # Close document
@@ -1,54 +1,81 @@
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import hashlib
+import os
 import pymupdf4llm
 import fitz  # PyMuPDF
-import re
 
+from markdown_cache import MarkdownPageCache, page_content_hash, fragment_key
 
-def pdf_to_markdown_with_assets(pdf_path: Path, job_dir: Path) -> dict:
+MARKDOWN_PARALLEL_MIN_PAGES = 8  # Below this, worker start-up costs more than it saves
+WEB_SAFE_IMAGE_FORMATS = {"png", "jpeg", "gif", "webp"}  # Stored as embedded
+LOSSY_IMAGE_FORMATS = {"jpeg", "jpx"}  # Transcoded to JPEG rather than PNG
+TRANSCODE_JPEG_QUALITY = 90
+
+
+def _image_bytes(doc: fitz.Document, xref: int) -> Tuple[bytes, str]:
     """
-    Convert PDF to Markdown + assets using pymupdf4llm and PyMuPDF.
-    Saves:
-      - layout.md  (full markdown)
-      - md_assets/  (directory for extracted images)
-    Returns small dict with paths + basic stats + image metadata.
-    
+    Image file content and extension for an image xref.
+
+    The embedded stream is kept as is when browsers can show it (no
+    re-encode, JPEG photos stay JPEG). CMYK images and formats browsers
+    do not support (JPX, JBIG2, ...) are transcoded: lossy sources to RGB
+    JPEG, everything else to PNG.
+    """
+    info = doc.extract_image(xref) or {}
+    ext = info.get("ext")
+    if ext in WEB_SAFE_IMAGE_FORMATS and info.get("colorspace") != 4:
+        return info["image"], ext
+
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n - pix.alpha >= 4:  # CMYK: browsers and PNG need gray or RGB
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if ext in LOSSY_IMAGE_FORMATS and not pix.alpha:
+        return pix.tobytes("jpeg", jpg_quality=TRANSCODE_JPEG_QUALITY), "jpeg"
+    return pix.tobytes("png"), "png"
+
+
+def extract_images(doc: fitz.Document, assets_dir: Path) -> List[dict]:
+    """
+    Extract the document's images into assets_dir in a single pass.
+
+    Each image object (xref) is read once, and images with identical
+    content are written once, even when they are placed on many pages
+    (logos, headers) or embedded several times. The file is named after the
+    first placement (pageN_imgM.<ext>, see _image_bytes for the format);
+    later placements refer to that file.
+
     Args:
-        pdf_path: Path to input PDF file
-        job_dir: Job directory where output will be saved
-        
+        doc: Open PDF document
+        assets_dir: Directory for the image files
+
     Returns:
-        dict with keys:
-            - markdown_path: path to layout.md
-            - assets_dir: path to md_assets directory
-            - images_count: number of extracted images
-            - chars: character count of markdown text
-            - images: list of image metadata
+        List of placements: page, index on page, file, bbox and xref
     """
-    # Ensure job directory exists
-    job_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create assets directory
-    assets_dir = job_dir / "md_assets"
-    assets_dir.mkdir(exist_ok=True)
-    
-    # Extract images using PyMuPDF first
     images_metadata = []
-    doc = fitz.open(pdf_path)
-    
+    files_by_xref: Dict[int, str] = {}
+    files_by_hash: Dict[str, str] = {}
+
     for page_num, page in enumerate(doc):
-        img_list = page.get_images()
+        # full=True: items usable with get_image_bbox
+        img_list = page.get_images(full=True)
         for img_index, img in enumerate(img_list):
+            xref = img[0]
             try:
-                xref = img[0]
-                pix = fitz.Pixmap(doc, xref)
-                if pix.n - pix.alpha < 4:  # not RGBA
-                    pix = fitz.Pixmap(fitz.csRGB, pix)
-                
-                img_filename = f"page{page_num+1}_img{img_index+1}.png"
-                img_path = assets_dir / img_filename
-                pix.save(str(img_path))
-                pix = None
-                
+                img_filename = files_by_xref.get(xref)
+                if img_filename is None:
+                    img_bytes, ext = _image_bytes(doc, xref)
+
+                    digest = hashlib.sha256(img_bytes).hexdigest()
+                    img_filename = files_by_hash.get(digest)
+                    if img_filename is None:
+                        img_filename = f"page{page_num+1}_img{img_index+1}.{ext}"
+                        (assets_dir / img_filename).write_bytes(img_bytes)
+                        files_by_hash[digest] = img_filename
+                    files_by_xref[xref] = img_filename
+
                 # Get image bounding box (safely)
                 try:
                     bbox = page.get_image_bbox(img)
@@ -56,59 +83,181 @@ def pdf_to_markdown_with_assets(pdf_path: Path, job_dir: Path) -> dict:
                 except ValueError:
                     # Fallback to page dimensions if bbox extraction fails
                     bbox_coords = [0, 0, page.rect.width, page.rect.height]
-                
+
                 images_metadata.append({
                     "page": page_num + 1,
                     "index": img_index + 1,
                     "file": img_filename,
-                    "bbox": bbox_coords
+                    "bbox": bbox_coords,
+                    "xref": xref
                 })
-                
-                print(f"Page {page_num+1}, Image {img_index+1}: bbox={bbox_coords}")
+
+                print(f"Page {page_num+1}, Image {img_index+1}: {img_filename} bbox={bbox_coords}")
             except Exception as e:
                 print(f"Warning: Failed to extract image {img_index+1} on page {page_num+1}: {e}")
                 continue
-    
-    doc.close()
-    
-    # Convert PDF to Markdown with image extraction
-    md_text = pymupdf4llm.to_markdown(
-        str(pdf_path),
-        image_path=str(assets_dir)
-    )
-    
-    # Replace image placeholders with proper references
-    # Find all ![.*] patterns and replace them
-    def replace_image_placeholders(match):
-        # This is a simple approach - in practice, you might want to match
-        # the actual image filenames from pymupdf4llm
-        return f"![Figure](md_assets/page{match.group(1)}_img{match.group(2)}.png)"
-    
-    # Try to replace placeholders (this is a simplified approach)
-    # In practice, you'd need to correlate pymupdf4llm's image references
-    # with the actual extracted images
-    md_text = re.sub(r'!\[.*?\]\(image_(\d+)_(\d+)\.png\)', 
-                     r'![Figure](md_assets/page\1_img\2.png)', md_text)
-    
-    # Add extracted images section if images were found
-    if images_metadata:
+
+    return images_metadata
+
+
+def _split(items: List[int], chunks: int) -> List[List[int]]:
+    """Split items into `chunks` consecutive runs of similar size."""
+    bounds = [round(i * len(items) / chunks) for i in range(chunks + 1)]
+    return [items[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _header_info(doc: fitz.Document):
+    """
+    Document-wide header levels, or None with the layout engine.
+
+    Without the layout engine, pymupdf4llm derives header levels from font
+    sizes of the pages it sees; computing them on the whole document keeps
+    fragments of different page subsets consistent.
+    """
+    identify_headers = getattr(pymupdf4llm, "IdentifyHeaders", None)
+    return identify_headers(doc) if identify_headers is not None else None
+
+
+def _convert_pages(doc: fitz.Document, pages: List[int], options: Dict[str, Any]) -> List[str]:
+    """Markdown fragments for the given 0-based pages, in the same order."""
+    kwargs = dict(options)
+    hdr_info = _header_info(doc)
+    if hdr_info is not None:
+        kwargs["hdr_info"] = hdr_info
+    chunks = pymupdf4llm.to_markdown(doc, pages=pages, write_images=False, page_chunks=True, **kwargs)
+    return [chunk["text"] for chunk in chunks]
+
+
+def _convert_pages_worker(args: tuple) -> List[str]:
+    """Process pool entry point: convert a list of pages of the PDF."""
+    pdf_path, pages, options = args
+    doc = fitz.open(pdf_path)
+    try:
+        return _convert_pages(doc, pages, options)
+    finally:
+        doc.close()
+
+
+def _resolve_workers(workers: Optional[int], page_count: int) -> int:
+    """Number of processes to use (1 means convert in this process)."""
+    if workers is None:
+        workers = int(os.getenv("MARKDOWN_WORKERS", "0"))
+        if workers <= 0:
+            # Auto: use the cores only when the document is large enough to pay off
+            if page_count < MARKDOWN_PARALLEL_MIN_PAGES:
+                return 1
+            workers = os.cpu_count() or 1
+    return max(1, min(workers, page_count))
+
+
+def pdf_to_markdown_with_assets(
+    pdf_path: Path,
+    job_dir: Path,
+    workers: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> dict:
+    """
+    Convert PDF to Markdown + assets using pymupdf4llm and PyMuPDF.
+    Saves:
+      - layout.md  (full markdown)
+      - md_assets/  (directory for extracted images)
+    Returns small dict with paths + basic stats + image metadata.
+
+    The PDF is opened once. Images are extracted by extract_images only;
+    the markdown converter gets the same document and does not write its
+    own image copies.
+
+    layout.md is assembled from per-page fragments. With a cache_dir,
+    fragments are looked up by page content and options first and only the
+    missing pages are converted. Many missing pages are converted in
+    consecutive runs by a process pool while the images are extracted here.
+
+    Args:
+        pdf_path: Path to input PDF file
+        job_dir: Job directory where output will be saved
+        workers: Processes for conversion (default: MARKDOWN_WORKERS env,
+            or all cores when MARKDOWN_PARALLEL_MIN_PAGES pages or more)
+        cache_dir: Shared fragment cache (see markdown_cache); None disables it
+        options: Extra pymupdf4llm.to_markdown options (part of the cache key)
+
+    Returns:
+        dict with keys:
+            - markdown_path: path to layout.md
+            - assets_dir: path to md_assets directory
+            - images_count: number of image files written (unique images)
+            - chars: character count of markdown text
+            - images: list of image metadata, one entry per placement
+            - pages_converted / pages_cached: fragments converted now / reused
+    """
+    # Ensure job directory exists
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    # Create assets directory
+    assets_dir = job_dir / "md_assets"
+    assets_dir.mkdir(exist_ok=True)
+
+    options = dict(options or {})
+    doc = fitz.open(pdf_path)
+    try:
+        fragments: List[Optional[str]] = [None] * doc.page_count
+        keys: List[Optional[str]] = [None] * doc.page_count
+        page_cache = MarkdownPageCache(cache_dir) if cache_dir is not None else None
+        if page_cache is not None:
+            memo: Dict[int, bytes] = {}
+            hdr_info = _header_info(doc)
+            key_options = {**options, "headers": getattr(hdr_info, "header_id", None)}
+            for page in doc:
+                keys[page.number] = fragment_key(page_content_hash(doc, page, memo), **key_options)
+                fragments[page.number] = page_cache.get(keys[page.number])
+        misses = [i for i, fragment in enumerate(fragments) if fragment is None]
+
+        workers = _resolve_workers(workers, len(misses))
+        if misses and workers > 1:
+            runs = _split(misses, workers)
+            print(f"Converting {len(misses)} of {doc.page_count} pages to Markdown with {len(runs)} workers")
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=len(runs), mp_context=ctx) as pool:
+                results = pool.map(_convert_pages_worker, [(str(pdf_path), run, options) for run in runs])
+                # Extract images while the workers convert
+                images_metadata = extract_images(doc, assets_dir)
+                # map() yields in submission order, so fragments land on their pages
+                for run, texts in zip(runs, results):
+                    for page_index, text in zip(run, texts):
+                        fragments[page_index] = text
+        else:
+            images_metadata = extract_images(doc, assets_dir)
+            if misses:
+                print(f"Converting {len(misses)} of {doc.page_count} pages to Markdown")
+                # Convert from the already open document
+                for page_index, text in zip(misses, _convert_pages(doc, misses, options)):
+                    fragments[page_index] = text
+    finally:
+        doc.close()
+
+    if page_cache is not None:
+        for page_index in misses:
+            page_cache.put(keys[page_index], fragments[page_index])
+    md_text = "".join(fragments)
+
+    # Add extracted images section (each file once, in order of first appearance)
+    image_files = list(dict.fromkeys(img_meta["file"] for img_meta in images_metadata))
+    if image_files:
         md_text += "\n\n## Extracted Images\n\n"
-        for img_meta in images_metadata:
-            md_text += f"![Figure page{img_meta['page']}_img{img_meta['index']}]"
-            md_text += f"(md_assets/{img_meta['file']})\n\n"
-    
+        for img_file in image_files:
+            md_text += f"![Figure {Path(img_file).stem}](md_assets/{img_file})\n\n"
+
     # Save Markdown to layout.md
     layout_md_path = job_dir / "layout.md"
     with open(layout_md_path, "w", encoding="utf-8") as f:
         f.write(md_text)
-    
-    # Count extracted images
-    images_count = len(list(assets_dir.glob("*.png")))
-    
+
     return {
         "markdown_path": str(layout_md_path),
         "assets_dir": str(assets_dir),
-        "images_count": images_count,
+        "images_count": len(image_files),
         "chars": len(md_text),
-        "images": images_metadata
-    }
\ No newline at end of file
+        "images": images_metadata,
+        "pages_converted": len(misses),
+        "pages_cached": len(fragments) - len(misses)
+    }
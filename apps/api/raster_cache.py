@@ -0,0 +1,324 @@
+"""In-memory handoff of decoded page rasters between pipeline stages.
+
+Rendering decodes each page once; later stages (vision encoding, OCR,
+overlay generation, debug rendering) look the raster up here instead of
+re-reading and re-decoding the PNG. Samples live in POSIX shared memory
+when available so worker processes can attach to them without copying.
+PNG files are still written for persistence and serving.
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RASTER_CACHE_MB = 512
+
+try:
+    from multiprocessing import shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+
+def _attach_shared_memory(name: str):
+    """Attach to an existing segment without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: attaching registers the segment with the resource tracker.
+        # Pool workers share the owner's tracker (registration is idempotent there);
+        # unrelated processes must unregister or their tracker unlinks it on exit.
+        shm = shared_memory.SharedMemory(name=name)
+        if multiprocessing.parent_process() is None:
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        return shm
+
+
+class Raster:
+    """Decoded RGB raster (3 samples per pixel) backed by shared memory or a local buffer."""
+
+    def __init__(self, width: int, height: int, n: int, buffer, shm=None, png_bytes: Optional[bytes] = None):
+        self.width = width
+        self.height = height
+        self.n = n
+        self.png_bytes = png_bytes
+        self._buffer = buffer
+        self._shm = shm
+
+    @property
+    def nbytes(self) -> int:
+        return self.width * self.height * self.n
+
+    @property
+    def samples(self) -> memoryview:
+        """Raw interleaved samples (zero-copy view)."""
+        return memoryview(self._buffer)[:self.nbytes]
+
+    def handle(self) -> Optional[Dict[str, Any]]:
+        """Picklable description for attaching from another process (None if not shared)."""
+        if self._shm is None:
+            return None
+        return {"name": self._shm.name, "width": self.width, "height": self.height, "n": self.n}
+
+    def to_pixmap(self) -> "fitz.Pixmap":
+        """
+        Build a PyMuPDF pixmap from the samples (no PNG decode).
+
+        MuPDF owns pixmap memory, so the samples are copied once, straight
+        from the shared buffer into the pixmap (no intermediate bytes object).
+        """
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, self.width, self.height), 0)
+        pix.samples_mv[:] = self.samples
+        return pix
+
+    def to_pil(self):
+        """Build a mutable PIL image from the samples (no PNG decode, single copy)."""
+        from PIL import Image
+        return Image.frombytes("RGB", (self.width, self.height), self.samples)
+
+    def to_array(self, bgr: bool = False):
+        """Return a NumPy view (H, W, C) of the samples; BGR order copies."""
+        import numpy as np
+        array = np.frombuffer(self.samples, dtype=np.uint8).reshape(self.height, self.width, self.n)
+        if bgr:
+            return np.ascontiguousarray(array[:, :, ::-1])
+        return array
+
+    def unlink(self) -> None:
+        """
+        Remove the shared segment name (owning process only).
+
+        The mapping stays valid for anyone still holding this raster and is
+        released when the last reference goes away.
+        """
+        if self._shm is not None:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Release an attached shared segment."""
+        self._buffer = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes away with it
+                pass
+            self._shm = None
+
+
+def attach_raster(handle: Dict[str, Any]) -> Raster:
+    """
+    Attach to a raster published by another process.
+
+    Args:
+        handle: Dictionary returned by Raster.handle()
+
+    Returns:
+        Raster viewing the shared samples (caller should close() it when done)
+    """
+    shm = _attach_shared_memory(handle["name"])
+    return Raster(handle["width"], handle["height"], handle["n"], shm.buf, shm=shm)
+
+
+def _normalize_pixmap(pix: "fitz.Pixmap") -> "fitz.Pixmap":
+    """Convert to RGB without alpha so every stage sees the same layout."""
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+
+class RasterCache:
+    """Process-wide LRU of decoded rasters keyed by their PNG path."""
+
+    def __init__(self, max_memory_mb: Optional[int] = None, use_shared_memory: bool = True):
+        if max_memory_mb is None:
+            max_memory_mb = int(os.getenv("RASTER_CACHE_MB", str(DEFAULT_RASTER_CACHE_MB)))
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.use_shared_memory = use_shared_memory and SHARED_MEMORY_AVAILABLE
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Segments handed to other processes: pin count, and rasters dropped while pinned
+        self._pins: Dict[str, int] = {}
+        self._pending_unlink: Dict[str, Raster] = {}
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "decodes": 0}
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _allocate(self, nbytes: int):
+        if self.use_shared_memory and nbytes > 0:
+            try:
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                return shm.buf, shm
+            except OSError as e:
+                # e.g. small /dev/shm in containers
+                logger.warning(f"Shared memory unavailable, using local buffer: {e}")
+        return bytearray(nbytes), None
+
+    def put(self, path: Path, pix: "fitz.Pixmap", png_bytes: Optional[bytes] = None) -> Raster:
+        """
+        Register the decoded raster for a PNG path.
+
+        Args:
+            path: Path of the PNG file (written before calling, so its stamp is current)
+            pix: Decoded pixmap for the file
+            png_bytes: Encoded PNG bytes, kept for stages that need the file content
+
+        Returns:
+            Cached Raster
+        """
+        pix = _normalize_pixmap(pix)
+        nbytes = pix.width * pix.height * pix.n
+        buffer, shm = self._allocate(nbytes)
+        buffer[:nbytes] = pix.samples_mv
+        raster = Raster(pix.width, pix.height, pix.n, buffer, shm=shm, png_bytes=png_bytes)
+
+        key = self._key(path)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (self._stamp(path), raster)
+            self._trim(keep=key)
+        return raster
+
+    def get(self, path: Path) -> Optional[Raster]:
+        """Return the cached raster if the file has not changed since it was cached."""
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stamp, raster = entry
+            if stamp != self._stamp(path):
+                self._drop(key)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return raster
+
+    def load(self, path: Path) -> Raster:
+        """Return the cached raster, decoding the file once on a miss."""
+        raster = self.get(path)
+        if raster is not None:
+            return raster
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Image not found: {path}")
+        self.stats["decodes"] += 1
+        with open(path, "rb") as f:
+            png_bytes = f.read()
+        pix = fitz.Pixmap(png_bytes)
+        return self.put(path, pix, png_bytes=png_bytes)
+
+    def memory_in_use(self) -> int:
+        return sum(raster.nbytes + len(raster.png_bytes or b"") for _, raster in self._entries.values())
+
+    @contextmanager
+    def pinned(self, paths: List[Path]) -> Iterator[List[Optional[Dict[str, Any]]]]:
+        """
+        Hand out shared-memory handles that stay attachable until the block exits.
+
+        Eviction or invalidation while pinned only removes the cache entry;
+        the segment name is unlinked once the last pin is released, so worker
+        processes can still attach to it.
+
+        Args:
+            paths: PNG paths of the rasters to hand out
+
+        Yields:
+            Handle per path (None if the raster is not cached or not shared)
+        """
+        names = []
+        handles = []
+        with self._lock:
+            for path in paths:
+                raster = self.get(path)
+                handle = raster.handle() if raster is not None else None
+                if handle is not None:
+                    self._pins[handle["name"]] = self._pins.get(handle["name"], 0) + 1
+                    names.append(handle["name"])
+                handles.append(handle)
+        try:
+            yield handles
+        finally:
+            with self._lock:
+                for name in names:
+                    self._pins[name] -= 1
+                    if self._pins[name] == 0:
+                        del self._pins[name]
+                        raster = self._pending_unlink.pop(name, None)
+                        if raster is not None:
+                            raster.unlink()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        raster = entry[1]
+        handle = raster.handle()
+        if handle is not None and handle["name"] in self._pins:
+            self._pending_unlink[handle["name"]] = raster
+        else:
+            raster.unlink()
+
+    def _trim(self, keep: Optional[str] = None) -> None:
+        while self._entries and self.memory_in_use() > self.max_memory_bytes:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._drop(key)
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            self._drop(self._key(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+
+# Global raster cache instance
+raster_cache = RasterCache()
+atexit.register(raster_cache.clear)
+
+
+def load_raster(path: Path) -> Raster:
+    """
+    Get the decoded raster for an image file, decoding it at most once.
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        Raster with width, height and RGB samples
+    """
+    return raster_cache.load(path)
@@ -187,7 +187,7 @@ def verify_output(job_id, pdf_path, mode="html"):
     
     print(f"✅ PDF file exists and is {file_size} bytes")
     
-    # Check render.html contains our test string and base64 images (only for HTML mode)
+    # Check render.html contains our test string and page images (only for HTML mode)
     if mode == "html":
         job_dir = PROJECT_ROOT / "data" / "jobs" / job_id
         render_html_path = job_dir / "render.html"
@@ -208,9 +208,9 @@ def verify_output(job_id, pdf_path, mode="html"):
             print("❌ render.html does not contain test string 'Тестируем пдф'")
             sys.exit(1)
         
-        # Check for base64 embedded images
-        if "data:image/png;base64," not in content:
-            print("❌ render.html does not contain base64 embedded images")
+        # Check for linked page images
+        if 'src="pages/page_' not in content:
+            print("❌ render.html does not contain page images")
             sys.exit(1)
         
         # Check exact page count matches vision data
@@ -224,7 +224,7 @@ def verify_output(job_id, pdf_path, mode="html"):
             sys.exit(1)
         
         print("✅ render.html contains test string")
-        print("✅ render.html contains base64 embedded images")
+        print("✅ render.html contains page images")
         print(f"✅ Page count matches: {page_count} pages")
     
     # Check appropriate output file exists in job directory
@@ -0,0 +1,472 @@
+"""Retention of derived job artifacts: TTLs, disk quota and restoration.
+
+Files in a job directory are either kept forever (input.pdf, job.json,
+vision.json, edits, OCR translations, markdown sources, translated images)
+or belong to a class of derived artifacts that can be rebuilt from them
+(page images, debug pages, render.html, output PDFs, extracted markdown
+images, overlay page cache, scratch files). The shared markdown fragment
+cache outside the job directories is collected too. The garbage collector
+removes derived artifacts whose class TTL has passed since they were last
+used, then evicts the least recently used ones while the storage is over
+the quota.
+
+What was removed is recorded in the job's retention.json. The restore_*
+helpers consult it when a request needs an artifact and rebuild it, so old
+job links keep working. Caches are not recorded: their users rebuild
+missing entries by themselves. Output PDFs are only collected when the
+artifact manifest holds the recipe to rebuild them.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from artifact_cache import ArtifactManifest
+from debug_render import render_all_debug_pages
+from generate_variants import render_variant
+from html_render import generate_pdf_from_markdown, write_vision_html
+from overlay_cache import OVERLAY_CACHE_DIRNAME
+from pdf_optimize import optimize_pdf_file
+from pdf_render import render_pdf_to_pngs
+from pdf_to_markdown import extract_images
+
+logger = logging.getLogger(__name__)
+
+RETENTION_RECORD = "retention.json"
+
+# Derived artifact classes: path pattern (relative to the job dir) and default TTL.
+# "cache" classes are rebuilt on demand by their users, so removals are not recorded.
+ARTIFACT_CLASSES: Dict[str, Dict[str, Any]] = {
+    "page_images": {"pattern": r"pages/page_\d+\.png", "ttl_hours": 168},
+    "debug_pages": {"pattern": r"pages/debug_page_\d+\.png", "ttl_hours": 24},
+    "render_html": {"pattern": r"render\.html", "ttl_hours": 72},
+    "pdf_outputs": {"pattern": r"(output[\w-]*|result|result_ocr_overlay)\.pdf", "ttl_hours": 168},
+    "md_images": {"pattern": r"md_assets/page\d+_img\d+\.\w+", "ttl_hours": 168},
+    "overlay_cache": {"pattern": rf"{OVERLAY_CACHE_DIRNAME}/.+", "ttl_hours": 72, "cache": True},
+    "scratch": {
+        "pattern": r"markdown\.html|overlay_report\.json|report_[\w-]+\.json|openai_(raw|error)\.txt"
+                   r"|openai_request_meta\.json|vision_translate_debug_[\w.-]+\.json",
+        "ttl_hours": 72,
+    },
+}
+_CLASS_RES = {name: re.compile(spec["pattern"]) for name, spec in ARTIFACT_CLASSES.items()}
+
+# Shared markdown fragment cache (storage dir/markdown_cache), collected per fragment
+MARKDOWN_CACHE_CLASS = "markdown_cache"
+MARKDOWN_CACHE_TTL_HOURS = 720
+
+DEFAULT_MIN_AGE_MINUTES = 30
+
+_restore_locks: Dict[str, threading.Lock] = {}
+_restore_locks_guard = threading.Lock()
+
+
+def class_ttls() -> Dict[str, float]:
+    """TTL per class in hours (RETENTION_TTL_HOURS_<CLASS> env overrides; 0 keeps forever)."""
+    defaults = {name: spec["ttl_hours"] for name, spec in ARTIFACT_CLASSES.items()}
+    defaults[MARKDOWN_CACHE_CLASS] = MARKDOWN_CACHE_TTL_HOURS
+    return {
+        name: float(os.getenv(f"RETENTION_TTL_HOURS_{name.upper()}", str(ttl)))
+        for name, ttl in defaults.items()
+    }
+
+
+def quota_bytes() -> int:
+    """Disk quota of the jobs directory (STORAGE_QUOTA_MB env; 0 means no quota)."""
+    return int(float(os.getenv("STORAGE_QUOTA_MB", "0")) * 1024 * 1024)
+
+
+def min_age_seconds() -> float:
+    """Artifacts used more recently than this are never collected (RETENTION_MIN_AGE_MINUTES)."""
+    return float(os.getenv("RETENTION_MIN_AGE_MINUTES", str(DEFAULT_MIN_AGE_MINUTES))) * 60
+
+
+def artifact_class(rel_path: str) -> Optional[str]:
+    """Class of a job file given its POSIX path relative to the job dir, or None if it is kept."""
+    for name, pattern in _CLASS_RES.items():
+        if pattern.fullmatch(rel_path):
+            return name
+    return None
+
+
+def removed_artifacts(job_dir: Path) -> Dict[str, List[str]]:
+    """Class -> relative paths the collector removed from a job and nothing restored yet."""
+    try:
+        with open(job_dir / RETENTION_RECORD, "r", encoding="utf-8") as f:
+            return json.load(f).get("removed", {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_removed(job_dir: Path, removed: Dict[str, List[str]]) -> None:
+    path = job_dir / RETENTION_RECORD
+    removed = {name: paths for name, paths in removed.items() if paths}
+    if not removed:
+        path.unlink(missing_ok=True)
+        return
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"removed": removed}, f, indent=2)
+    tmp_path.replace(path)
+
+
+def _forget_removed(job_dir: Path, name: str, paths: Optional[List[str]] = None) -> None:
+    """Drop restored paths (default: the whole class) from the retention record."""
+    removed = removed_artifacts(job_dir)
+    if name in removed:
+        removed[name] = [p for p in removed[name] if paths is not None and p not in paths]
+        _write_removed(job_dir, removed)
+
+
+def _has_recipe(job_dir: Path, name: str) -> bool:
+    entry = ArtifactManifest(job_dir).entry(name)
+    return bool(entry and entry.get("meta", {}).get("recipe"))
+
+
+def _scan_job(job_dir: Path, groups: List[Dict[str, Any]]) -> int:
+    """Append the job's derived artifact groups; return the job's total size in bytes."""
+    total = 0
+    by_group: Dict[str, Dict[str, Any]] = {}
+    for path in job_dir.rglob("*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if not path.is_file():
+            continue
+        total += st.st_size
+        rel_path = path.relative_to(job_dir).as_posix()
+        name = artifact_class(rel_path)
+        if name is None:
+            continue
+        # Output PDFs go one by one; other classes are rebuilt (and collected) as a whole
+        group_id = rel_path if name == "pdf_outputs" else name
+        group = by_group.setdefault(group_id, {
+            "job_id": job_dir.name, "class": name, "files": [], "bytes": 0, "last_used": 0.0
+        })
+        group["files"].append(rel_path)
+        group["bytes"] += st.st_size
+        group["last_used"] = max(group["last_used"], st.st_atime, st.st_mtime)
+
+    for group in by_group.values():
+        if group["class"] == "pdf_outputs" and not _has_recipe(job_dir, group["files"][0]):
+            continue  # Made before recipes were recorded: cannot be rebuilt
+        groups.append(group)
+    return total
+
+
+def _scan_markdown_cache(cache_dir: Path, groups: List[Dict[str, Any]]) -> int:
+    """Append one group per cached markdown fragment; return the cache size in bytes."""
+    total = 0
+    for path in cache_dir.rglob("*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if not path.is_file():
+            continue
+        total += st.st_size
+        groups.append({
+            "job_id": None, "class": MARKDOWN_CACHE_CLASS, "files": [path.relative_to(cache_dir).as_posix()],
+            "bytes": st.st_size, "last_used": max(st.st_atime, st.st_mtime)
+        })
+    return total
+
+
+def collect_garbage(
+    jobs_dir: Path,
+    dry_run: bool = True,
+    ttls: Optional[Dict[str, float]] = None,
+    quota: Optional[int] = None,
+    min_age: Optional[float] = None,
+    now: Optional[float] = None,
+    markdown_cache_dir: Optional[Path] = None
+) -> Dict[str, Any]:
+    """
+    Remove expired derived artifacts, then evict LRU ones until under the quota.
+
+    Last use is the later of a file's access and modification times, taken
+    over all files of a group (one output PDF, one class of a job, or one
+    markdown cache fragment).
+
+    Args:
+        jobs_dir: Directory holding one directory per job
+        dry_run: Only report what would be removed
+        ttls: Hours per class (default: class_ttls())
+        quota: Bytes allowed for jobs_dir and the markdown cache, 0 for none (default: quota_bytes())
+        min_age: Seconds since last use before anything is collected (default: min_age_seconds())
+        now: Current time (for tests)
+        markdown_cache_dir: Shared markdown fragment cache, counted and collected too
+
+    Returns:
+        Report dict: usage before/after, freed bytes, per-class totals and removed
+        job groups (markdown cache fragments only appear in the per-class totals)
+    """
+    ttls = class_ttls() if ttls is None else {**class_ttls(), **ttls}
+    quota = quota_bytes() if quota is None else quota
+    min_age = min_age_seconds() if min_age is None else min_age
+    now = time.time() if now is None else now
+
+    groups: List[Dict[str, Any]] = []
+    usage = 0
+    job_dirs = [p for p in jobs_dir.iterdir() if p.is_dir()] if jobs_dir.exists() else []
+    for job_dir in job_dirs:
+        usage += _scan_job(job_dir, groups)
+    if markdown_cache_dir is not None and markdown_cache_dir.exists():
+        usage += _scan_markdown_cache(markdown_cache_dir, groups)
+
+    selected = []
+    kept = []
+    for group in groups:
+        ttl = ttls.get(group["class"], 0)
+        if ttl > 0 and now - group["last_used"] > max(ttl * 3600, min_age):
+            selected.append({**group, "reason": "ttl"})
+        else:
+            kept.append(group)
+
+    remaining = usage - sum(group["bytes"] for group in selected)
+    if quota > 0 and remaining > quota:
+        # Least recently used first
+        candidates = sorted((g for g in kept if now - g["last_used"] > min_age), key=lambda g: g["last_used"])
+        for group in candidates:
+            if remaining <= quota:
+                break
+            selected.append({**group, "reason": "quota"})
+            remaining -= group["bytes"]
+
+    by_class: Dict[str, Dict[str, int]] = {}
+    freed = 0
+    for group in selected:
+        totals = by_class.setdefault(group["class"], {"groups": 0, "files": 0, "bytes": 0})
+        totals["groups"] += 1
+        totals["files"] += len(group["files"])
+        totals["bytes"] += group["bytes"]
+        freed += group["bytes"]
+        if not dry_run:
+            if group["class"] == MARKDOWN_CACHE_CLASS:
+                (markdown_cache_dir / group["files"][0]).unlink(missing_ok=True)
+            else:
+                _remove_group(jobs_dir / group["job_id"], group)
+
+    report = {
+        "dry_run": dry_run,
+        "jobs_scanned": len(job_dirs),
+        "usage_bytes": usage,
+        "usage_after_bytes": usage - freed,
+        "quota_bytes": quota,
+        "over_quota": quota > 0 and usage - freed > quota,
+        "freed_bytes": freed,
+        "ttl_hours": ttls,
+        "by_class": by_class,
+        "removed": [
+            {**group, "last_used": round(group["last_used"])}
+            for group in selected if group["class"] != MARKDOWN_CACHE_CLASS
+        ],
+    }
+    logger.info(
+        f"Retention {'dry run' if dry_run else 'run'}: {len(selected)} groups, "
+        f"{freed} of {usage} bytes" + (" (still over quota)" if report["over_quota"] else "")
+    )
+    return report
+
+
+def _remove_group(job_dir: Path, group: Dict[str, Any]) -> None:
+    """Delete a group's files and record them for restoration (caches are not recorded)."""
+    record = not ARTIFACT_CLASSES[group["class"]].get("cache")
+    removed = removed_artifacts(job_dir)
+    paths = removed.setdefault(group["class"], [])
+    for rel_path in group["files"]:
+        try:
+            (job_dir / rel_path).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove {job_dir.name}/{rel_path}: {e}")
+            continue
+        if record and rel_path not in paths:
+            paths.append(rel_path)
+    if record:
+        _write_removed(job_dir, removed)
+
+
+def _restore_lock(job_dir: Path) -> threading.Lock:
+    """One restoration at a time per job, so concurrent requests rebuild once."""
+    with _restore_locks_guard:
+        return _restore_locks.setdefault(str(job_dir), threading.Lock())
+
+
+def _load_vision(job_dir: Path) -> Dict[str, Any]:
+    """edited.json if present, otherwise vision.json."""
+    source = job_dir / "edited.json"
+    if not source.exists():
+        source = job_dir / "vision.json"
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def restore_page_images(job_dir: Path, job_data: Dict[str, Any]) -> int:
+    """
+    Re-render collected page images from the input PDF.
+
+    Args:
+        job_dir: Job directory
+        job_data: Loaded job.json (input_path, dpi)
+
+    Returns:
+        Number of pages rendered (0 if nothing was missing)
+    """
+    with _restore_lock(job_dir):
+        missing = [p for p in removed_artifacts(job_dir).get("page_images", []) if not (job_dir / p).exists()]
+        if not missing:
+            return 0
+        last_page = max(int(re.search(r"(\d+)", Path(p).stem).group(1)) for p in missing)
+        dpi = job_data.get("dpi", int(os.getenv("VISION_DPI", "144")))
+        rendered = render_pdf_to_pngs(
+            input_pdf_path=Path(job_data["input_path"]),
+            out_dir=job_dir / "pages",
+            max_pages=last_page,
+            dpi=dpi
+        )
+        _forget_removed(job_dir, "page_images")
+        logger.info(f"Restored {len(rendered)} page images for job {job_dir.name}")
+        return len(rendered)
+
+
+def restore_debug_pages(job_dir: Path, job_data: Dict[str, Any]) -> int:
+    """Re-render collected debug page images. Returns the number rendered."""
+    restore_page_images(job_dir, job_data)
+    with _restore_lock(job_dir):
+        missing = [p for p in removed_artifacts(job_dir).get("debug_pages", []) if not (job_dir / p).exists()]
+        if not missing:
+            return 0
+        count = render_all_debug_pages(job_dir, _load_vision(job_dir))
+        _forget_removed(job_dir, "debug_pages")
+        return count
+
+
+def restore_render_html(job_dir: Path, job_data: Dict[str, Any]) -> bool:
+    """Rewrite a collected render.html (and the page images it links). Returns True if rebuilt."""
+    restore_page_images(job_dir, job_data)
+    with _restore_lock(job_dir):
+        if "render_html" not in removed_artifacts(job_dir) or (job_dir / "render.html").exists():
+            return False
+        title = job_data.get("filename", f"Document {job_dir.name}")
+        write_vision_html(job_dir / "render.html", _load_vision(job_dir), title, job_dir)
+        _forget_removed(job_dir, "render_html")
+        return True
+
+
+def _convert_image(source: Path, target: Path) -> None:
+    """Write source as target, re-encoding when the extensions differ."""
+    if source.suffix.lower() == target.suffix.lower():
+        shutil.copyfile(source, target)
+        return
+    from PIL import Image
+    with Image.open(source) as image:
+        if target.suffix.lower() in (".jpg", ".jpeg") and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(target)
+
+
+def restore_markdown_images(job_dir: Path, job_data: Dict[str, Any]) -> int:
+    """
+    Re-extract collected markdown images from the input PDF.
+
+    extract_images names files after their first placement, but a job
+    extracted by an older version may refer to other names: PNG where the
+    image is now kept in its native format, or a per-placement copy where
+    duplicates now share one file. Every recorded path that re-extraction
+    did not produce is written from the image at the same placement, so the
+    names layout.md and the edits refer to exist again.
+
+    Returns:
+        Number of image placements extracted (0 if nothing was missing)
+    """
+    with _restore_lock(job_dir):
+        missing = [p for p in removed_artifacts(job_dir).get("md_images", []) if not (job_dir / p).exists()]
+        if not missing:
+            return 0
+        assets_dir = job_dir / "md_assets"
+        assets_dir.mkdir(exist_ok=True)
+        doc = fitz.open(job_data["input_path"])
+        try:
+            images = extract_images(doc, assets_dir)
+        finally:
+            doc.close()
+
+        by_placement = {(image["page"], image["index"]): image["file"] for image in images}
+        for rel_path in missing:
+            target = job_dir / rel_path
+            match = re.fullmatch(r"md_assets/page(\d+)_img(\d+)\.\w+", rel_path)
+            source = by_placement.get((int(match.group(1)), int(match.group(2)))) if match else None
+            if target.exists() or source is None:
+                continue
+            try:
+                _convert_image(assets_dir / source, target)
+            except Exception as e:
+                logger.warning(f"Could not restore {job_dir.name}/{rel_path} from {source}: {e}")
+        _forget_removed(job_dir, "md_images")
+        logger.info(f"Restored markdown images for job {job_dir.name}")
+        return len(images)
+
+
+async def restore_output(job_dir: Path, job_data: Dict[str, Any], name: str) -> bool:
+    """
+    Rebuild a collected output PDF from the recipe in the artifact manifest.
+
+    Args:
+        job_dir: Job directory
+        job_data: Loaded job.json
+        name: Artifact file name inside job_dir
+
+    Returns:
+        True if the PDF was rebuilt
+    """
+    if (job_dir / name).exists() or name not in removed_artifacts(job_dir).get("pdf_outputs", []):
+        return False
+    manifest = ArtifactManifest(job_dir)
+    entry = manifest.entry(name) or {}
+    meta = entry.get("meta", {})
+    recipe = meta.get("recipe")
+    if not recipe:
+        return False
+
+    if recipe["kind"] == "generate":
+        await asyncio.to_thread(restore_page_images, job_dir, job_data)
+        vision_data = await asyncio.to_thread(_load_vision, job_dir)
+        title = job_data.get("filename", f"Document {job_dir.name}")
+        await render_variant(recipe["variant"], job_dir, job_data, vision_data, title, name)
+    else:
+        await asyncio.to_thread(restore_markdown_images, job_dir, job_data)
+        await generate_pdf_from_markdown(
+            job_dir / recipe["source"], job_dir / name,
+            variant=recipe.get("variant", 1), engine=recipe.get("engine"), chunks=recipe.get("chunks")
+        )
+        optimize, optimize_dpi, linearize = recipe.get("optimize", [False, None, False])
+        if optimize:
+            await asyncio.to_thread(optimize_pdf_file, job_dir / name, target_dpi=optimize_dpi, linearize=linearize)
+
+    # Same inputs as before: the recorded key is valid for the rebuilt file
+    manifest.record(name, entry["key"], meta)
+    _forget_removed(job_dir, "pdf_outputs", [name])
+    logger.info(f"Restored {job_dir.name}/{name}")
+    return True
+
+
+async def retention_loop(jobs_dir: Path, interval_minutes: float, markdown_cache_dir: Optional[Path] = None) -> None:
+    """Run the collector every interval_minutes until cancelled."""
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            await asyncio.to_thread(collect_garbage, jobs_dir, dry_run=False, markdown_cache_dir=markdown_cache_dir)
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
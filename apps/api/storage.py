@@ -1,11 +1,31 @@
 import os
+import re
 import json
+import time
 import shutil
+import logging
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 import uuid
 from datetime import datetime
 
+from job_index import JobIndex, JOB_INDEX_FILENAME
+from storage_backend import LocalBackend, ObjectInfo, backend_from_env
+
+logger = logging.getLogger(__name__)
+
+# Local record of job files already uploaded to a remote backend
+PUBLISHED_RECORD = ".published.json"
+
+# Job files other nodes may rewrite; re-fetched on load when the remote copy changed
+JOB_STATE_FILES = ("job.json", "edited.json", "ocr_translations.json")
+
+# Node-local caches and scratch files (relative to the job dir) that are never uploaded
+UNPUBLISHED_RE = re.compile(r"overlay_cache/.*|markdown\.html|[^/]+\.chunk\d+\.html|.*\.tmp")
+
 # Project root is two levels up from this file (apps/api/storage.py -> project root)
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
@@ -38,6 +58,19 @@ class StorageManager:
         self.base_dir = resolve_storage_dir()
         self.jobs_dir = self.base_dir / "jobs"
         self._ensure_storage_directories()
+        self.backend = backend_from_env(self.base_dir)
+        self.job_index = JobIndex(self.base_dir / JOB_INDEX_FILENAME)
+        # Seconds a job's state files are trusted before the remote copies are checked again
+        self.refresh_seconds = float(os.getenv("STORAGE_REFRESH_SECONDS", "2"))
+        self._refreshed_at: Dict[str, float] = {}
+        self._job_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+        self._locks_lock = threading.Lock()
+        self._publisher = ThreadPoolExecutor(
+            max_workers=int(os.getenv("STORAGE_PUBLISH_WORKERS", "4")), thread_name_prefix="publish"
+        )
+        self._queued_publishes: Dict[str, Future] = {}
+        self._publishes: set = set()
+        self.sync_job_index()
     
     def _ensure_storage_directories(self):
         """Create storage directories if they don't exist"""
@@ -77,17 +110,255 @@ class StorageManager:
         
         return file_path
     
+    @property
+    def is_remote(self) -> bool:
+        """Whether job files live in a backend other than the local storage directory"""
+        return not (isinstance(self.backend, LocalBackend) and self.backend.root.resolve() == self.base_dir.resolve())
+    
+    @staticmethod
+    def job_key(job_id: str, rel_path: str = "") -> str:
+        """Backend key of a file in a job directory"""
+        return f"jobs/{job_id}/{rel_path}"
+    
+    def artifact_info(self, job_id: str, rel_path: str) -> Optional[ObjectInfo]:
+        """Size and mtime of a job file in the backend, or None if it does not exist"""
+        return self.backend.stat(self.job_key(job_id, rel_path))
+    
+    def artifact_stream(self, job_id: str, rel_path: str) -> Iterator[bytes]:
+        """Stream a job file from the backend in chunks"""
+        return self.backend.get_stream(self.job_key(job_id, rel_path))
+    
+    def _published(self, job_dir: Path) -> Dict[str, Any]:
+        try:
+            with open(job_dir / PUBLISHED_RECORD, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def _save_published(self, job_dir: Path, published: Dict[str, Any]) -> None:
+        temp_file = job_dir / f"{PUBLISHED_RECORD}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(published, f)
+        temp_file.replace(job_dir / PUBLISHED_RECORD)
+    
+    def _job_lock(self, job_id: str) -> threading.Lock:
+        """Lock serializing uploads and downloads of one job (and its .published.json)"""
+        with self._locks_lock:
+            lock = self._job_locks.get(job_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._job_locks[job_id] = lock
+            return lock
+    
+    @staticmethod
+    def _fingerprint(path: Path) -> List[int]:
+        st = path.stat()
+        return [st.st_size, st.st_mtime_ns]
+    
+    def publish_job(self, job_id: str) -> int:
+        """
+        Upload new and changed files of a job directory to a remote backend.
+        
+        Files are compared by size and mtime with what was uploaded last;
+        nothing is deleted remotely. Caches and scratch files (UNPUBLISHED_RE)
+        stay local. No-op with the local backend.
+        
+        Returns:
+            Number of files uploaded
+        """
+        if not self.is_remote:
+            return 0
+        job_dir = self.jobs_dir / job_id
+        with self._job_lock(job_id):
+            published = self._published(job_dir)
+            uploaded = 0
+            for path in sorted(job_dir.rglob("*")):
+                if not path.is_file() or path.name.startswith("."):
+                    continue
+                rel_path = path.relative_to(job_dir).as_posix()
+                if UNPUBLISHED_RE.fullmatch(rel_path):
+                    continue
+                fingerprint = self._fingerprint(path)
+                if published.get(rel_path, [])[:2] == fingerprint:
+                    continue
+                key = self.job_key(job_id, rel_path)
+                self.backend.put_file(key, path)
+                if rel_path in JOB_STATE_FILES:
+                    # Remember our own upload so refresh_job does not fetch it back
+                    info = self.backend.stat(key)
+                    fingerprint = fingerprint + ([info.version] if info is not None else [])
+                published[rel_path] = fingerprint
+                uploaded += 1
+            if uploaded:
+                self._save_published(job_dir, published)
+                logger.info(f"Published {uploaded} files of job {job_id} to {self.backend.name}")
+        return uploaded
+    
+    def schedule_publish(self, job_id: str) -> Optional[Future]:
+        """
+        Publish a job in a background thread, so request handlers do not wait for uploads.
+        
+        A publish still waiting in the queue already covers later changes of
+        the same job, so it is returned instead of queueing another.
+        
+        Returns:
+            Future of the publish (None with the local backend)
+        """
+        if not self.is_remote:
+            return None
+        with self._locks_lock:
+            future = self._queued_publishes.get(job_id)
+            if future is None:
+                future = self._publisher.submit(self._background_publish, job_id)
+                self._queued_publishes[job_id] = future
+                self._publishes.add(future)
+                future.add_done_callback(self._publishes.discard)
+            return future
+    
+    def _background_publish(self, job_id: str) -> int:
+        with self._locks_lock:
+            self._queued_publishes.pop(job_id, None)
+        try:
+            return self.publish_job(job_id)
+        except Exception as e:
+            # Unpublished files are retried by the next publish of the job
+            logger.error(f"Publishing job {job_id} failed: {e}")
+            return 0
+    
+    def wait_for_publishes(self, timeout: Optional[float] = None) -> None:
+        """Block until the background publishes scheduled so far are finished"""
+        wait(list(self._publishes), timeout=timeout)
+    
+    def hydrate_job(self, job_id: str) -> int:
+        """
+        Download the files of a job that exist remotely but not in the local job directory.
+        
+        Local files are never overwritten (see refresh_job for the state
+        files). No-op with the local backend.
+        
+        Returns:
+            Number of files downloaded
+        """
+        if not self.is_remote:
+            return 0
+        job_dir = self.jobs_dir / job_id
+        prefix = self.job_key(job_id)
+        with self._job_lock(job_id):
+            published = self._published(job_dir)
+            downloaded = 0
+            for info in self.backend.list(prefix):
+                rel_path = info.key[len(prefix):]
+                local_path = job_dir / rel_path
+                if local_path.exists():
+                    continue
+                self.backend.get_file(info.key, local_path)
+                published[rel_path] = self._fingerprint(local_path) + [info.version]
+                downloaded += 1
+            if downloaded:
+                self._save_published(job_dir, published)
+                logger.info(f"Fetched {downloaded} files of job {job_id} from {self.backend.name}")
+        self._refreshed_at[job_id] = time.monotonic()
+        return downloaded
+    
+    def refresh_job(self, job_id: str) -> int:
+        """
+        Re-fetch the state files (JOB_STATE_FILES) another node changed in the remote backend.
+        
+        A remote file is downloaded when its version (ETag, or size and mtime)
+        differs from the one last uploaded or fetched here. Local changes that
+        are not published yet are kept. Checks of a job are at most once per
+        refresh_seconds. No-op with the local backend.
+        
+        Returns:
+            Number of files downloaded
+        """
+        if not self.is_remote:
+            return 0
+        now = time.monotonic()
+        if now - self._refreshed_at.get(job_id, float("-inf")) < self.refresh_seconds:
+            return 0
+        self._refreshed_at[job_id] = now
+        
+        job_dir = self.jobs_dir / job_id
+        with self._job_lock(job_id):
+            published = self._published(job_dir)
+            downloaded = 0
+            for rel_path in JOB_STATE_FILES:
+                info = self.backend.stat(self.job_key(job_id, rel_path))
+                record = published.get(rel_path)
+                if info is None or (record is not None and record[2:] == [info.version]):
+                    continue
+                local_path = job_dir / rel_path
+                if local_path.exists() and (record is None or self._fingerprint(local_path) != record[:2]):
+                    continue  # Changed here and not published yet
+                self.backend.get_file(info.key, local_path)
+                published[rel_path] = self._fingerprint(local_path) + [info.version]
+                downloaded += 1
+            if downloaded:
+                self._save_published(job_dir, published)
+                logger.info(f"Refreshed {downloaded} state files of job {job_id} from {self.backend.name}")
+        return downloaded
+    
+    def _ensure_local_job(self, job_id: str) -> None:
+        """Fetch a job created on another node, or its state files changed by another node"""
+        if not self.is_remote:
+            return
+        if (self.jobs_dir / job_id / "job.json").exists():
+            self.refresh_job(job_id)
+        elif self.backend.exists(self.job_key(job_id, "job.json")):
+            self.hydrate_job(job_id)
+    
+    def sync_job_index(self) -> Dict[str, int]:
+        """
+        Reconcile the job index with the jobs directory.
+        
+        Indexes job directories the index does not know (jobs created before
+        the index existed) and drops rows whose directory is gone. Only the
+        directory listing is read for jobs that are already indexed.
+        
+        Returns:
+            dict with counts of added and removed rows
+        """
+        on_disk = {p.name for p in self.jobs_dir.iterdir() if (p / "job.json").exists()}
+        indexed = set(self.job_index.job_ids())
+        added = 0
+        for job_id in sorted(on_disk - indexed):
+            try:
+                self._reindex_job(job_id)
+                added += 1
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not index job {job_id}: {e}")
+        for job_id in indexed - on_disk:
+            self.job_index.delete(job_id)
+        if added or indexed - on_disk:
+            logger.info(f"Job index synced: {added} added, {len(indexed - on_disk)} removed")
+        return {"added": added, "removed": len(indexed - on_disk)}
+    
+    def _reindex_job(self, job_id: str) -> Dict[str, Any]:
+        """Parse job.json and write its row to the index"""
+        job_file = self.jobs_dir / job_id / "job.json"
+        with open(job_file, "r") as f:
+            job_dict = json.load(f)
+        self.job_index.upsert(job_id, job_dict, job_file.stat().st_mtime_ns)
+        return job_dict
+    
     def load_job(self, job_id: str) -> Dict[str, Any]:
-        """Load job data from job.json"""
+        """Load job data (from the job index; job.json only if the row is stale)"""
+        self._ensure_local_job(job_id)
         job_file = self.jobs_dir / job_id / "job.json"
-        if not job_file.exists():
+        try:
+            mtime_ns = job_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self.job_index.delete(job_id)
             raise FileNotFoundError(f"Job {job_id} not found")
         
-        with open(job_file, "r") as f:
-            return json.load(f)
+        indexed = self.job_index.get(job_id)
+        if indexed is not None and indexed[1] == mtime_ns:
+            return indexed[0]
+        return self._reindex_job(job_id)
     
     def save_job(self, job_id: str, job_dict: Dict[str, Any]) -> None:
-        """Save job data to job.json atomically"""
+        """Save job data to job.json atomically, write it through to the job index and publish it in the background"""
         job_dir = self.ensure_job_dir(job_id)
         job_file = job_dir / "job.json"
         temp_file = job_dir / "job.json.tmp"
@@ -98,6 +369,8 @@ class StorageManager:
         
         # Atomic rename
         temp_file.replace(job_file)
+        self.job_index.upsert(job_id, job_dict, job_file.stat().st_mtime_ns)
+        self.schedule_publish(job_id)
     
     def save_ocr_translations(self, job_id: str, translations: Dict[str, Any]) -> None:
         """Save OCR translations to ocr_translations.json"""
@@ -111,9 +384,11 @@ class StorageManager:
         
         # Atomic rename
         temp_file.replace(translations_file)
+        self.schedule_publish(job_id)
     
     def load_ocr_translations(self, job_id: str) -> Dict[str, Any]:
         """Load OCR translations from ocr_translations.json"""
+        self._ensure_local_job(job_id)
         translations_file = self.jobs_dir / job_id / "ocr_translations.json"
         if not translations_file.exists():
             return {}
@@ -123,6 +398,7 @@ class StorageManager:
     
     def job_exists(self, job_id: str) -> bool:
         """Check if job exists"""
+        self._ensure_local_job(job_id)
         job_file = self.jobs_dir / job_id / "job.json"
         return job_file.exists()
     
@@ -0,0 +1,252 @@
+"""Object storage backends for job files.
+
+A backend stores objects under '/'-separated keys ("jobs/<job_id>/<path>")
+and reads them back as a stream of chunks, so large PDFs and page images
+are never loaded whole. LocalBackend keeps objects as files under the
+storage directory (the historical layout). S3Backend keeps them in an
+S3-compatible bucket (AWS S3, MinIO, ...), which lets several API nodes
+serve the same jobs without a shared filesystem.
+"""
+
+import os
+import shutil
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+STORAGE_BACKENDS = ("local", "s3")
+
+
+@dataclass
+class ObjectInfo:
+    """Size, modification time (epoch seconds) and ETag (if the store has one) of a stored object."""
+    key: str
+    size: int
+    mtime: float
+    etag: Optional[str] = None
+
+    @property
+    def version(self) -> Any:
+        """Value that changes whenever the object is replaced."""
+        return self.etag or [self.size, self.mtime]
+
+
+class StorageBackend:
+    """Interface of an object store. Keys are relative, '/'-separated paths."""
+
+    name = "base"
+
+    def put_stream(self, key: str, stream: BinaryIO) -> None:
+        """Store the content of a binary file object under key (replacing any object)."""
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: Path) -> None:
+        """Store a local file under key."""
+        with open(path, "rb") as f:
+            self.put_stream(key, f)
+
+    def get_stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yield the content of an object in chunks.
+
+        Raises:
+            FileNotFoundError: If the object does not exist
+        """
+        raise NotImplementedError
+
+    def get_file(self, key: str, path: Path) -> None:
+        """Download an object to a local file (written atomically)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.download")
+        with open(tmp_path, "wb") as f:
+            for chunk in self.get_stream(key):
+                f.write(chunk)
+        tmp_path.replace(path)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Return object info, or None if the object does not exist."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        """Yield the objects whose key starts with prefix."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """Delete an object. Returns False if it did not exist."""
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    """Objects are files below a root directory."""
+
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        """Local path of a key (rejects keys escaping the root)."""
+        path = (self.root / key).resolve()
+        if path != self.root.resolve() and self.root.resolve() not in path.parents:
+            raise ValueError(f"Key outside storage root: {key}")
+        return path
+
+    def put_stream(self, key: str, stream: BinaryIO) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.upload")
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(stream, f, STREAM_CHUNK_SIZE)
+        tmp_path.replace(path)
+
+    def put_file(self, key: str, path: Path) -> None:
+        if Path(path).resolve() == self.path(key):
+            return  # Already in place
+        super().put_file(key, path)
+
+    def get_stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        # Open before the first next() so a missing file fails at the call site
+        f = open(self.path(key), "rb")
+
+        def chunks() -> Iterator[bytes]:
+            with f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    yield chunk
+        return chunks()
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            path = self.path(key)
+            st = path.stat()
+        except (OSError, ValueError):
+            return None
+        if not path.is_file():
+            return None
+        return ObjectInfo(key, st.st_size, st.st_mtime)
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        # Walk the deepest directory the prefix names, then filter by the rest
+        base = self.root / prefix.rsplit("/", 1)[0] if "/" in prefix else self.root
+        if not base.is_dir():
+            return
+        for path in sorted(base.rglob("*")):
+            if not path.is_file():
+                continue
+            key = path.relative_to(self.root).as_posix()
+            if key.startswith(prefix):
+                st = path.stat()
+                yield ObjectInfo(key, st.st_size, st.st_mtime)
+
+    def delete(self, key: str) -> bool:
+        try:
+            self.path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Whether a botocore ClientError means the object does not exist."""
+    code = str(getattr(error, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Backend(StorageBackend):
+    """Objects in an S3-compatible bucket, optionally below a key prefix."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", client: Any = None, endpoint_url: Optional[str] = None):
+        """
+        Args:
+            bucket: Bucket name
+            prefix: Prefix of every key in the bucket (e.g. "translator/")
+            client: boto3 S3 client (default: created from the environment)
+            endpoint_url: S3 API endpoint for MinIO and other S3-compatible stores
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=os.getenv("S3_REGION") or None)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_stream(self, key: str, stream: BinaryIO) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=stream)
+
+    def get_stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"Object not found: {key}")
+            raise
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                for chunk in iter(lambda: body.read(chunk_size), b""):
+                    yield chunk
+            finally:
+                body.close()
+        return chunks()
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return ObjectInfo(key, head["ContentLength"], head["LastModified"].timestamp(), head.get("ETag"))
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        kwargs = {"Bucket": self.bucket, "Prefix": self._key(prefix)}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents", []):
+                yield ObjectInfo(
+                    obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp(), obj.get("ETag")
+                )
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def delete(self, key: str) -> bool:
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+
+def backend_from_env(base_dir: Path) -> StorageBackend:
+    """
+    Backend selected by STORAGE_BACKEND ("local" by default, or "s3").
+
+    S3 settings: S3_BUCKET (required), S3_PREFIX, S3_ENDPOINT_URL (MinIO),
+    S3_REGION; credentials come from the usual AWS environment variables.
+
+    Raises:
+        ValueError: If the backend name is unknown or S3_BUCKET is missing
+    """
+    name = os.getenv("STORAGE_BACKEND", "local").lower()
+    if name == "local":
+        return LocalBackend(base_dir)
+    if name == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not bucket:
+            raise ValueError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Backend(bucket, os.getenv("S3_PREFIX", ""), endpoint_url=os.getenv("S3_ENDPOINT_URL") or None)
+    raise ValueError(f"Invalid STORAGE_BACKEND: {name}. Must be one of: {', '.join(STORAGE_BACKENDS)}")
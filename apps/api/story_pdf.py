@@ -0,0 +1,220 @@
+"""Chromium-free PDF rendering with PyMuPDF Story.
+
+Lays out the HTML/CSS subset our templates use (headings, paragraphs,
+lists, tables, images, page breaks) directly with fitz.Story, so simple
+documents do not need a browser. Differences from Chromium are bridged
+before layout: print media rules are applied, CSS pixels are converted to
+points and the @page margin is honoured. Absolutely positioned OCR
+overlays (.ov inside .img-wrap) are not supported by Story; they are
+removed from the HTML and drawn onto the placed image afterwards.
+"""
+
+import io
+import os
+import re
+import html as html_lib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from text_fit import TextFitter
+
+logger = logging.getLogger(__name__)
+
+PAGE_RECT = fitz.paper_rect("a4")
+PX_TO_PT = 0.75          # CSS pixel is 1/96 in, MuPDF treats px as points
+MM_TO_PT = 72 / 25.4
+OVERLAY_BORDER_WIDTH = 0.75
+
+STYLE_BLOCK_RE = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+STYLE_ATTR_RE = re.compile(r'(style=")([^"]*)(")', re.I)
+PX_RE = re.compile(r"(-?\d+(?:\.\d+)?)px")
+MEDIA_RE = re.compile(r"@media\s+([a-z]+)\s*\{((?:[^{}]*\{[^{}]*\})*)\s*\}", re.S | re.I)
+PAGE_MARGIN_RE = re.compile(r"@page\s*\{[^}]*?margin:\s*(\d+(?:\.\d+)?)(mm|pt|px)", re.I)
+OVERLAY_RE = re.compile(
+    r'<img\b[^>]*>|<div class="ov" style="left:(-?[\d.]+)px;top:(-?[\d.]+)px;'
+    r'width:([\d.]+)px;height:([\d.]+)px[^"]*">\s*(.*?)\s*</div>',
+    re.S
+)
+IMG_WIDTH_RE = re.compile(r'style="[^"]*\bwidth:\s*([\d.]+)px', re.I)
+
+
+def _apply_media(html: str, media: str) -> str:
+    """Unwrap @media blocks for the emulated media type and drop the others."""
+    def replace(match):
+        return match.group(2) if match.group(1).lower() in (media, "all") else ""
+    return STYLE_BLOCK_RE.sub(lambda m: m.group(1) + MEDIA_RE.sub(replace, m.group(2)) + m.group(3), html)
+
+
+def _px_to_pt(html: str) -> str:
+    """Convert CSS px to pt in style blocks and style attributes."""
+    def convert(match):
+        return f"{float(match.group(1)) * PX_TO_PT:g}pt"
+
+    html = STYLE_BLOCK_RE.sub(lambda m: m.group(1) + PX_RE.sub(convert, m.group(2)) + m.group(3), html)
+    return STYLE_ATTR_RE.sub(lambda m: m.group(1) + PX_RE.sub(convert, m.group(2)) + m.group(3), html)
+
+
+def _page_margin(html: str) -> float:
+    """Page margin in points from the first @page rule (Chromium uses 0 without one)."""
+    match = PAGE_MARGIN_RE.search(html)
+    if not match:
+        return 0.0
+    value, unit = float(match.group(1)), match.group(2).lower()
+    return value * {"mm": MM_TO_PT, "pt": 1.0, "px": PX_TO_PT}[unit]
+
+
+def _mark_image(tag: str, img_id: str) -> str:
+    """Give an img tag an id and display:block (Story reports inline image positions wrongly)."""
+    tag = tag.replace("<img", f'<img id="{img_id}"', 1)
+    if 'style="' in tag:
+        return tag.replace('style="', 'style="display:block;', 1)
+    return tag.replace("<img", '<img style="display:block"', 1)
+
+
+def _extract_overlays(html: str) -> Tuple[str, Dict[str, Tuple[Optional[float], List[Tuple[float, float, float, float, str]]]]]:
+    """
+    Remove .ov overlay divs and remember them per preceding image.
+
+    Returns:
+        Tuple of (HTML without overlays, {image id: (declared width px, [(x, y, w, h, text)])})
+    """
+    overlays = {}
+    current = None
+    image_count = 0
+    for match in OVERLAY_RE.finditer(html):
+        if match.group(0).startswith("<img"):
+            image_count += 1
+            width = IMG_WIDTH_RE.search(match.group(0))
+            current = (f"story-img-{image_count}", float(width.group(1)) if width else None)
+        elif current is not None:
+            box = tuple(float(match.group(i)) for i in range(1, 5)) + (html_lib.unescape(match.group(5)),)
+            overlays.setdefault(current[0], (current[1], []))[1].append(box)
+
+    image_count = 0
+
+    def rewrite(match):
+        nonlocal image_count
+        if not match.group(0).startswith("<img"):
+            return ""
+        image_count += 1
+        img_id = f"story-img-{image_count}"
+        return _mark_image(match.group(0), img_id) if img_id in overlays else match.group(0)
+
+    return OVERLAY_RE.sub(rewrite, html), overlays
+
+
+def _link_positions(positions: List) -> List:
+    """Drop links to missing anchors, which Story.add_pdf_links rejects."""
+    ids = {p.id for p in positions if p.id and p.open_close & 1}
+    return [
+        p for p in positions
+        if not (p.href and p.href.startswith("#") and p.href[1:] not in ids)
+    ]
+
+
+def _draw_overlays(doc: fitz.Document, placed: Dict[str, Tuple[int, fitz.Rect]], overlays: Dict) -> int:
+    """Draw white boxes with fitted text over placed images. Returns the number of boxes drawn."""
+    fitter = TextFitter()
+    by_page: Dict[int, List[Tuple[fitz.Rect, str]]] = {}
+    for img_id, (declared_width, boxes) in overlays.items():
+        if img_id not in placed:
+            continue
+        page_num, rect = placed[img_id]
+        # Overlay coordinates are in the image's CSS pixel space
+        scale = rect.width / declared_width if declared_width else PX_TO_PT
+        for x, y, w, h, text in boxes:
+            box = fitz.Rect(rect.x0 + x * scale, rect.y0 + y * scale, rect.x0 + (x + w) * scale, rect.y0 + (y + h) * scale)
+            by_page.setdefault(page_num, []).append((box, text))
+
+    drawn = 0
+    for page_num, placements in by_page.items():
+        page = doc[page_num]
+        for box, _ in placements:
+            page.draw_rect(box, color=(0, 0, 0), fill=(1, 1, 1), width=OVERLAY_BORDER_WIDTH)
+        fitter.write(page, placements)
+        drawn += len(placements)
+    if drawn:
+        doc.subset_fonts()
+    return drawn
+
+
+def html_to_pdf_bytes_story(html: str, base_dir: Optional[Path] = None, media: str = "print") -> bytes:
+    """
+    Lay out HTML with PyMuPDF Story and return PDF bytes.
+
+    Args:
+        html: HTML document
+        base_dir: Directory relative image paths are resolved against
+        media: CSS media type to emulate ("print" or "screen")
+
+    Returns:
+        PDF content as bytes
+    """
+    margin = _page_margin(html)
+    # Overlays are matched in CSS pixels, so extract them before converting units
+    html, overlays = _extract_overlays(_apply_media(html, media))
+    html = _px_to_pt(html)
+
+    archive = fitz.Archive(str(base_dir)) if base_dir is not None else None
+    story = fitz.Story(html=html, archive=archive)
+    content_rect = PAGE_RECT + (margin, margin, -margin, -margin)
+    positions = []
+
+    stream = io.BytesIO()
+    writer = fitz.DocumentWriter(stream)
+    story.write(writer, lambda rect_num, filled: (PAGE_RECT, content_rect, None), positionfn=positions.append)
+    writer.close()
+    stream.seek(0)
+
+    doc = fitz.Story.add_pdf_links(stream, _link_positions(positions))
+    try:
+        placed = {
+            p.id: (p.page_num - 1, fitz.Rect(p.rect))
+            for p in positions
+            if p.id in overlays and p.open_close & 1
+        }
+        drawn = _draw_overlays(doc, placed, overlays)
+        logger.info(f"Story layout: {doc.page_count} pages, {drawn} overlay boxes")
+        return doc.tobytes(garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+
+def html_file_to_pdf_bytes_story(
+    html_path: Path,
+    media: str = "print",
+    job_id: Optional[str] = None,
+    assets_dir: Optional[Path] = None
+) -> bytes:
+    """
+    Lay out an HTML file with PyMuPDF Story.
+
+    Args:
+        html_path: HTML file; relative images resolve against its directory
+        media: CSS media type to emulate
+        job_id: Job whose md-asset API URLs are mapped back to files in assets_dir
+        assets_dir: Directory with the job's assets (must be inside html_path's directory)
+
+    Returns:
+        PDF content as bytes
+    """
+    from pdf_generate import MD_ASSET_PATH, resolve_asset_path
+
+    base_dir = html_path.resolve().parent
+    html = html_path.read_text(encoding="utf-8")
+
+    if job_id and assets_dir is not None:
+        marker = re.escape(MD_ASSET_PATH.format(job_id=job_id))
+
+        def to_file(match):
+            asset_path = resolve_asset_path(match.group(3), job_id, assets_dir)
+            if asset_path is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}{os.path.relpath(asset_path, base_dir)}{match.group(2)}"
+
+        html = re.sub(rf"""(src=|href=)(["'])([^"']*{marker}[^"']*)\2""", to_file, html)
+
+    return html_to_pdf_bytes_story(html, base_dir=base_dir, media=media)
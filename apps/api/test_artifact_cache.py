@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Test memoized artifact generation and request coalescing."""
+
+import asyncio
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from artifact_cache import ArtifactManifest, artifact_key, memoized
+
+
+def _producer(job_dir: Path, name: str, calls: list, delay: float = 0.0, fail: bool = False):
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("render failed")
+        (job_dir / name).write_bytes(b"%PDF-" + str(len(calls)).encode())
+        return {"engine": "story", "render": len(calls)}
+    return produce
+
+
+def test_hit_after_first_render():
+    """Same key returns the recorded artifact; changed inputs or a deleted file re-render."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        calls = []
+        key = artifact_key("test", markdown="abc", engine="story")
+        assert key == artifact_key("test", engine="story", markdown="abc")
+
+        meta, status = asyncio.run(memoized(tmp, "result.pdf", key, _producer(tmp, "result.pdf", calls)))
+        assert status == "miss" and meta["render"] == 1
+        meta, status = asyncio.run(memoized(tmp, "result.pdf", key, _producer(tmp, "result.pdf", calls)))
+        assert status == "hit" and meta["render"] == 1 and len(calls) == 1
+
+        other = artifact_key("test", markdown="abd", engine="story")
+        _, status = asyncio.run(memoized(tmp, "result.pdf", other, _producer(tmp, "result.pdf", calls)))
+        assert status == "miss" and len(calls) == 2
+
+        (tmp / "result.pdf").unlink()
+        _, status = asyncio.run(memoized(tmp, "result.pdf", other, _producer(tmp, "result.pdf", calls)))
+        assert status == "miss" and len(calls) == 3
+        print("✓ Hit on unchanged inputs, re-render on new inputs or missing file")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_concurrent_requests_are_coalesced():
+    """Identical concurrent requests share one render; failures reach every waiter."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        async def burst(fail=False):
+            calls = []
+            key = artifact_key("test", fail=fail)
+            results = await asyncio.gather(*[
+                memoized(tmp, "output.pdf", key, _producer(tmp, "output.pdf", calls, delay=0.05, fail=fail))
+                for _ in range(5)
+            ], return_exceptions=True)
+            return calls, results
+
+        calls, results = asyncio.run(burst())
+        assert len(calls) == 1
+        assert sorted(status for _, status in results) == ["coalesced"] * 4 + ["miss"]
+        assert all(meta["render"] == 1 for meta, _ in results)
+
+        calls, results = asyncio.run(burst(fail=True))
+        assert len(calls) == 1 and all(isinstance(r, RuntimeError) for r in results)
+        # A failed render is not recorded
+        calls_after = []
+        _, status = asyncio.run(memoized(tmp, "output.pdf", artifact_key("test", fail=True), _producer(tmp, "output.pdf", calls_after)))
+        assert status == "miss"
+        print("✓ 5 concurrent requests → 1 render; errors propagate to all")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_different_keys_for_one_file_take_turns():
+    """Concurrent renders of one file with different keys never mix up file and key."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        def producer(label: bytes, delay: float):
+            async def produce():
+                (tmp / "output.pdf").write_bytes(b"%PDF-" + label)
+                await asyncio.sleep(delay)
+                assert (tmp / "output.pdf").read_bytes() == b"%PDF-" + label
+                return {"label": label.decode()}
+            return produce
+
+        key_a, key_b = artifact_key("test", scope="headings"), artifact_key("test", scope="all")
+
+        async def both():
+            return await asyncio.gather(
+                memoized(tmp, "output.pdf", key_a, producer(b"A", 0.05)),
+                memoized(tmp, "output.pdf", key_b, producer(b"B", 0.0))
+            )
+
+        (meta_a, _), (meta_b, _) = asyncio.run(both())
+        assert (meta_a["label"], meta_b["label"]) == ("A", "B")
+        manifest = ArtifactManifest(tmp)
+        assert manifest.lookup("output.pdf", key_b) is not None and manifest.lookup("output.pdf", key_a) is None
+
+        # Same size, different content: the recorded hash no longer matches
+        (tmp / "output.pdf").write_bytes(b"%PDF-C")
+        assert manifest.lookup("output.pdf", key_b) is None
+        print("✓ Different keys for one file serialized; content hash checked on lookup")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_markdown_endpoint_memoized():
+    """/api/pdf-from-markdown serves a repeat request from cache until OCR data changes."""
+    from main import pdf_from_markdown, storage_manager
+
+    job_id = f"test-artifacts-{uuid.uuid4().hex[:8]}"
+    storage_manager.save_job(job_id, {"job_id": job_id, "status": "done"})
+    job_dir = storage_manager.jobs_dir / job_id
+    try:
+        def request():
+            return asyncio.run(pdf_from_markdown(
+                job_id, {"markdown": "# Title\n\nHello"},
+                optimize=False, optimize_dpi=None, linearize=False, engine="story", chunks=None
+            ))
+
+        first = request()
+        second = request()
+        assert first["cache"] == "miss" and second["cache"] == "hit"
+        assert second["engine"] == "story"
+
+        (job_dir / "ocr_translations.json").write_text("{}")
+        assert request()["cache"] == "miss"
+        print("✓ Endpoint: miss → hit → miss after OCR translations changed")
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def main():
+    """Run all artifact cache tests."""
+    print("Artifact Cache Tests")
+    print("=" * 50)
+
+    test_hit_after_first_render()
+    test_concurrent_requests_are_coalesced()
+    test_different_keys_for_one_file_take_turns()
+    test_markdown_endpoint_memoized()
+
+    print("\n🎉 All artifact cache tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Test that md-asset requests are answered from the job directory."""
+
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+
+import pdf_generate
+from pdf_generate import generate_pdf_from_html_file, resolve_asset_path
+
+JOB_ID = "job123"
+
+
+class FakeRequest:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakeRoute:
+    def __init__(self, url):
+        self.request = FakeRequest(url)
+        self.fulfilled = None
+
+    async def fulfill(self, **kwargs):
+        self.fulfilled = kwargs
+
+
+class FakePage:
+    """Records routes and 'loads' the given asset URLs through them on goto."""
+
+    def __init__(self, urls):
+        self.urls = urls
+        self.routes = []
+        self.requests = []
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    async def unroute(self, pattern, handler):
+        self.routes.remove((pattern, handler))
+
+    async def goto(self, url, wait_until=None):
+        self.wait_until = wait_until
+        for asset_url in self.urls:
+            route = FakeRoute(asset_url)
+            for _, handler in self.routes:
+                await handler(route)
+            self.requests.append(route)
+
+    async def emulate_media(self, media):
+        pass
+
+    async def pdf(self, **kwargs):
+        return b"%PDF-fake"
+
+
+def _job_dir() -> Path:
+    tmp = Path(tempfile.mkdtemp())
+    assets = tmp / JOB_ID / "md_assets"
+    (assets / "sub").mkdir(parents=True)
+    (assets / "page1_img1.png").write_bytes(b"png")
+    (assets / "sub" / "a b.jpg").write_bytes(b"jpg")
+    (tmp / JOB_ID / "secret.txt").write_text("no")
+    return tmp
+
+
+def test_resolve_asset_path():
+    """Only existing files inside md_assets of the same job resolve."""
+    tmp = _job_dir()
+    try:
+        assets = tmp / JOB_ID / "md_assets"
+        base = f"http://localhost:8000/api/md-asset/{JOB_ID}/"
+        assert resolve_asset_path(base + "page1_img1.png", JOB_ID, assets).name == "page1_img1.png"
+        assert resolve_asset_path(base + "sub/a%20b.jpg", JOB_ID, assets).name == "a b.jpg"
+        assert resolve_asset_path(base + "..%2Fsecret.txt", JOB_ID, assets) is None
+        assert resolve_asset_path(base + "missing.png", JOB_ID, assets) is None
+        assert resolve_asset_path(base + "sub", JOB_ID, assets) is None
+        assert resolve_asset_path("http://x/api/md-asset/other/page1_img1.png", JOB_ID, assets) is None
+        print("✓ Asset URLs resolve inside md_assets only")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_render_serves_assets_from_disk():
+    """Asset requests are fulfilled from files and the route is removed afterwards."""
+    tmp = _job_dir()
+    base = f"http://api.internal:9000/api/md-asset/{JOB_ID}/"
+    page = FakePage([base + "page1_img1.png", base + "nope.png"])
+
+    class FakeRenderPage:
+        async def __aenter__(self):
+            return page
+
+        async def __aexit__(self, *exc):
+            return False
+
+    original = pdf_generate._render_page
+    pdf_generate._render_page = FakeRenderPage
+    try:
+        html_path = tmp / JOB_ID / "markdown.html"
+        html_path.write_text("<html></html>")
+        output = tmp / JOB_ID / "out.pdf"
+        engine = asyncio.run(generate_pdf_from_html_file(
+            html_path, output, job_id=JOB_ID, assets_dir=tmp / JOB_ID / "md_assets", engine="chromium"
+        ))
+
+        hit, miss = page.requests
+        assert hit.fulfilled == {"path": str((tmp / JOB_ID / "md_assets" / "page1_img1.png").resolve())}
+        assert miss.fulfilled["status"] == 404
+        assert page.routes == []
+        assert page.wait_until == "load"
+        assert output.read_bytes() == b"%PDF-fake"
+        assert engine == "chromium"
+        print("✓ Render answered asset requests from disk without HTTP")
+    finally:
+        pdf_generate._render_page = original
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all asset routing tests."""
+    print("Asset Routing Tests")
+    print("=" * 50)
+
+    test_resolve_asset_path()
+    test_render_serves_assets_from_disk()
+
+    print("\n🎉 All asset routing tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test the vectorized block policy against the per-block reference."""
+
+import random
+import time
+
+from pdf_overlay_generate import evaluate_blocks, should_replace_block
+
+IMG_W, IMG_H = 1190, 1684
+TYPES = ["heading", "title", "paragraph", "caption", "label", "figure_caption", "list", "table", "Heading"]
+
+
+def _reference(block, scope):
+    """Per-block decision exactly as generate_overlay_pdf made it before vectorization."""
+    bbox = block.get("bbox", [])
+    if not bbox or len(bbox) != 4 or not block.get("text", "").strip():
+        return False, "invalid_block_data", None
+    ok, reason = should_replace_block(block, IMG_W, IMG_H, scope)
+    if not ok:
+        return False, reason, None
+    x1, y1, x2, y2 = (int(float(v)) for v in bbox)
+    x1, x2 = (max(0, min(v, IMG_W)) for v in (x1, x2))
+    y1, y2 = (max(0, min(v, IMG_H)) for v in (y1, y2))
+    if (x2 - x1) / IMG_W > 0.95 or (y2 - y1) / IMG_H > 0.95:
+        return False, "exceeds_safety_limits", None
+    return True, reason, [x1, y1, x2, y2]
+
+
+def _random_blocks(rng, count):
+    def value():
+        r = rng.random()
+        if r < 0.02:
+            return float("nan")
+        if r < 0.03:
+            return None
+        if r < 0.04:
+            return str(rng.randint(0, 1200))
+        return rng.uniform(-50, 1300)
+
+    blocks = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.02:
+            bbox = [1, 2, 3]
+        elif kind < 0.6:
+            x, y = rng.uniform(-20, 1100), rng.uniform(-20, 1600)
+            bbox = [x, y, x + rng.uniform(0, 1300), y + rng.choice([rng.uniform(0, 100), rng.uniform(0, 1700)])]
+        else:
+            bbox = [value() for _ in range(4)]
+        blocks.append({"bbox": bbox, "type": rng.choice(TYPES), "text": rng.choice(["text", " ", "Заголовок"])})
+    return blocks
+
+
+def test_matches_reference_for_all_scopes():
+    """Same replace flag, reason and clamped bbox for every block and scope."""
+    rng = random.Random(7)
+    blocks = _random_blocks(rng, 3000)
+    for scope in ("headings", "safe", "all", "unknown"):
+        decisions = evaluate_blocks(blocks, IMG_W, IMG_H, scope)
+        for i, block in enumerate(blocks):
+            ok, reason, bbox = _reference(block, scope)
+            assert bool(decisions["replace"][i]) == ok, (scope, block)
+            assert decisions["reasons"][i] == reason, (scope, block, reason, decisions["reasons"][i])
+            if ok:
+                assert [int(v) for v in decisions["bbox_px"][i]] == bbox
+        replaced = int(decisions["replace"].sum())
+        print(f"✓ {scope}: {len(blocks)} blocks match reference ({replaced} replaced)")
+
+
+def test_bbox_is_clamped_to_image():
+    """Approved boxes that overhang the image edge are clamped, dimensions follow."""
+    blocks = [{"type": "title", "text": "x", "bbox": [-20.7, 10, 500, 60]}]
+    decisions = evaluate_blocks(blocks, 1200, 1600, "headings")
+    assert decisions["reasons"] == ["allowed_in_headings_scope"]
+    assert decisions["bbox_px"][0].tolist() == [0, 10, 500, 60]
+    assert int(decisions["width_px"][0]) == 500
+    assert evaluate_blocks([], 1200, 1600, "all")["reasons"] == []
+    print("✓ Approved bbox clamped to image")
+
+
+def test_policy_timing():
+    """Report vectorized vs per-block evaluation time for a large document."""
+    blocks = _random_blocks(random.Random(1), 20000)
+    start = time.perf_counter()
+    evaluate_blocks(blocks, IMG_W, IMG_H, "safe")
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for block in blocks:
+        _reference(block, "safe")
+    per_block = time.perf_counter() - start
+    print(f"✓ 20000 blocks: vectorized {vectorized * 1000:.1f} ms, per-block {per_block * 1000:.1f} ms")
+
+
+def main():
+    """Run all block geometry tests."""
+    print("Block Geometry Tests")
+    print("=" * 50)
+
+    test_matches_reference_for_all_scopes()
+    test_bbox_is_clamped_to_image()
+    test_policy_timing()
+
+    print("\n🎉 All block geometry tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
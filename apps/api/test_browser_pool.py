@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Test the Chromium browser pool with an in-process fake browser."""
+
+import asyncio
+
+from browser_pool import BrowserPool, BrowserPoolBusy
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_closed(self):
+        return self.closed
+
+    def crash(self):
+        self.handlers["crash"](self)
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage()
+        self.browser.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+        self.pages = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+def make_pool(**kwargs):
+    launched = []
+
+    async def launcher():
+        browser = FakeBrowser()
+        launched.append(browser)
+        return browser
+
+    return BrowserPool(launcher=launcher, **kwargs), launched
+
+
+async def _render(pool, hold=0.0):
+    async with pool.page() as page:
+        await asyncio.sleep(hold)
+        return page
+
+
+def test_pages_are_reused_and_recycled():
+    """One browser serves all renders; contexts are replaced after max_renders."""
+    async def run():
+        pool, launched = make_pool(size=2, max_renders=3)
+        await pool.start()
+        for _ in range(6):
+            await _render(pool)
+        await pool.stop()
+        return pool, launched
+
+    pool, launched = asyncio.run(run())
+    assert len(launched) == 1
+    assert pool.stats["renders"] == 6
+    assert pool.stats["recycled"] == 2
+    assert len(launched[0].contexts) == 2 + 2
+    print(f"✓ 6 renders on 1 browser, stats={pool.stats}")
+
+
+def test_browser_crash_triggers_restart():
+    """A disconnected browser is relaunched and crashed pages are replaced."""
+    async def run():
+        pool, launched = make_pool(size=1, max_renders=100)
+        await pool.start()
+        first = await _render(pool)
+
+        first.crash()
+        second = await _render(pool)
+        assert second is not first
+
+        launched[0].connected = False
+        third = await _render(pool)
+        await pool.stop()
+        return pool, launched, third
+
+    pool, launched, third = asyncio.run(run())
+    assert len(launched) == 2
+    assert third in launched[1].pages
+    assert pool.stats["restarts"] == 1
+    print(f"✓ Crash recovery OK, stats={pool.stats}")
+
+
+def test_wait_queue_is_bounded():
+    """Requests beyond the queue limit are rejected instead of piling up."""
+    async def run():
+        pool, _ = make_pool(size=1, max_queue=2, acquire_timeout=5)
+        await pool.start()
+        tasks = [asyncio.create_task(_render(pool, hold=0.05)) for _ in range(5)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await pool.stop()
+        return pool, results
+
+    pool, results = asyncio.run(run())
+    rejected = [r for r in results if isinstance(r, BrowserPoolBusy)]
+    # One render holds the page, two wait, the rest are turned away
+    assert len(rejected) == 2, results
+    assert pool.stats["renders"] == 3
+    print(f"✓ Queue bounded: {len(rejected)} of {len(results)} rejected")
+
+
+def main():
+    """Run all browser pool tests."""
+    print("Browser Pool Tests")
+    print("=" * 50)
+
+    test_pages_are_reused_and_recycled()
+    test_browser_crash_triggers_restart()
+    test_wait_queue_is_bounded()
+
+    print("\n🎉 All browser pool tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
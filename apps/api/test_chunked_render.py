@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Test chunked rendering: splitting, concurrent chunk renders and merging."""
+
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import pdf_generate
+from pdf_chunks import ANCHOR_PREFIX, CHUNK_LINK_BASE, TARGET_PREFIX, split_html
+from pdf_generate import render_html_file
+from story_pdf import html_file_to_pdf_bytes_story
+
+
+def _document(chapters: int = 6) -> str:
+    body = ['<p>Contents: <a href="#ch5">jump to chapter 5</a> <a href="#top">top</a></p><p id="top">Intro</p>']
+    for i in range(1, chapters + 1):
+        body.append(f'<h1 id="ch{i}">Chapter {i}</h1>' + "".join(f"<p>Chapter {i} paragraph {j}. " + "Text " * 60 + "</p>" for j in range(12)))
+    body.append('<!-- pagebreak --><p>Appendix <a href="#ch2">see chapter 2</a></p>')
+    return "<html><head><style>body { margin: 40px; }</style></head><body>" + "".join(body) + "</body></html>"
+
+
+def test_split_html():
+    """Chunks split at h1/page breaks, balanced, with cross-chunk links rewritten."""
+    html = _document()
+    parts = split_html(html, 3)
+    assert len(parts) == 3
+    assert all(p.startswith("<html><head>") and p.endswith("</body></html>") for p in parts)
+    # Every chapter appears exactly once, in order
+    joined = "".join(parts)
+    assert [joined.index(f"Chapter {i}</h1>") for i in range(1, 7)] == sorted(joined.index(f"Chapter {i}</h1>") for i in range(1, 7))
+    assert all(joined.count(f'id="ch{i}"') == 1 for i in range(1, 7))
+    # Link within the first chunk stays internal; the others point across chunks
+    assert 'href="#top"' in parts[0]
+    assert f'href="{ANCHOR_PREFIX}ch5"' in parts[0] and f'href="{TARGET_PREFIX}ch5"' in parts[2]
+    assert f'href="{ANCHOR_PREFIX}ch2"' in parts[2] and f'href="{TARGET_PREFIX}ch2"' in parts[0]
+    assert "margin-top: 0" not in parts[0] and "margin-top: 0" in parts[1]
+    assert split_html("<html><body><p>one section</p></body></html>", 4) is None
+    assert split_html(html, 1) is None
+    print(f"✓ Split into {len(parts)} chunks of {[len(p) for p in parts]} chars")
+
+
+def test_chunks_render_concurrently_and_merge():
+    """Chunks render in parallel; merged PDF keeps order and resolves cross-chunk links."""
+    tmp = Path(tempfile.mkdtemp())
+    original = pdf_generate.html_file_to_pdf_bytes_async
+    active, peak = 0, 0
+
+    async def fake_chromium(path, media="print", job_id=None, assets_dir=None):
+        # Story stands in for Chromium: both emit URI links for the placeholders
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return html_file_to_pdf_bytes_story(path, media=media)
+
+    try:
+        html_path = tmp / "markdown.html"
+        html_path.write_text(_document(), encoding="utf-8")
+        single = fitz.open(stream=html_file_to_pdf_bytes_story(html_path), filetype="pdf")
+
+        pdf_generate.html_file_to_pdf_bytes_async = fake_chromium
+        pdf_bytes, engine = asyncio.run(render_html_file(html_path, engine="chromium", chunks=3))
+        assert engine == "chromium" and peak == 3
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        assert doc.page_count >= single.page_count
+        pages_with = {i: next(p.number for p in doc if f"Chapter {i}\n" in p.get_text()) for i in range(1, 7)}
+        assert list(pages_with.values()) == sorted(pages_with.values())
+
+        links = [(page.number, link) for page in doc for link in page.get_links()]
+        assert not [l for _, l in links if l.get("uri", "").startswith(CHUNK_LINK_BASE)]
+        to_ch5 = [l for n, l in links if n == 0 and l["kind"] == fitz.LINK_GOTO and l["page"] == pages_with[5]]
+        to_ch2 = [l for n, l in links if n == doc.page_count - 1 and l["kind"] == fitz.LINK_GOTO and l["page"] == pages_with[2]]
+        assert to_ch5 and to_ch2, links
+        assert not list(tmp.glob("*.chunk*"))
+        print(f"✓ 3 chunks rendered concurrently → {doc.page_count} pages, cross-chunk links resolved")
+    finally:
+        pdf_generate.html_file_to_pdf_bytes_async = original
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all chunked render tests."""
+    print("Chunked Render Tests")
+    print("=" * 50)
+
+    test_split_html()
+    test_chunks_render_concurrently_and_merge()
+
+    print("\n🎉 All chunked render tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
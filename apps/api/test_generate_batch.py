@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Test batch generation of several output variants from one load of job data."""
+
+import asyncio
+import json
+import shutil
+import uuid
+
+import fitz  # PyMuPDF
+from fastapi import HTTPException
+
+from pdf_render import render_pdf_to_pngs
+from raster_cache import raster_cache
+
+PAGES = 3
+
+
+def _make_job():
+    from main import storage_manager
+
+    job_id = f"test-batch-{uuid.uuid4().hex[:8]}"
+    job_dir = storage_manager.jobs_dir / job_id
+    job_dir.mkdir(parents=True)
+
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page(width=400, height=300)
+        page.insert_text((40, 60), f"Title {i + 1}", fontsize=20)
+        page.insert_text((40, 120), "Body text that stays", fontsize=11)
+    doc.save(str(job_dir / "input.pdf"))
+    doc.close()
+    render_pdf_to_pngs(job_dir / "input.pdf", job_dir / "pages", max_pages=PAGES, dpi=144)
+
+    vision = {"pages": [
+        {"page": i + 1, "blocks": [
+            {"type": "heading", "text": f"Heading {i + 1}", "bbox": [70, 80, 400, 130]},
+            {"type": "paragraph", "text": "Translated body", "bbox": [70, 200, 500, 250]}
+        ]}
+        for i in range(PAGES)
+    ]}
+    (job_dir / "vision.json").write_text(json.dumps(vision), encoding="utf-8")
+    storage_manager.save_job(job_id, {
+        "job_id": job_id,
+        "status": "done",
+        "filename": "batch.pdf",
+        "input_path": str(job_dir / "input.pdf"),
+        "dpi": 144
+    })
+    return job_id, job_dir
+
+
+VARIANTS = [
+    {"mode": "html", "engine": "story"},
+    {"mode": "overlay", "overlay_scope": "headings"},
+    {"mode": "overlay", "overlay_scope": "safe"},
+    {"mode": "overlay", "overlay_scope": "all"},
+    {"mode": "debug"},
+]
+
+
+def test_batch_builds_all_variants_once():
+    """Five variants in one call: page PNGs decoded once, outputs distinct, repeat is cached."""
+    from main import generate_pdf_batch, BatchGeneratePayload, storage_manager
+
+    job_id, job_dir = _make_job()
+    try:
+        # Start cold so the batch has to decode the pages itself
+        raster_cache.clear()
+        decodes = raster_cache.stats["decodes"]
+
+        result = asyncio.run(generate_pdf_batch(job_id, BatchGeneratePayload(variants=VARIANTS)))
+        assert result["status"] == "done", result
+        assert result["pages_preloaded"] == PAGES
+        assert raster_cache.stats["decodes"] - decodes == PAGES
+
+        entries = result["variants"]
+        assert [e["mode"] for e in entries] == ["html", "overlay", "overlay", "overlay", "debug"]
+        outputs = [e["output"] for e in entries[:4]]
+        assert len(set(outputs)) == 4
+        for output in outputs:
+            with fitz.open(job_dir / output) as doc:
+                assert doc.page_count >= PAGES
+        assert entries[0]["engine"] == "story"
+        assert entries[4]["debug_pages"] == PAGES
+        assert len(list((job_dir / "pages").glob("debug_page_*.png"))) == PAGES
+        # Concurrent overlay variants write their own reports
+        assert len(list(job_dir.glob("report_overlay_*.json"))) == 3
+
+        job = storage_manager.load_job(job_id)
+        assert set(job["outputs"]) == set(outputs)
+        assert job["output_path"].endswith("output.pdf")
+
+        again = asyncio.run(generate_pdf_batch(job_id, BatchGeneratePayload(variants=VARIANTS[:4])))
+        assert [e["cache"] for e in again["variants"]] == ["hit"] * 4
+        print(f"✓ {len(entries)} variants, {PAGES} page decodes, repeat served from cache")
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def test_preload_stays_within_raster_cache():
+    """Preloading stops at the cache budget instead of evicting the first pages."""
+    from generate_variants import preload_page_rasters
+
+    job_id, job_dir = _make_job()
+    budget = raster_cache.max_memory_bytes
+    try:
+        first = job_dir / "pages" / "page_1.png"
+        raster_cache.clear()
+        page_bytes = raster_cache.load(first).nbytes + len(first.read_bytes())
+        raster_cache.clear()
+
+        raster_cache.max_memory_bytes = int(page_bytes * 2.5)
+        assert preload_page_rasters(job_dir) == 2
+        assert raster_cache.get(first) is not None
+
+        raster_cache.max_memory_bytes = budget
+        assert preload_page_rasters(job_dir) == PAGES
+        print("✓ Preload capped at the raster cache budget, first page kept")
+    finally:
+        raster_cache.max_memory_bytes = budget
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def test_batch_rejects_invalid_variants():
+    """Unknown modes and variants writing the same file are rejected up front."""
+    from main import generate_pdf_batch, BatchGeneratePayload
+
+    job_id, job_dir = _make_job()
+    try:
+        for variants in ([{"mode": "poster"}], [{"mode": "overlay", "overlay_scope": "most"}],
+                         [{"mode": "html", "engine": "story"}, {"mode": "html", "engine": "chromium"}], [],
+                         [{"mode": "html", "optimize": True, "optimize_dpi": 0}], [{"mode": "html", "linearize": True}]):
+            try:
+                asyncio.run(generate_pdf_batch(job_id, BatchGeneratePayload(variants=variants)))
+                assert False, f"Expected 400 for {variants}"
+            except HTTPException as e:
+                assert e.status_code == 400, e.detail
+        print("✓ Invalid and conflicting variants rejected with 400")
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def main():
+    """Run all batch generation tests."""
+    print("Batch Generation Tests")
+    print("=" * 50)
+
+    test_batch_builds_all_variants_once()
+    test_preload_stays_within_raster_cache()
+    test_batch_rejects_invalid_variants()
+
+    print("\n🎉 All batch generation tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
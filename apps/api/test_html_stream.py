@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Test streamed render.html with linked page images."""
+
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from html_render import vision_to_html, write_vision_html, iter_self_contained_html
+
+VISION = {"pages": [
+    {"page": i, "blocks": [
+        {"type": "heading", "text": f"Глава {i}"},
+        {"type": "list", "text": "one\ntwo"},
+        {"type": "paragraph", "text": "a < b & c"}
+    ]}
+    for i in (1, 2, 3)
+]}
+
+
+def _job_dir(pages: int = 3) -> Path:
+    tmp = Path(tempfile.mkdtemp())
+    (tmp / "pages").mkdir()
+    for i in range(1, pages + 1):
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 60, 80), 0)
+        pix.set_rect(pix.irect, (40 * i, 80, 120))
+        pix.save(str(tmp / "pages" / f"page_{i}.png"))
+    return tmp
+
+
+def test_render_html_links_page_images():
+    """render.html references PNGs on disk instead of embedding them."""
+    tmp = _job_dir(pages=2)
+    try:
+        html_path = tmp / "render.html"
+        linked = write_vision_html(html_path, VISION, "Doc", tmp)
+        content = html_path.read_text(encoding="utf-8")
+
+        assert linked == 2
+        assert "base64" not in content
+        assert 'src="pages/page_1.png"' in content and 'src="pages/page_2.png"' in content
+        assert content.count('class="page"') == 3
+        # Apart from the image blocks the document is unchanged
+        without_images = re.sub(r' {8}<div class="page-image">\n.*\n {8}</div>\n', "", content)
+        assert without_images == vision_to_html(VISION, "Doc")
+        assert not list(tmp.glob("*.tmp"))
+        print(f"✓ render.html is {len(content)} chars with {linked} linked images")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_self_contained_download_matches_embedded_html():
+    """Streaming the download inlines images exactly like embed_page_images=True."""
+    tmp = _job_dir()
+    try:
+        html_path = tmp / "render.html"
+        write_vision_html(html_path, VISION, "Doc", tmp)
+        streamed = "".join(iter_self_contained_html(html_path, tmp))
+
+        assert streamed == vision_to_html(VISION, "Doc", job_dir=tmp, embed_page_images=True)
+        assert streamed.count("data:image/png;base64,") == 3
+        print(f"✓ Self-contained download is {len(streamed)} chars")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all HTML streaming tests."""
+    print("HTML Streaming Tests")
+    print("=" * 50)
+
+    test_render_html_links_page_images()
+    test_self_contained_download_matches_embedded_html()
+
+    print("\n🎉 All HTML streaming tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Test the SQLite job index and GET /api/jobs."""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from storage import StorageManager
+
+
+def _storage(tmp: Path) -> StorageManager:
+    previous = os.environ.get("STORAGE_DIR")
+    os.environ["STORAGE_DIR"] = str(tmp)
+    try:
+        return StorageManager()
+    finally:
+        if previous is None:
+            del os.environ["STORAGE_DIR"]
+        else:
+            os.environ["STORAGE_DIR"] = previous
+
+
+def test_write_through_and_sync():
+    """save_job writes the row; stale rows re-read job.json; sync adds and drops jobs."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        # A job that predates the index
+        legacy_dir = tmp / "jobs" / "legacy"
+        legacy_dir.mkdir(parents=True)
+        (legacy_dir / "job.json").write_text(json.dumps({"job_id": "legacy", "status": "done"}))
+        legacy_mtime = 1767225600_123_000_000  # 2026-01-01T00:00:00.123Z
+        os.utime(legacy_dir / "job.json", ns=(legacy_mtime, legacy_mtime))
+
+        storage = _storage(tmp)
+        assert storage.job_index.job_ids() == ["legacy"]
+        # updated_at is when job.json changed, not when the index was built
+        rows, _ = storage.job_index.list_jobs()
+        assert rows[0]["updated_at"] == "2026-01-01T00:00:00.123Z"
+        storage.sync_job_index()
+        storage._reindex_job("legacy")
+        assert storage.job_index.list_jobs()[0][0]["updated_at"] == "2026-01-01T00:00:00.123Z"
+
+        (tmp / "input.pdf").write_bytes(b"%PDF-" + b"x" * 95)
+        storage.save_job("a", {
+            "job_id": "a", "status": "done", "created_at": "2026-01-01T00:00:00Z",
+            "processing_started_at": "2026-01-01T00:00:00Z",
+            "processing_finished_at": "2026-01-01T00:00:02.500000Z",
+            "input_path": str(tmp / "input.pdf"), "openai_model_used": "gpt-4o-mini",
+            "timings": {"render_ms": 100, "vision_ms": 2300}
+        })
+        job, _ = storage.job_index.get("a")
+        assert job["status"] == "done" and storage.load_job("a") == job
+
+        # Edited behind the index: load_job notices the new mtime
+        job_file = tmp / "jobs" / "a" / "job.json"
+        job_file.write_text(json.dumps({**job, "status": "error"}))
+        os.utime(job_file, ns=(job_file.stat().st_atime_ns, job_file.stat().st_mtime_ns + 10**9))
+        assert storage.load_job("a")["status"] == "error"
+
+        shutil.rmtree(legacy_dir)
+        assert storage.sync_job_index() == {"added": 0, "removed": 1}
+        try:
+            storage.load_job("legacy")
+            assert False, "deleted job must not load"
+        except FileNotFoundError:
+            pass
+        print("✓ Write-through, stale row refresh, sync of legacy and deleted jobs, updated_at from mtime")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_list_jobs_filters_and_pages():
+    """Filters, sort and pagination of JobIndex.list_jobs and GET /api/jobs."""
+    import main
+
+    tmp = Path(tempfile.mkdtemp())
+    original = main.storage_manager.job_index
+    try:
+        storage = _storage(tmp)
+        (tmp / "input.pdf").write_bytes(b"%PDF-" + b"x" * 95)
+        for i in range(5):
+            storage.save_job(f"job{i}", {
+                "job_id": f"job{i}",
+                "status": "done" if i % 2 == 0 else "error",
+                "target_language": "de" if i < 3 else "fr",
+                "created_at": f"2026-01-0{i + 1}T00:00:00Z",
+                "processing_started_at": "2026-01-01T00:00:00Z",
+                "processing_finished_at": "2026-01-01T00:00:02.500000Z",
+                "input_path": str(tmp / "input.pdf"),
+                "timings": {"render_ms": 100}
+            })
+
+        jobs, total = storage.job_index.list_jobs(statuses=["done"])
+        assert total == 3 and [j["job_id"] for j in jobs] == ["job4", "job2", "job0"]
+        assert jobs[0]["processing_ms"] == 2500 and jobs[0]["input_size"] == 100
+        assert jobs[0]["timings"] == {"render_ms": 100}
+
+        jobs, total = storage.job_index.list_jobs(target_language="de", created_after="2026-01-02", descending=False)
+        assert total == 2 and [j["job_id"] for j in jobs] == ["job1", "job2"]
+
+        main.storage_manager.job_index = storage.job_index
+        page = asyncio.run(main.list_jobs(
+            status_filter="done,error", target_language=None, model=None,
+            created_after=None, created_before=None, sort="created_at", order="desc", limit=2, offset=2
+        ))
+        assert page["total"] == 5 and [j["job_id"] for j in page["jobs"]] == ["job2", "job1"]
+        assert "data" not in page["jobs"][0]
+        print("✓ Status/language/date filters, sorting and pagination")
+    finally:
+        main.storage_manager.job_index = original
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all job index tests."""
+    print("Job Index Tests")
+    print("=" * 50)
+
+    test_write_through_and_sync()
+    test_list_jobs_filters_and_pages()
+
+    print("\n🎉 All job index tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
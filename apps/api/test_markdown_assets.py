@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Test single-pass, deduplicated image extraction for PDF → Markdown."""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_to_markdown import pdf_to_markdown_with_assets, _split
+
+LOGO_RECT = fitz.Rect(400, 20, 560, 100)
+FIGURE_RECT = fitz.Rect(100, 400, 400, 700)
+
+
+def _solid_png(width: int, height: int, color: tuple) -> bytes:
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.set_rect(pix.irect, color)
+    return pix.tobytes("png")
+
+
+def _make_pdf(path: Path) -> None:
+    """Logo on every page (one xref), a figure on page 2, the logo re-embedded on page 4."""
+    logo = _solid_png(80, 40, (200, 30, 30))
+    doc = fitz.open()
+    logo_xref = None
+    for i in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Heading {i + 1}", fontsize=18)
+        page.insert_text((72, 300), "Some body text here.", fontsize=11)
+        logo_xref = page.insert_image(LOGO_RECT, stream=logo, xref=logo_xref or 0)
+    doc[1].insert_image(FIGURE_RECT, stream=_solid_png(60, 60, (30, 30, 200)))
+    doc.save(str(path))
+    doc.close()
+
+    # Same logo bytes under a new image object, as produced by a second embedding
+    other = fitz.open()
+    other.new_page().insert_image(LOGO_RECT, stream=logo)
+    merged = fitz.open(str(path))
+    merged.insert_pdf(other)
+    merged.save(str(path), incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    merged.close()
+    other.close()
+
+
+def test_images_written_once():
+    """Repeated images share one file; every placement keeps its own metadata."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        _make_pdf(tmp / "input.pdf")
+        result = pdf_to_markdown_with_assets(tmp / "input.pdf", tmp / "job")
+
+        files = sorted(p.name for p in (tmp / "job" / "md_assets").iterdir())
+        assert files == ["page1_img1.png", "page2_img2.png"], files
+        assert result["images_count"] == 2
+
+        images = result["images"]
+        assert [(img["page"], img["file"]) for img in images] == [
+            (1, "page1_img1.png"), (2, "page1_img1.png"), (2, "page2_img2.png"),
+            (3, "page1_img1.png"), (4, "page1_img1.png")
+        ]
+        # Different objects, same content
+        assert images[0]["xref"] != images[4]["xref"]
+        assert fitz.Rect(images[2]["bbox"]) == FIGURE_RECT
+        assert fitz.Rect(images[0]["bbox"]) == LOGO_RECT
+
+        markdown = Path(result["markdown_path"]).read_text(encoding="utf-8")
+        assert markdown.count("md_assets/page1_img1.png") == 1
+        assert "md_assets/page2_img2.png" in markdown
+        assert "Heading 2" in markdown
+        print(f"✓ {len(images)} placements → {len(files)} files")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def _noise_jpeg(colorspace, size: int = 200) -> bytes:
+    """A photo-like JPEG (noise compresses badly as PNG)."""
+    import random
+    rng = random.Random(1)
+    pix = fitz.Pixmap(colorspace, fitz.IRect(0, 0, size, size), False)
+    pix.set_rect(pix.irect, (0,) * colorspace.n)
+    for y in range(0, size, 4):
+        for x in range(0, size, 4):
+            pix.set_rect(fitz.IRect(x, y, x + 4, y + 4), tuple(rng.randrange(256) for _ in range(colorspace.n)))
+    return pix.tobytes("jpeg")
+
+
+def test_original_streams_kept():
+    """JPEG photos are stored byte for byte; CMYK is transcoded to RGB JPEG; PNG stays PNG."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        photo = _noise_jpeg(fitz.csRGB)
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 50, 250, 250), stream=photo)
+        page.insert_image(fitz.Rect(300, 50, 500, 250), stream=_noise_jpeg(fitz.csCMYK))
+        page.insert_image(LOGO_RECT + (0, 300, 0, 300), stream=_solid_png(80, 40, (200, 30, 30)))
+        doc.save(str(tmp / "input.pdf"))
+        doc.close()
+
+        result = pdf_to_markdown_with_assets(tmp / "input.pdf", tmp / "job", workers=1)
+        assets = tmp / "job" / "md_assets"
+        files = [img["file"] for img in result["images"]]
+        assert files == ["page1_img1.jpeg", "page1_img2.jpeg", "page1_img3.png"], files
+
+        assert (assets / files[0]).read_bytes() == photo
+        assert fitz.Pixmap(str(assets / files[1])).n == 3
+        # The photo as PNG, as extraction used to store it, is several times larger
+        png_size = len(fitz.Pixmap(photo).tobytes("png"))
+        assert png_size > 3 * len(photo), (png_size, len(photo))
+
+        markdown = Path(result["markdown_path"]).read_text(encoding="utf-8")
+        assert "md_assets/page1_img1.jpeg" in markdown
+        print(f"✓ JPEG kept ({len(photo)} bytes vs {png_size} as PNG), CMYK → RGB JPEG")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_parallel_conversion_matches_single_process():
+    """Page ranges converted in worker processes join to the same layout.md."""
+    assert _split(list(range(10)), 3) == [[0, 1, 2], [3, 4, 5, 6], [7, 8, 9]]
+    assert _split([4, 9], 4) == [[4], [9]]
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        doc = fitz.open()
+        for i in range(6):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Chapter {i + 1}", fontsize=20)
+            page.insert_text((72, 120), f"Body of chapter {i + 1}.", fontsize=10)
+        doc.save(str(tmp / "input.pdf"))
+        doc.close()
+
+        single = pdf_to_markdown_with_assets(tmp / "input.pdf", tmp / "single", workers=1)
+        parallel = pdf_to_markdown_with_assets(tmp / "input.pdf", tmp / "parallel", workers=2)
+        single_md = Path(single["markdown_path"]).read_text(encoding="utf-8")
+        parallel_md = Path(parallel["markdown_path"]).read_text(encoding="utf-8")
+        assert parallel_md == single_md
+        assert parallel_md.index("Chapter 3") < parallel_md.index("Chapter 4")
+        print("✓ 2-worker conversion identical to single process")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all markdown asset tests."""
+    print("Markdown Asset Extraction Tests")
+    print("=" * 50)
+
+    test_images_written_once()
+    test_original_streams_kept()
+    test_parallel_conversion_matches_single_process()
+
+    print("\n🎉 All markdown asset tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
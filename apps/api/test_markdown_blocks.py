@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test incremental block-wise markdown to HTML conversion."""
+
+import markdown2
+
+from markdown_blocks import block_cache, markdown_to_html, split_blocks
+
+DOCUMENT = """# Report
+
+First paragraph
+spanning two lines.
+
+- item one
+- item two
+
+- loose item
+
+1. first
+
+2. second
+
+    indented code
+
+    more code
+
+| Name | Value |
+|------|-------|
+| a    | 1     |
+
+> quoted
+
+> still quoted
+
+<div class="ocr-overlay-container">
+  <img src="md_assets/page1_img1.png">
+
+  <div class="ocr-text-overlay">Text</div>
+</div>
+
+```
+fenced
+
+code
+```
+
+Setext
+======
+
+Last paragraph with *emphasis*.
+"""
+
+
+def _full(markdown: str) -> str:
+    return markdown2.markdown(markdown, extras=["tables"])
+
+
+def test_same_html_as_full_conversion():
+    """Block-wise output equals one markdown2 call on the whole document."""
+    block_cache.clear()
+    assert len(split_blocks(DOCUMENT)) > 5
+    assert markdown_to_html(DOCUMENT) == _full(DOCUMENT)
+
+    # Reference links resolve across blocks: the document stays one block
+    with_refs = "See [the docs][d].\n\nMore text.\n\n[d]: https://example.com\n"
+    assert split_blocks(with_refs) == [with_refs]
+    assert markdown_to_html(with_refs) == _full(with_refs)
+
+    # Raw block tags and comments that contain blank lines stay in one block
+    for raw in ("<!-- a\n\nb -->", "<p>\nx\n\ny\n</p>", "<h2>\nA\n\nB\n</h2>",
+                "text\n\n<!-- <div> -->\n\npara", "a\n\n<!-- x --> <!-- y\n\nz -->\n\nb"):
+        assert markdown_to_html(raw) == _full(raw), raw
+    assert len(split_blocks("text\n\n<!-- <div> -->\n\npara")) == 3
+    print("✓ Block-wise HTML equals full conversion (lists, code, tables, HTML, comments, refs)")
+
+
+def test_only_changed_blocks_reconverted():
+    """Editing one paragraph converts one block; the rest come from the cache."""
+    block_cache.clear()
+    markdown_to_html(DOCUMENT)
+    blocks = len(split_blocks(DOCUMENT))
+
+    before = dict(block_cache.stats)
+    markdown_to_html(DOCUMENT)
+    assert block_cache.stats["hits"] - before["hits"] == blocks
+    assert block_cache.stats["misses"] == before["misses"]
+
+    edited = DOCUMENT.replace("First paragraph", "Edited paragraph")
+    before = dict(block_cache.stats)
+    html = markdown_to_html(edited)
+    assert block_cache.stats["misses"] - before["misses"] == 1
+    assert block_cache.stats["hits"] - before["hits"] == blocks - 1
+    assert html == _full(edited)
+    print("✓ Unchanged document fully cached, one edited paragraph reconverted")
+
+
+def main():
+    """Run all markdown block tests."""
+    print("Markdown Block Conversion Tests")
+    print("=" * 50)
+
+    test_same_html_as_full_conversion()
+    test_only_changed_blocks_reconverted()
+
+    print("\n🎉 All markdown block tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
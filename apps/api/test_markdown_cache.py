@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Test the per-page markdown fragment cache."""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_to_markdown import pdf_to_markdown_with_assets
+
+PAGES = 4
+
+
+def _make_pdf(path: Path, edited_page: int = 0) -> None:
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Section {i + 1}", fontsize=20)
+        body = "Edited paragraph." if i + 1 == edited_page else f"Paragraph of section {i + 1}."
+        page.insert_text((72, 120), body, fontsize=11)
+    doc.save(str(path))
+    doc.close()
+
+
+def test_fragments_reused_across_jobs_and_edits():
+    """Same PDF in a new job: no conversion. One edited page: one conversion."""
+    tmp = Path(tempfile.mkdtemp())
+    cache_dir = tmp / "markdown_cache"
+    try:
+        _make_pdf(tmp / "a.pdf")
+        first = pdf_to_markdown_with_assets(tmp / "a.pdf", tmp / "job1", workers=1, cache_dir=cache_dir)
+        assert (first["pages_converted"], first["pages_cached"]) == (PAGES, 0)
+
+        second = pdf_to_markdown_with_assets(tmp / "a.pdf", tmp / "job2", workers=1, cache_dir=cache_dir)
+        assert (second["pages_converted"], second["pages_cached"]) == (0, PAGES)
+        first_md = Path(first["markdown_path"]).read_text(encoding="utf-8")
+        assert Path(second["markdown_path"]).read_text(encoding="utf-8") == first_md
+
+        _make_pdf(tmp / "b.pdf", edited_page=3)
+        edited = pdf_to_markdown_with_assets(tmp / "b.pdf", tmp / "job3", workers=1, cache_dir=cache_dir)
+        assert (edited["pages_converted"], edited["pages_cached"]) == (1, PAGES - 1)
+        uncached = pdf_to_markdown_with_assets(tmp / "b.pdf", tmp / "job4", workers=1)
+        edited_md = Path(edited["markdown_path"]).read_text(encoding="utf-8")
+        assert edited_md == Path(uncached["markdown_path"]).read_text(encoding="utf-8")
+        assert "Edited paragraph." in edited_md and "Section 4" in edited_md
+
+        options = pdf_to_markdown_with_assets(
+            tmp / "a.pdf", tmp / "job5", workers=1, cache_dir=cache_dir, options={"ignore_code": True}
+        )
+        assert options["pages_converted"] == PAGES
+        print("✓ Cross-job hits, 1 of 4 pages reconverted after edit, options change misses")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all markdown cache tests."""
+    print("Markdown Page Cache Tests")
+    print("=" * 50)
+
+    test_fragments_reused_across_jobs_and_edits()
+
+    print("\n🎉 All markdown cache tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
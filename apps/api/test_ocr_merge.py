@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Test grid-indexed merging of OCR word boxes into lines and paragraphs."""
+
+import random
+import time
+from ocr_merge import merge_ocr_boxes, merge_words_into_lines
+
+
+def _word(text, x1, y1, x2, y2, conf=0.9):
+    return {"text": text, "bbox": [x1, y1, x2, y2], "confidence": conf}
+
+
+def test_words_merge_into_lines():
+    """Words on one baseline become a single line box."""
+    words = [
+        _word("World", 70, 10, 120, 30),
+        _word("Hello", 10, 10, 60, 30),
+        _word("Second", 10, 40, 70, 60),
+        _word("line", 78, 41, 110, 60),
+    ]
+    lines = merge_words_into_lines(words)
+
+    assert [l["text"] for l in lines] == ["Hello World", "Second line"]
+    assert lines[0]["bbox"] == [10, 10, 120, 30]
+    assert lines[1]["bbox"] == [10, 40, 110, 60]
+    print(f"✓ {len(words)} words → {len(lines)} lines")
+
+
+def test_lines_merge_into_paragraphs():
+    """Stacked lines merge, distant blocks and side-by-side columns stay apart."""
+    words = [
+        # Paragraph 1, left column
+        _word("Alpha", 10, 10, 60, 30), _word("beta", 68, 10, 110, 30),
+        _word("gamma", 10, 36, 70, 56),
+        # Right column at the same height
+        _word("Right", 300, 10, 350, 30),
+        # Paragraph 2, far below
+        _word("Footer", 10, 200, 80, 220, conf=0.5),
+    ]
+    paragraphs = merge_ocr_boxes(words, level="paragraph")
+    texts = [p["text"] for p in paragraphs]
+
+    assert texts == ["Alpha beta gamma", "Right", "Footer"], texts
+    assert paragraphs[0]["bbox"] == [10, 10, 110, 56]
+    assert set(paragraphs[0]) == {"text", "bbox", "confidence"}
+    assert abs(paragraphs[2]["confidence"] - 0.5) < 1e-9
+    print(f"✓ {len(words)} words → {len(paragraphs)} paragraphs: {texts}")
+
+
+def test_word_level_is_passthrough():
+    """Word level returns the input unchanged."""
+    words = [_word("a", 0, 0, 10, 10), _word("b", 12, 0, 22, 10)]
+    assert merge_ocr_boxes(words, level="word") == words
+    assert merge_ocr_boxes([], level="paragraph") == []
+
+    try:
+        merge_ocr_boxes(words, level="page")
+        assert False, "invalid level must raise"
+    except ValueError:
+        pass
+    print("✓ Passthrough and validation OK")
+
+
+def test_merge_scales_with_box_count():
+    """A dense synthetic page merges without all-pairs comparison."""
+    rng = random.Random(42)
+    words = []
+    for row in range(200):
+        x = 10
+        for col in range(25):
+            w = rng.randint(20, 60)
+            words.append(_word(f"w{row}_{col}", x, 20 + row * 40, x + w, 40 + row * 40))
+            x += w + 8
+
+    start = time.perf_counter()
+    lines = merge_ocr_boxes(words, level="line")
+    elapsed = time.perf_counter() - start
+
+    assert len(lines) == 200
+    print(f"✓ {len(words)} words → {len(lines)} lines in {elapsed * 1000:.1f} ms")
+
+
+def main():
+    """Run all OCR merge tests."""
+    print("OCR Box Merge Tests")
+    print("=" * 50)
+
+    test_words_merge_into_lines()
+    test_lines_merge_into_paragraphs()
+    test_word_level_is_passthrough()
+    test_merge_scales_with_box_count()
+
+    print("\n🎉 All OCR merge tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
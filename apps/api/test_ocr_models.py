@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Test the per-language OCR model registry and its memory-bounded LRU."""
+
+import threading
+import time
+
+from ocr_models import OCRModelRegistry, is_supported_paddle_lang, normalize_paddle_lang
+
+MB = 1024 * 1024
+
+
+class FakeProcess:
+    """Tracks fake resident memory so model sizes are deterministic."""
+
+    def __init__(self):
+        self.rss = 100 * MB
+
+    def probe(self):
+        return self.rss
+
+
+def make_registry(budget_mb, sizes_mb):
+    proc = FakeProcess()
+    loads = []
+
+    def loader(lang):
+        loads.append(lang)
+        proc.rss += sizes_mb[lang] * MB
+        return {"lang": lang}
+
+    registry = OCRModelRegistry(loader, max_memory_mb=budget_mb, memory_probe=proc.probe)
+    return registry, loads, proc
+
+
+def test_lazy_load_and_routing():
+    """Each language loads once and is served from cache afterwards."""
+    registry, loads, _ = make_registry(1000, {"en": 300, "ru": 300})
+
+    assert registry.get("en")["lang"] == "en"
+    assert registry.get("ru")["lang"] == "ru"
+    assert registry.get("en")["lang"] == "en"
+
+    assert loads == ["en", "ru"]
+    assert registry.stats["hits"] == 1
+    assert registry.stats["misses"] == 2
+    print(f"✓ Loaded {registry.loaded_languages()} lazily, stats={registry.stats}")
+
+
+def test_lru_eviction_by_memory():
+    """Least recently used model is evicted when the budget would be exceeded."""
+    registry, loads, _ = make_registry(700, {"en": 300, "ru": 300, "german": 300})
+
+    registry.get("en")
+    registry.get("ru")
+    registry.get("en")          # "ru" is now least recently used
+    registry.get("german")      # needs room → evicts "ru"
+
+    assert registry.loaded_languages() == ["en", "german"]
+    assert registry.memory_in_use() == 600 * MB
+    assert registry.stats["evictions"] == 1
+
+    registry.get("ru")          # reload evicts "en"
+    assert registry.loaded_languages() == ["german", "ru"]
+    assert loads == ["en", "ru", "german", "ru"]
+    print(f"✓ LRU eviction OK, loaded={registry.loaded_languages()}")
+
+
+def test_oversized_model_is_still_served():
+    """A single model larger than the budget is kept so requests still succeed."""
+    registry, _, _ = make_registry(100, {"ch": 500, "en": 50})
+
+    assert registry.get("ch")["lang"] == "ch"
+    assert registry.loaded_languages() == ["ch"]
+
+    registry.get("en")
+    assert registry.loaded_languages() == ["en"]
+    print("✓ Oversized model handled")
+
+
+def test_slow_load_does_not_block_other_languages():
+    """A slow load runs outside the registry lock; same-language callers share it."""
+    proc = FakeProcess()
+    loads = []
+    release = threading.Event()
+
+    def loader(lang):
+        loads.append(lang)
+        if lang == "ch":
+            release.wait(5)
+        return {"lang": lang}
+
+    registry = OCRModelRegistry(loader, max_memory_mb=1000, memory_probe=proc.probe)
+    registry.get("en")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("ch"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    assert registry.get("en")["lang"] == "en"
+    assert time.perf_counter() - started < 1.0
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert loads == ["en", "ch"]
+    assert [model["lang"] for model in results] == ["ch", "ch"]
+    print("✓ Cache hits served while another language loads; one load per language")
+
+
+def test_language_normalization():
+    """User-facing codes map to PaddleOCR model names."""
+    assert normalize_paddle_lang("RU") == "ru"
+    assert normalize_paddle_lang("de") == "german"
+    assert normalize_paddle_lang("zh") == "ch"
+    assert normalize_paddle_lang("latin") == "latin"
+    assert is_supported_paddle_lang("de") and is_supported_paddle_lang("latin")
+    assert not is_supported_paddle_lang("klingon")
+    print("✓ Language normalization OK")
+
+
+def main():
+    """Run all OCR model registry tests."""
+    print("OCR Model Registry Tests")
+    print("=" * 50)
+
+    test_lazy_load_and_routing()
+    test_lru_eviction_by_memory()
+    test_oversized_model_is_still_served()
+    test_slow_load_does_not_block_other_languages()
+    test_language_normalization()
+
+    print("\n🎉 All OCR model registry tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
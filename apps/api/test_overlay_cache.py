@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Test incremental overlay regeneration with the per-page cache."""
+
+import copy
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_render import render_pdf_to_pngs
+from pdf_overlay_generate import generate_overlay_pdf
+from overlay_cache import OVERLAY_CACHE_DIRNAME
+
+PAGES = 5
+
+
+def _make_job(tmp: Path) -> dict:
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page(width=400, height=300)
+        page.insert_text((40, 60), f"Title {i + 1}", fontsize=20)
+    doc.save(str(tmp / "input.pdf"))
+    doc.close()
+
+    render_pdf_to_pngs(tmp / "input.pdf", tmp / "pages", max_pages=PAGES, dpi=144)
+    return {
+        "pages": [
+            {"page": i + 1, "blocks": [{"type": "heading", "text": f"Heading {i + 1}", "bbox": [70, 80, 400, 130]}]}
+            for i in range(PAGES)
+        ]
+    }
+
+
+def _cached_files(tmp: Path) -> dict:
+    return {p.name: p.stat().st_mtime_ns for p in (tmp / OVERLAY_CACHE_DIRNAME).rglob("*.pdf")}
+
+
+def test_only_edited_page_is_rerendered():
+    """Editing one page re-renders that page only; the result matches a full rebuild."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = _make_job(tmp)
+        generate_overlay_pdf(tmp, vision)
+        first = _cached_files(tmp)
+        assert len(first) == PAGES
+
+        edited = copy.deepcopy(vision)
+        edited["pages"][2]["blocks"][0]["text"] = "Fixed heading"
+        pdf_bytes = generate_overlay_pdf(tmp, edited)
+        second = _cached_files(tmp)
+
+        changed = {name for name in second if first.get(name) != second[name]}
+        assert len(second) == PAGES
+        assert len(changed) == 1 and next(iter(changed)).startswith("page_3."), changed
+
+        cached_report = (tmp / "overlay_report.json").read_text(encoding="utf-8")
+        full_bytes = generate_overlay_pdf(tmp, edited, cache=False)
+        assert (tmp / "overlay_report.json").read_text(encoding="utf-8") == cached_report
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        full = fitz.open(stream=full_bytes, filetype="pdf")
+        assert doc.page_count == PAGES
+        assert "Fixed heading" in doc[2].get_text()
+        assert [p.get_text() for p in doc] == [p.get_text() for p in full]
+        print(f"✓ Edit on page 3 re-rendered {len(changed)} of {PAGES} pages")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_parameters_change_the_key():
+    """A different scope or DPI does not reuse pages rendered for other settings."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = _make_job(tmp)
+        generate_overlay_pdf(tmp, vision, overlay_scope="headings")
+        generate_overlay_pdf(tmp, vision, overlay_scope="all")
+        variants = sorted(p.name for p in (tmp / OVERLAY_CACHE_DIRNAME).iterdir())
+        assert variants == ["raster-all-144", "raster-headings-144"], variants
+        print(f"✓ Separate cache variants: {variants}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_cached_pages_are_small_and_font_is_shared():
+    """Cached pages are compressed and carry no overlay font; the output embeds it once."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = _make_job(tmp)
+        for background in ("raster", "vector"):
+            pdf_bytes = generate_overlay_pdf(tmp, vision, background=background)
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            overlay_fonts = {font[0] for page in doc for font in page.get_fonts() if font[1] == "ttf"}
+            assert len(overlay_fonts) == 1, overlay_fonts
+            assert "Heading 5" in doc[PAGES - 1].get_text()
+
+            cached = list((tmp / OVERLAY_CACHE_DIRNAME).glob(f"{background}-*/*.pdf"))
+            for path in cached:
+                with fitz.open(str(path)) as page_doc:
+                    assert all(font[1] != "ttf" for font in page_doc[0].get_fonts()), path.name
+            cache_bytes = sum(path.stat().st_size for path in cached)
+            # Uncompressed raster pages were megabytes each
+            assert cache_bytes < len(pdf_bytes) * 2, (cache_bytes, len(pdf_bytes))
+            print(f"✓ {background}: {len(pdf_bytes)} B output, 1 overlay font, cache {cache_bytes} B")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all overlay cache tests."""
+    print("Overlay Cache Tests")
+    print("=" * 50)
+
+    test_only_edited_page_is_rerendered()
+    test_parameters_change_the_key()
+    test_cached_pages_are_small_and_font_is_shared()
+
+    print("\n🎉 All overlay cache tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Test parallel per-page overlay generation against the sequential path."""
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_render import render_pdf_to_pngs
+import pdf_overlay_generate
+from pdf_overlay_generate import generate_overlay_pdf
+
+PAGES = 10
+
+
+def _make_job(tmp: Path) -> dict:
+    """Create input.pdf + rendered pages and vision data with a mix of blocks."""
+    doc = fitz.open()
+    for i in range(PAGES):
+        page = doc.new_page(width=400, height=300)
+        page.insert_text((40, 60), f"Title {i + 1}", fontsize=20)
+        page.insert_text((40, 200), "Body", fontsize=10)
+    doc.save(str(tmp / "input.pdf"))
+    doc.close()
+
+    render_pdf_to_pngs(tmp / "input.pdf", tmp / "pages", max_pages=PAGES, dpi=144)
+
+    pages = []
+    for i in range(PAGES):
+        pages.append({
+            "page": i + 1,
+            "blocks": [
+                {"type": "heading", "text": f"Translated {i + 1}", "bbox": [70, 80, 400, 130]},
+                {"type": "paragraph", "text": "Body", "bbox": [70, 380, 300, 410]},
+                {"type": "heading", "text": "", "bbox": [0, 0, 10, 10]},
+            ]
+        })
+    return {"pages": pages}
+
+
+def test_parallel_matches_sequential():
+    """Pool output has the same pages, text and report as the single-process run."""
+    tmp = Path(tempfile.mkdtemp())
+    previous = os.environ.get("OVERLAY_WORKERS")
+    # Two pool processes even on a single-core machine, so the pool path runs
+    os.environ["OVERLAY_WORKERS"] = "2"
+    pdf_overlay_generate._reset_pool()
+    try:
+        vision = _make_job(tmp)
+        report_path = tmp / "overlay_report.json"
+
+        for background in ("raster", "vector"):
+            start = time.perf_counter()
+            sequential = generate_overlay_pdf(tmp, vision, background=background, workers=1, cache=False)
+            seq_time = time.perf_counter() - start
+            sequential_report = report_path.read_text(encoding="utf-8")
+
+            start = time.perf_counter()
+            parallel = generate_overlay_pdf(tmp, vision, background=background, workers=2, cache=False)
+            par_time = time.perf_counter() - start
+            parallel_report = report_path.read_text(encoding="utf-8")
+
+            assert parallel_report == sequential_report
+
+            seq_doc = fitz.open(stream=sequential, filetype="pdf")
+            par_doc = fitz.open(stream=parallel, filetype="pdf")
+            assert par_doc.page_count == seq_doc.page_count == PAGES
+            for i in range(PAGES):
+                assert par_doc[i].get_text() == seq_doc[i].get_text()
+                assert par_doc[i].rect == seq_doc[i].rect
+            assert f"Translated {PAGES}" in par_doc[PAGES - 1].get_text()
+            print(f"✓ {background}: sequential {seq_time:.2f}s, 2 workers {par_time:.2f}s, identical report")
+    finally:
+        if previous is None:
+            os.environ.pop("OVERLAY_WORKERS", None)
+        else:
+            os.environ["OVERLAY_WORKERS"] = previous
+        pdf_overlay_generate._reset_pool()
+        shutil.rmtree(tmp)
+
+
+def test_shared_pool_and_auto_workers():
+    """One bounded pool is reused; auto mode stays in-process on a single core."""
+    previous = os.environ.pop("OVERLAY_WORKERS", None)
+    cpu_count = pdf_overlay_generate.os.cpu_count
+    try:
+        pdf_overlay_generate.os.cpu_count = lambda: 1
+        assert pdf_overlay_generate._resolve_workers(None, 100) == 1
+        assert pdf_overlay_generate._resolve_workers(8, 100) == 1
+
+        pdf_overlay_generate.os.cpu_count = lambda: 32
+        assert pdf_overlay_generate._resolve_workers(None, 4) == 1
+        assert pdf_overlay_generate._resolve_workers(None, 100) == pdf_overlay_generate.OVERLAY_MAX_WORKERS
+
+        assert pdf_overlay_generate._overlay_pool() is pdf_overlay_generate._overlay_pool()
+        print("✓ Shared bounded pool, in-process rendering on a single core")
+    finally:
+        pdf_overlay_generate.os.cpu_count = cpu_count
+        if previous is not None:
+            os.environ["OVERLAY_WORKERS"] = previous
+        pdf_overlay_generate._reset_pool()
+
+
+def main():
+    """Run all parallel overlay tests."""
+    print("Parallel Overlay Tests")
+    print("=" * 50)
+
+    test_parallel_matches_sequential()
+    test_shared_pool_and_auto_workers()
+
+    print("\n🎉 All parallel overlay tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Test vector overlay mode built on the original PDF pages."""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_render import render_pdf_to_pngs
+from pdf_overlay_generate import generate_overlay_pdf
+
+
+def _make_job(tmp: Path) -> dict:
+    """Create input.pdf + rendered pages and a vision dict covering the title."""
+    doc = fitz.open()
+    page = doc.new_page(width=400, height=300)
+    page.insert_text((40, 60), "Original Title", fontsize=20)
+    page.insert_text((40, 200), "Body text stays", fontsize=10)
+    page.draw_rect(fitz.Rect(30, 220, 370, 280), color=(0, 0, 1), width=2)
+    doc.save(str(tmp / "input.pdf"))
+    doc.close()
+
+    render_pdf_to_pngs(tmp / "input.pdf", tmp / "pages", max_pages=1, dpi=144)
+
+    # Title bbox in 144 DPI pixels (2x points)
+    return {
+        "pages": [{
+            "page": 1,
+            "blocks": [
+                {"type": "heading", "text": "Translated Title", "bbox": [70, 80, 400, 130]},
+            ]
+        }]
+    }
+
+
+def test_vector_overlay_keeps_source_content():
+    """Only the replaced block is removed; other text and vector graphics survive."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = _make_job(tmp)
+        pdf_bytes = generate_overlay_pdf(tmp, vision, dpi=144, overlay_scope="headings", background="vector")
+
+        out = fitz.open(stream=pdf_bytes, filetype="pdf")
+        page = out[0]
+        text = page.get_text()
+        assert "Translated Title" in text
+        assert "Original Title" not in text
+        assert "Body text stays" in text
+        assert page.rect.width == 400 and page.rect.height == 300
+        assert page.get_images() == [], "vector mode must not embed a page raster"
+        assert any(d.get("color") == (0.0, 0.0, 1.0) for d in page.get_drawings())
+        out.close()
+
+        raster_bytes = generate_overlay_pdf(tmp, vision, dpi=144, overlay_scope="headings", background="raster")
+        print(f"✓ Vector overlay: {len(pdf_bytes)} bytes (raster: {len(raster_bytes)} bytes)")
+        assert len(pdf_bytes) < len(raster_bytes)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_vector_and_raster_report_match():
+    """Both backgrounds apply the same policy and produce the same statistics."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = _make_job(tmp)
+        vision["pages"][0]["blocks"].append({"type": "paragraph", "text": "Skip me", "bbox": [70, 380, 300, 410]})
+
+        reports = []
+        for background in ("raster", "vector"):
+            generate_overlay_pdf(tmp, vision, dpi=144, overlay_scope="headings", background=background)
+            reports.append((tmp / "overlay_report.json").read_text(encoding="utf-8"))
+        assert reports[0] == reports[1]
+
+        try:
+            generate_overlay_pdf(tmp, vision, background="svg")
+            assert False, "invalid background must raise"
+        except ValueError:
+            pass
+        print("✓ Raster and vector reports identical")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all vector overlay tests."""
+    print("Vector Overlay Tests")
+    print("=" * 50)
+
+    test_vector_overlay_keeps_source_content()
+    test_vector_and_raster_report_match()
+
+    print("\n🎉 All vector overlay tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
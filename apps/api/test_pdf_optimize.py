@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Test the output PDF optimization stage."""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from pdf_render import render_pdf_to_pngs
+from pdf_overlay_generate import generate_overlay_pdf
+from pdf_optimize import optimize_pdf_bytes, optimize_pdf_file, validate_optimize_options
+
+
+def _overlay_job(tmp: Path, pages: int = 3) -> Path:
+    """Build a raster overlay PDF (full-resolution page images) and return its path."""
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((60, 80), f"Chapter {i + 1}", fontsize=24)
+        page.draw_rect(fitz.Rect(60, 200, 535, 600), color=(0.2, 0.4, 0.8), fill=(0.8, 0.9, 1.0))
+    doc.save(str(tmp / "input.pdf"))
+    doc.close()
+
+    render_pdf_to_pngs(tmp / "input.pdf", tmp / "pages", max_pages=pages, dpi=288)
+    vision = {"pages": [
+        {"page": i + 1, "blocks": [{"type": "heading", "text": f"Глава {i + 1}", "bbox": [230, 200, 1000, 340]}]}
+        for i in range(pages)
+    ]}
+    output = tmp / "output_overlay.pdf"
+    output.write_bytes(generate_overlay_pdf(tmp, vision, dpi=288, cache=False))
+    return output
+
+
+def test_overlay_output_shrinks():
+    """Page images are downsampled to the target DPI and recompressed; text survives."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        output = _overlay_job(tmp)
+        report = optimize_pdf_file(output, target_dpi=100, jpeg_quality=75)
+
+        assert report["optimized_bytes"] < report["original_bytes"]
+        assert report["optimized_bytes"] == output.stat().st_size
+        assert report["images_rewritten"] == 3
+
+        doc = fitz.open(str(output))
+        assert doc.page_count == 3
+        assert "Глава 2" in doc[1].get_text()
+        xref, _, width, _, _, _, _, _, filt, *_ = doc[0].get_images(full=True)[0]
+        assert filt == "DCTDecode"
+        assert abs(width - 595 * 100 / 72) <= 2, width
+        doc.close()
+        print(f"✓ {report['original_bytes']} → {report['optimized_bytes']} bytes ({report['saved_ratio']:.0%} saved)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_identical_images_are_deduplicated():
+    """The same image inserted on several pages is stored once after optimization."""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 400, 300), 0)
+    pix.set_rect(pix.irect, (200, 120, 40))
+    doc = fitz.open()
+    for _ in range(4):
+        page = doc.new_page(width=400, height=300)
+        # Separate insertions create separate image objects
+        page.insert_image(page.rect, stream=pix.tobytes("png"))
+    source = doc.tobytes()
+    doc.close()
+
+    optimized, report = optimize_pdf_bytes(source)
+    doc = fitz.open(stream=optimized, filetype="pdf")
+    xrefs = {img[0] for page in doc for img in page.get_images()}
+    assert len(xrefs) == 1, xrefs
+    assert report["linearized"] is False
+    print(f"✓ 4 inserted copies → {len(xrefs)} image object")
+
+
+def test_invalid_options_are_rejected():
+    """Too low a DPI and linearize without optimize fail instead of degrading the PDF."""
+    import asyncio
+    from fastapi import HTTPException
+    from main import generate_pdf
+
+    for dpi in (0, -10, 35):
+        try:
+            optimize_pdf_bytes(b"%PDF-1.7", target_dpi=dpi)
+            assert False, f"target_dpi={dpi} must be rejected"
+        except ValueError:
+            pass
+    validate_optimize_options(True, 36, True)
+    validate_optimize_options(False, None, False)
+
+    for optimize, optimize_dpi, linearize in ((True, 0, False), (False, None, True)):
+        try:
+            asyncio.run(generate_pdf(
+                "no-such-job", mode="html", debug_overlay=False, overlay_scope="headings", background="raster",
+                engine="story", optimize=optimize, optimize_dpi=optimize_dpi, linearize=linearize
+            ))
+            assert False, "expected 400"
+        except HTTPException as e:
+            assert e.status_code == 400, e.detail
+    print("✓ optimize_dpi below the minimum and linearize without optimize rejected")
+
+
+def main():
+    """Run all PDF optimization tests."""
+    print("PDF Optimization Tests")
+    print("=" * 50)
+
+    test_overlay_output_shrinks()
+    test_identical_images_are_deduplicated()
+    test_invalid_options_are_rejected()
+
+    print("\n🎉 All PDF optimization tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Test in-memory raster handoff between rendering, overlay and debug stages."""
+
+import shutil
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from raster_cache import raster_cache, load_raster, attach_raster
+from pdf_render import render_pdf_to_pngs
+
+
+def _make_pdf(path: Path, pages: int = 2) -> None:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=300, height=200)
+        page.insert_text((20, 50), f"Page {i + 1}", fontsize=20)
+    doc.save(str(path))
+    doc.close()
+
+
+def _sum_shared_samples(handle):
+    raster = attach_raster(handle)
+    total = sum(raster.samples[:1000])
+    raster.close()
+    return total
+
+
+def test_render_populates_cache():
+    """Rendered pages are served from memory without decoding the PNG again."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        pdf_path = tmp / "input.pdf"
+        _make_pdf(pdf_path)
+        png_paths = render_pdf_to_pngs(pdf_path, tmp / "pages", max_pages=2, dpi=72)
+
+        decodes_before = raster_cache.stats["decodes"]
+        raster = load_raster(png_paths[0])
+        assert raster_cache.stats["decodes"] == decodes_before
+        assert (raster.width, raster.height) == (300, 200)
+        assert raster.png_bytes == png_paths[0].read_bytes()
+
+        # Samples match a fresh decode of the file
+        disk_pix = fitz.Pixmap(str(png_paths[0]))
+        assert bytes(raster.samples) == bytes(disk_pix.samples)
+        print(f"✓ {len(png_paths)} pages cached, no extra decode")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_changed_file_is_reloaded():
+    """A PNG rewritten on disk is decoded again instead of served stale."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        pdf_path = tmp / "input.pdf"
+        _make_pdf(pdf_path, pages=1)
+        png_path = render_pdf_to_pngs(pdf_path, tmp / "pages", max_pages=1, dpi=72)[0]
+
+        smaller = fitz.open(str(pdf_path))[0].get_pixmap(dpi=36)
+        smaller.save(str(png_path))
+
+        decodes_before = raster_cache.stats["decodes"]
+        raster = load_raster(png_path)
+        assert raster_cache.stats["decodes"] == decodes_before + 1
+        assert raster.width == 150
+        print("✓ Stale raster invalidated")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_shared_memory_handoff():
+    """Another process can read the samples through the shared-memory handle."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        pdf_path = tmp / "input.pdf"
+        _make_pdf(pdf_path, pages=1)
+        png_path = render_pdf_to_pngs(pdf_path, tmp / "pages", max_pages=1, dpi=72)[0]
+        raster = load_raster(png_path)
+
+        handle = raster.handle()
+        if handle is None:
+            print("⚠️  Shared memory unavailable, skipping cross-process check")
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1) as pool:
+            total = pool.apply(_sum_shared_samples, (handle,))
+        assert total == sum(raster.samples[:1000])
+        print("✓ Raster read from worker process via shared memory")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_pinned_segment_survives_eviction():
+    """A handle handed to workers stays attachable until the pin is released."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        pdf_path = tmp / "input.pdf"
+        _make_pdf(pdf_path, pages=1)
+        png_path = render_pdf_to_pngs(pdf_path, tmp / "pages", max_pages=1, dpi=72)[0]
+        raster = load_raster(png_path)
+        if raster.handle() is None:
+            print("⚠️  Shared memory unavailable, skipping pin check")
+            return
+
+        pix = raster.to_pixmap()
+        assert bytes(pix.samples) == bytes(raster.samples)
+        assert raster.to_pil().tobytes() == bytes(raster.samples)
+
+        with raster_cache.pinned([png_path, tmp / "missing.png"]) as handles:
+            assert handles[1] is None
+            raster_cache.invalidate(png_path)
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(1) as pool:
+                total = pool.apply(_sum_shared_samples, (handles[0],))
+            assert total == sum(raster.samples[:1000])
+        try:
+            attach_raster(handles[0])
+            assert False, "segment must be unlinked after the pin is released"
+        except FileNotFoundError:
+            pass
+        print("✓ Pinned segment attachable after eviction, unlinked on release")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all raster cache tests."""
+    print("Raster Cache Tests")
+    print("=" * 50)
+
+    test_render_populates_cache()
+    test_changed_file_is_reloaded()
+    test_shared_memory_handoff()
+    test_pinned_segment_survives_eviction()
+
+    print("\n🎉 All raster cache tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Test the artifact retention policy: TTLs, quota, dry run and restoration."""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from artifact_cache import ArtifactManifest
+from retention import collect_garbage, removed_artifacts, RETENTION_RECORD
+
+DAY = 24 * 3600
+KEPT = ["input.pdf", "job.json", "vision.json", "edited.json", "md_assets/page1_img1_translated.png", "layout.md"]
+
+
+def _write(job_dir: Path, rel_path: str, size: int, age_days: float, now: float) -> None:
+    path = job_dir / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    os.utime(path, (now - age_days * DAY, now - age_days * DAY))
+
+
+def _synthetic_job(jobs_dir: Path, job_id: str, age_days: float, now: float) -> Path:
+    job_dir = jobs_dir / job_id
+    for rel_path in KEPT:
+        _write(job_dir, rel_path, 1000, age_days, now)
+    for rel_path in ("pages/page_1.png", "pages/page_2.png", "pages/debug_page_1.png", "render.html",
+                     "output.pdf", "output_overlay.pdf", "md_assets/page1_img1.png", "overlay_report.json"):
+        _write(job_dir, rel_path, 1000, age_days, now)
+    # output.pdf can be rebuilt, output_overlay.pdf predates recipes
+    ArtifactManifest(job_dir).record("output.pdf", "k", {"recipe": {"kind": "generate", "variant": {"mode": "html"}}})
+    ArtifactManifest(job_dir).record("output_overlay.pdf", "k", {})
+    # Recording hashes (reads) the outputs; put their age back
+    for name in ("artifacts.json", "output.pdf", "output_overlay.pdf"):
+        os.utime(job_dir / name, (now - age_days * DAY, now - age_days * DAY))
+    return job_dir
+
+
+def test_ttl_quota_and_dry_run():
+    """TTL per class, LRU eviction over quota, inputs/edits and recipe-less PDFs kept."""
+    tmp = Path(tempfile.mkdtemp())
+    now = time.time()
+    try:
+        old = _synthetic_job(tmp, "old", age_days=2, now=now)
+        _synthetic_job(tmp, "new", age_days=0.5, now=now)
+
+        ttls = {"page_images": 168, "debug_pages": 24, "render_html": 24, "pdf_outputs": 168, "md_images": 168, "scratch": 24}
+        report = collect_garbage(tmp, dry_run=True, ttls=ttls, quota=0, min_age=0, now=now)
+        assert report["dry_run"] and report["freed_bytes"] == 3000
+        assert sorted(report["by_class"]) == ["debug_pages", "render_html", "scratch"]
+        assert {g["job_id"] for g in report["removed"]} == {"old"}
+        assert (old / "render.html").exists() and not (old / RETENTION_RECORD).exists()
+
+        # Quota without TTLs: evict least recently used groups of the old job first
+        no_ttl = {name: 0 for name in ttls}
+        report = collect_garbage(tmp, dry_run=False, ttls=no_ttl, quota=report["usage_bytes"] - 2500, min_age=0, now=now)
+        assert [g["reason"] for g in report["removed"]] == ["quota"] * 3
+        assert {g["job_id"] for g in report["removed"]} == {"old"}
+        assert not report["over_quota"]
+
+        # Everything evictable goes under a tiny quota; the rest stays
+        report = collect_garbage(tmp, dry_run=False, ttls=no_ttl, quota=1, min_age=0, now=now)
+        assert report["over_quota"]
+        for job_dir in (tmp / "old", tmp / "new"):
+            assert all((job_dir / rel_path).exists() for rel_path in KEPT)
+            assert (job_dir / "output_overlay.pdf").exists()
+            assert not (job_dir / "output.pdf").exists() and not (job_dir / "pages" / "page_1.png").exists()
+        assert sorted(removed_artifacts(old)["page_images"]) == ["pages/page_1.png", "pages/page_2.png"]
+
+        # Recently used artifacts are protected by min_age
+        _synthetic_job(tmp, "fresh", age_days=0, now=now)
+        report = collect_garbage(tmp, dry_run=True, ttls=no_ttl, quota=1, min_age=600, now=now)
+        assert all(g["job_id"] != "fresh" for g in report["removed"])
+        print("✓ TTLs per class, LRU quota eviction, dry run, inputs and edits kept")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_caches_are_collected_without_records():
+    """Overlay page cache and shared markdown fragments are collected but not recorded."""
+    tmp = Path(tempfile.mkdtemp())
+    now = time.time()
+    try:
+        jobs_dir, markdown_cache_dir = tmp / "jobs", tmp / "markdown_cache"
+        job_dir = _synthetic_job(jobs_dir, "job", age_days=5, now=now)
+        _write(job_dir, "overlay_cache/raster-headings/page_1.abc.pdf", 1000, 5, now)
+        _write(job_dir, "overlay_cache/raster-headings/page_1.abc.json", 100, 5, now)
+        _write(markdown_cache_dir, "ab/abcd.md", 500, 40, now)
+        _write(markdown_cache_dir, "cd/cdef.md", 500, 1, now)
+
+        report = collect_garbage(jobs_dir, dry_run=False, ttls={"scratch": 0, "debug_pages": 0, "render_html": 0},
+                                 quota=0, min_age=0, now=now, markdown_cache_dir=markdown_cache_dir)
+        assert report["by_class"]["overlay_cache"] == {"groups": 1, "files": 2, "bytes": 1100}
+        assert report["by_class"]["markdown_cache"] == {"groups": 1, "files": 1, "bytes": 500}
+        assert all(g["class"] != "markdown_cache" for g in report["removed"])
+        assert not (job_dir / "overlay_cache" / "raster-headings" / "page_1.abc.pdf").exists()
+        assert not (markdown_cache_dir / "ab" / "abcd.md").exists()
+        assert (markdown_cache_dir / "cd" / "cdef.md").exists()
+        assert "overlay_cache" not in removed_artifacts(job_dir)
+
+        # The markdown cache counts towards the quota and is evicted LRU like job artifacts
+        report = collect_garbage(jobs_dir, dry_run=True, ttls={}, quota=1, min_age=0, now=now,
+                                 markdown_cache_dir=markdown_cache_dir)
+        assert report["by_class"]["markdown_cache"]["bytes"] == 500
+        print("✓ Overlay page cache and markdown fragment cache collected, not recorded")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def _make_job(storage_manager, job_id: str) -> Path:
+    from pdf_render import render_pdf_to_pngs
+
+    job_dir = storage_manager.jobs_dir / job_id
+    job_dir.mkdir(parents=True)
+    doc = fitz.open()
+    for i in range(2):
+        page = doc.new_page(width=400, height=300)
+        page.insert_text((40, 60), f"Title {i + 1}", fontsize=20)
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), 0)
+    pix.clear_with(200)
+    doc[0].insert_image(fitz.Rect(40, 100, 200, 220), pixmap=pix)
+    doc.save(str(job_dir / "input.pdf"))
+    doc.close()
+    render_pdf_to_pngs(job_dir / "input.pdf", job_dir / "pages", max_pages=2, dpi=72)
+
+    vision = {"pages": [
+        {"page": i + 1, "blocks": [{"type": "heading", "text": f"Heading {i + 1}", "bbox": [40, 40, 300, 80]}]}
+        for i in range(2)
+    ]}
+    (job_dir / "vision.json").write_text(json.dumps(vision), encoding="utf-8")
+    storage_manager.save_job(job_id, {
+        "job_id": job_id, "status": "done", "filename": "retention.pdf",
+        "input_path": str(job_dir / "input.pdf"), "dpi": 72, "vision_pages_rendered": 2
+    })
+    return job_dir
+
+
+async def _read(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_collected_artifacts_are_rebuilt_on_request():
+    """After a real collection, the serving endpoints rebuild what they need."""
+    import main
+    from debug_render import render_all_debug_pages
+    from pdf_to_markdown import pdf_to_markdown_with_assets
+    from storage_backend import LocalBackend
+
+    storage_manager = main.storage_manager
+    tmp = Path(tempfile.mkdtemp())
+    original = (storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend)
+    storage_manager.base_dir, storage_manager.jobs_dir = tmp, tmp / "jobs"
+    storage_manager.backend = LocalBackend(tmp)
+    try:
+        job_dir = _make_job(storage_manager, "job")
+
+        def generate():
+            return asyncio.run(main.generate_pdf(
+                "job", mode="html", debug_overlay=False, overlay_scope="headings", background="raster",
+                engine="story", optimize=False, optimize_dpi=None, linearize=False
+            ))
+
+        assert generate()["cache"] == "miss"
+        pdf_to_markdown_with_assets(job_dir / "input.pdf", job_dir, workers=1)
+        render_all_debug_pages(job_dir, json.loads((job_dir / "vision.json").read_text()))
+        image_name = next(p.name for p in (job_dir / "md_assets").iterdir())
+        original_page = (job_dir / "pages" / "page_1.png").read_bytes()
+
+        report = collect_garbage(tmp / "jobs", dry_run=False, quota=0, min_age=0, now=time.time() + 30 * DAY)
+        assert {"page_images", "debug_pages", "render_html", "pdf_outputs", "md_images"} <= set(report["by_class"])
+        assert not (job_dir / "output.pdf").exists() and not (job_dir / "pages" / "page_1.png").exists()
+        assert (job_dir / "input.pdf").exists() and (job_dir / "layout.md").exists()
+
+        asyncio.run(main.get_page_image("job", 2))
+        assert (job_dir / "pages" / "page_1.png").read_bytes() == original_page
+        asyncio.run(main.get_debug_page_image("job", 1))
+        asyncio.run(main.get_render_html("job", self_contained=False))
+        asyncio.run(main.get_markdown_asset("job", image_name))
+        response = asyncio.run(main.get_job_result("job", mode=None))
+        assert response.headers["content-disposition"] == 'inline; filename="translated.pdf"'
+        assert (job_dir / "output.pdf").exists()
+        assert not (job_dir / RETENTION_RECORD).exists()
+
+        # The rebuilt PDF is recorded under the same key
+        assert generate()["cache"] == "hit"
+
+        # Handlers reading md_assets from disk restore collected images, under the recorded
+        # names even when an older extraction used another extension
+        legacy_name = f"{Path(image_name).stem}.jpg"
+        shutil.copyfile(job_dir / "md_assets" / image_name, job_dir / "md_assets" / legacy_name)
+        collect_garbage(tmp / "jobs", dry_run=False, quota=0, min_age=0, now=time.time() + 30 * DAY)
+        assert not (job_dir / "md_assets" / legacy_name).exists()
+        response = asyncio.run(main.preview_overlay("job", legacy_name))
+        assert asyncio.run(_read(response)).startswith(b"\x89PNG")
+        with Image.open(job_dir / "md_assets" / legacy_name) as image:
+            assert image.format == "JPEG"
+        assert (job_dir / "md_assets" / image_name).exists()
+        print("✓ Page, debug, HTML, asset and PDF requests rebuild collected artifacts")
+    finally:
+        storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend = original
+        storage_manager.sync_job_index()
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all retention tests."""
+    print("Retention Tests")
+    print("=" * 50)
+
+    test_ttl_quota_and_dry_run()
+    test_caches_are_collected_without_records()
+    test_collected_artifacts_are_rebuilt_on_request()
+
+    print("\n🎉 All retention tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
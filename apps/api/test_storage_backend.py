@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Test the storage backends and serving job files from a shared bucket."""
+
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from storage_backend import LocalBackend, S3Backend, backend_from_env
+
+
+class _ClientError(Exception):
+    """Shape of botocore's ClientError as far as the backend looks at it."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class InMemoryS3:
+    """MinIO-style stand-in: the subset of the S3 client API S3Backend uses."""
+
+    PAGE_SIZE = 2  # Small pages so listing has to follow continuation tokens
+
+    def __init__(self):
+        self.buckets = {}
+
+    def _bucket(self, name):
+        return self.buckets.setdefault(name, {})
+
+    def put_object(self, Bucket, Key, Body):
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        self._bucket(Bucket)[Key] = (data, datetime.now(timezone.utc))
+
+    @staticmethod
+    def _etag(data):
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    def get_object(self, Bucket, Key):
+        if Key not in self._bucket(Bucket):
+            raise _ClientError("NoSuchKey")
+        return {"Body": io.BytesIO(self._bucket(Bucket)[Key][0])}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self._bucket(Bucket):
+            raise _ClientError("404")
+        data, modified = self._bucket(Bucket)[Key]
+        return {"ContentLength": len(data), "LastModified": modified, "ETag": self._etag(data)}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        keys = sorted(k for k in self._bucket(Bucket) if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.PAGE_SIZE]
+        result = {"Contents": [
+            {"Key": k, "Size": len(self._bucket(Bucket)[k][0]), "LastModified": self._bucket(Bucket)[k][1],
+             "ETag": self._etag(self._bucket(Bucket)[k][0])}
+            for k in page
+        ], "IsTruncated": start + self.PAGE_SIZE < len(keys)}
+        if result["IsTruncated"]:
+            result["NextContinuationToken"] = str(start + self.PAGE_SIZE)
+        return result
+
+    def delete_object(self, Bucket, Key):
+        self._bucket(Bucket).pop(Key, None)
+
+
+def _check_backend(backend):
+    payload = bytes(range(256)) * 40
+    backend.put_stream("jobs/a/output.pdf", io.BytesIO(payload))
+    backend.put_stream("jobs/a/pages/page_1.png", io.BytesIO(b"png"))
+    backend.put_stream("jobs/a/pages/page_2.png", io.BytesIO(b"png2"))
+    backend.put_stream("jobs/b/job.json", io.BytesIO(b"{}"))
+
+    chunks = list(backend.get_stream("jobs/a/output.pdf", chunk_size=4096))
+    assert len(chunks) == 3 and b"".join(chunks) == payload
+    assert backend.stat("jobs/a/output.pdf").size == len(payload)
+    assert backend.exists("jobs/a/pages/page_1.png") and not backend.exists("jobs/a/missing.png")
+    assert [o.key for o in backend.list("jobs/a/")] == [
+        "jobs/a/output.pdf", "jobs/a/pages/page_1.png", "jobs/a/pages/page_2.png"
+    ]
+    assert [o.key for o in backend.list("jobs/a/pages/page_2")] == ["jobs/a/pages/page_2.png"]
+
+    assert backend.delete("jobs/a/output.pdf") and not backend.delete("jobs/a/output.pdf")
+    assert backend.stat("jobs/a/output.pdf") is None
+    try:
+        backend.get_stream("jobs/a/output.pdf")
+        assert False, "missing object must raise"
+    except FileNotFoundError:
+        pass
+
+
+def test_backends_share_one_contract():
+    """Local files and the S3 stand-in behave the same for put/get/stat/list/delete."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        _check_backend(LocalBackend(tmp))
+        assert LocalBackend(tmp).stat("../outside") is None
+        try:
+            LocalBackend(tmp).path("../outside")
+            assert False, "keys must stay inside the root"
+        except ValueError:
+            pass
+        _check_backend(S3Backend("bucket", prefix="translator", client=InMemoryS3()))
+        print("✓ LocalBackend and S3Backend: streaming reads, stat, paginated list, delete")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_backend_from_env():
+    """STORAGE_BACKEND selects the backend; bad settings fail loudly."""
+    saved = {name: os.environ.get(name) for name in ("STORAGE_BACKEND", "S3_BUCKET")}
+    try:
+        os.environ.pop("STORAGE_BACKEND", None)
+        assert isinstance(backend_from_env(Path("/tmp")), LocalBackend)
+        for name in ("ftp", "s3"):
+            os.environ["STORAGE_BACKEND"] = name
+            os.environ.pop("S3_BUCKET", None)
+            try:
+                backend_from_env(Path("/tmp"))
+                assert False, f"{name} must be rejected"
+            except ValueError:
+                pass
+        print("✓ Backend selection from the environment")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_second_node_serves_from_bucket():
+    """Node A publishes a job; node B, with an empty disk, loads and streams it."""
+    import main
+
+    storage_manager = main.storage_manager
+    tmp = Path(tempfile.mkdtemp())
+    bucket = InMemoryS3()
+    original = (storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend)
+    try:
+        # Node A: a job written locally is uploaded on save_job
+        storage_manager.base_dir, storage_manager.jobs_dir = tmp / "a", tmp / "a" / "jobs"
+        storage_manager.backend = S3Backend("jobs", client=bucket)
+        job_dir = storage_manager.jobs_dir / "shared"
+        (job_dir / "pages").mkdir(parents=True)
+        (job_dir / "pages" / "page_1.png").write_bytes(b"\x89PNG page one")
+        (job_dir / "output.pdf").write_bytes(b"%PDF-1.7 shared")
+        storage_manager.save_job("shared", {
+            "job_id": "shared", "status": "done", "output_path": str(job_dir / "output.pdf")
+        })
+        storage_manager.wait_for_publishes()
+        assert bucket.head_object(Bucket="jobs", Key="jobs/shared/output.pdf")["ContentLength"] == 15
+        assert storage_manager.publish_job("shared") == 0  # Nothing changed since
+
+        # Node B: nothing on disk; the job and its files come from the bucket
+        storage_manager.base_dir, storage_manager.jobs_dir = tmp / "b", tmp / "b" / "jobs"
+        assert storage_manager.job_exists("shared")
+        assert storage_manager.load_job("shared")["status"] == "done"
+
+        async def read(response):
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        response = asyncio.run(main.get_page_image("shared", 1))
+        assert asyncio.run(read(response)) == b"\x89PNG page one"
+        assert response.headers["content-length"] == "13"
+        response = asyncio.run(main.get_job_result("shared", mode=None))
+        assert asyncio.run(read(response)) == b"%PDF-1.7 shared"
+        print("✓ Job published by one node is loaded and streamed by another")
+    finally:
+        storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend = original
+        storage_manager.sync_job_index()
+        shutil.rmtree(tmp)
+
+
+class SlowS3(InMemoryS3):
+    """Uploads take a while, like a remote bucket."""
+
+    def put_object(self, Bucket, Key, Body):
+        time.sleep(0.3)
+        super().put_object(Bucket, Key, Body)
+
+
+def test_state_files_follow_other_nodes():
+    """Edits saved on one node reach another that already has the job; caches stay local."""
+    import main
+
+    storage_manager = main.storage_manager
+    tmp = Path(tempfile.mkdtemp())
+    bucket = SlowS3()
+    node_a, node_b = (tmp / "a", tmp / "a" / "jobs"), (tmp / "b", tmp / "b" / "jobs")
+    original = (storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend,
+                storage_manager.refresh_seconds)
+    try:
+        storage_manager.backend = S3Backend("jobs", client=bucket)
+        storage_manager.refresh_seconds = 0
+
+        # Node A: save_job returns before the upload finishes
+        storage_manager.base_dir, storage_manager.jobs_dir = node_a
+        job_dir = storage_manager.jobs_dir / "shared"
+        for rel_path in ("overlay_cache/raster-headings/page_1.abc.pdf", "markdown.html", "render.chunk1.html"):
+            (job_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            (job_dir / rel_path).write_text("scratch")
+        started = time.perf_counter()
+        storage_manager.save_job("shared", {"job_id": "shared", "status": "processing"})
+        assert time.perf_counter() - started < 0.3
+        storage_manager.wait_for_publishes()
+        assert [o.key for o in storage_manager.backend.list("jobs/shared/")] == ["jobs/shared/job.json"]
+        assert storage_manager.refresh_job("shared") == 0  # Own upload is not fetched back
+
+        # Node B loads the job
+        storage_manager.base_dir, storage_manager.jobs_dir = node_b
+        assert storage_manager.load_job("shared")["status"] == "processing"
+
+        # Node A finishes the job and saves edits
+        storage_manager.base_dir, storage_manager.jobs_dir = node_a
+        (job_dir / "edited.json").write_text('{"pages": []}')
+        storage_manager.save_ocr_translations("shared", {"page1_img1.png": {"boxes": []}})
+        storage_manager.save_job("shared", {"job_id": "shared", "status": "done"})
+        storage_manager.wait_for_publishes()
+
+        # Node B sees the new job.json and edit files
+        storage_manager.base_dir, storage_manager.jobs_dir = node_b
+        assert storage_manager.load_job("shared")["status"] == "done"
+        assert storage_manager.load_ocr_translations("shared") == {"page1_img1.png": {"boxes": []}}
+        assert (node_b[1] / "shared" / "edited.json").read_text() == '{"pages": []}'
+
+        # An edit made on node B and not uploaded yet is not overwritten
+        (node_b[1] / "shared" / "edited.json").write_text('{"pages": [1]}')
+        storage_manager.base_dir, storage_manager.jobs_dir = node_a
+        (job_dir / "edited.json").write_text('{"pages": [2]}')
+        storage_manager.publish_job("shared")
+        storage_manager.base_dir, storage_manager.jobs_dir = node_b
+        assert storage_manager.refresh_job("shared") == 0
+        assert (node_b[1] / "shared" / "edited.json").read_text() == '{"pages": [1]}'
+        print("✓ State files refreshed from other nodes; uploads in the background; caches stay local")
+    finally:
+        (storage_manager.base_dir, storage_manager.jobs_dir, storage_manager.backend,
+         storage_manager.refresh_seconds) = original
+        storage_manager.sync_job_index()
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all storage backend tests."""
+    print("Storage Backend Tests")
+    print("=" * 50)
+
+    test_backends_share_one_contract()
+    test_backend_from_env()
+    test_second_node_serves_from_bucket()
+    test_state_files_follow_other_nodes()
+
+    print("\n🎉 All storage backend tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Test the Chromium-free Story PDF engine and engine selection."""
+
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import pdf_generate
+from browser_pool import BrowserPoolBusy
+from html_render import write_vision_html
+from pdf_generate import render_html_file
+from story_pdf import html_file_to_pdf_bytes_story
+
+JOB_ID = "story-job"
+
+
+def _png(path: Path, width: int, height: int):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), 0)
+    pix.set_rect(pix.irect, (90, 140, 200))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pix.save(str(path))
+
+
+def test_vision_html_layout():
+    """Each vision page starts a PDF page with its image inside the @page margin."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        vision = {"pages": [
+            {"blocks": [{"type": "heading", "text": f"Глава {i}"}, {"type": "paragraph", "text": "Текст " * 40}]}
+            for i in (1, 2, 3)
+        ]}
+        for i in (1, 2, 3):
+            _png(tmp / "pages" / f"page_{i}.png", 300, 200)
+        html_path = tmp / "render.html"
+        write_vision_html(html_path, vision, "Doc", tmp)
+
+        start = time.perf_counter()
+        pdf_bytes = html_file_to_pdf_bytes_story(html_path)
+        elapsed = time.perf_counter() - start
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        # Page breaks follow each section; the footer comes after the last one, as in Chromium
+        assert doc.page_count == 4, doc.page_count
+        assert "Глава 2" in doc[1].get_text()
+        assert "Generated by PDF Translator" in doc[3].get_text()
+        rect = doc[0].get_image_rects(doc[0].get_images()[0][0])[0]
+        margin = 10 * 72 / 25.4
+        assert abs(rect.x0 - margin) < 1 and abs(rect.y0 - margin) < 100, rect
+        print(f"✓ {doc.page_count} pages laid out in {elapsed * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_markdown_overlays_assets_and_links():
+    """API asset URLs resolve to files, OCR overlays land on the image, anchors become links."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        job_dir = tmp / JOB_ID
+        _png(job_dir / "md_assets" / "fig 1.png", 400, 200)
+        html = f'''<!DOCTYPE html><html><head><style>body {{ margin: 20px; }}</style></head><body>
+<h1 id="intro">Intro</h1>
+<p><a href="#intro">Back to top</a> <a href="#missing">dangling</a></p>
+<div class="img-wrap" style="width:400px;height:200px">
+  <img class="img" src="http://localhost:8000/api/md-asset/{JOB_ID}/fig%201.png" style="width:400px;height:200px" />
+  <div class="ov" style="left:40px;top:20px;width:200px;height:40px;font-size:18px">
+Перевод &amp; текст
+</div>
+</div>
+</body></html>'''
+        html_path = job_dir / "markdown.html"
+        html_path.write_text(html, encoding="utf-8")
+
+        doc = fitz.open(stream=html_file_to_pdf_bytes_story(html_path, media="screen", job_id=JOB_ID, assets_dir=job_dir / "md_assets"), filetype="pdf")
+        page = doc[0]
+        img_rect = page.get_image_rects(page.get_images()[0][0])[0]
+        # 400 CSS px → 300 pt, as in Chromium
+        assert abs(img_rect.width - 300) < 1, img_rect
+
+        words = [w for w in page.get_text("words") if w[4] in ("Перевод", "&", "текст")]
+        assert len(words) == 3, page.get_text()
+        overlay = fitz.Rect(img_rect.x0 + 30, img_rect.y0 + 15, img_rect.x0 + 180, img_rect.y0 + 45)
+        assert all(fitz.Rect(w[:4]).intersects(overlay) for w in words)
+
+        links = page.get_links()
+        # Story emits one link rectangle per word; the dangling anchor is dropped
+        assert links and {link["kind"] for link in links} == {fitz.LINK_GOTO}, links
+        assert len({link["to"].y for link in links}) == 1
+        print(f"✓ Overlay drawn at {overlay}, internal link kept")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_auto_engine_falls_back_to_story():
+    """A failing Chromium render falls back in auto mode but not when requested explicitly."""
+    tmp = Path(tempfile.mkdtemp())
+    original = pdf_generate.html_file_to_pdf_bytes_async
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("All browser launch attempts failed")
+
+    async def busy(*args, **kwargs):
+        raise BrowserPoolBusy("busy")
+
+    try:
+        html_path = tmp / "doc.html"
+        html_path.write_text("<html><body><p>Hello</p></body></html>")
+        pdf_generate.html_file_to_pdf_bytes_async = broken
+
+        pdf_bytes, engine = asyncio.run(render_html_file(html_path, engine="auto"))
+        assert engine == "story" and pdf_bytes.startswith(b"%PDF")
+
+        for engine, error in (("chromium", RuntimeError), ("auto", BrowserPoolBusy)):
+            if error is BrowserPoolBusy:
+                pdf_generate.html_file_to_pdf_bytes_async = busy
+            try:
+                asyncio.run(render_html_file(html_path, engine=engine))
+                assert False, f"{engine} should raise {error.__name__}"
+            except error:
+                pass
+
+        try:
+            pdf_generate.resolve_engine("wkhtmltopdf")
+            assert False, "invalid engine accepted"
+        except ValueError:
+            pass
+        print("✓ auto → story fallback, explicit chromium and pool busy errors propagate")
+    finally:
+        pdf_generate.html_file_to_pdf_bytes_async = original
+        shutil.rmtree(tmp)
+
+
+def main():
+    """Run all Story engine tests."""
+    print("Story Engine Tests")
+    print("=" * 50)
+
+    test_vision_html_layout()
+    test_markdown_overlays_assets_and_links()
+    test_auto_engine_falls_back_to_story()
+
+    print("\n🎉 All Story engine tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Test font-metric text fitting used by the overlay generator."""
+
+import fitz  # PyMuPDF
+
+from text_fit import TextFitter, MAX_FONT_SIZE, MIN_FONT_SIZE, ELLIPSIS
+
+
+def test_fit_picks_largest_size_that_fits():
+    """Short text keeps the max size; long text shrinks but every line fits the width."""
+    fitter = TextFitter()
+    rect = fitz.Rect(0, 0, 200, 40)
+
+    size, lines = fitter.fit("Short heading", rect)
+    assert size == MAX_FONT_SIZE and lines == ["Short heading"]
+
+    text = "Перевод длинного абзаца, который не помещается в одну строку заголовка"
+    size, lines = fitter.fit(text, rect)
+    assert MIN_FONT_SIZE <= size < MAX_FONT_SIZE
+    assert len(lines) * size * fitter.line_height <= rect.height
+    assert all(fitter.text_length(line, size) <= rect.width for line in lines)
+    assert " ".join(lines) == text
+    print(f"✓ Long text fitted at {size}pt in {len(lines)} lines")
+
+
+def test_overflow_is_truncated():
+    """Text that does not fit at the minimum size is cut with an ellipsis."""
+    fitter = TextFitter()
+    rect = fitz.Rect(0, 0, 80, 10)
+    size, lines = fitter.fit("word " * 100, rect)
+    assert size == MIN_FONT_SIZE
+    assert len(lines) == 1 and lines[0].endswith(ELLIPSIS)
+    assert fitter.text_length(lines[0], size) <= rect.width
+    print(f"✓ Overflow truncated to {lines[0]!r}")
+
+
+def test_measurements_are_cached():
+    """Repeated fitting of the same text is served from the width cache."""
+    fitter = TextFitter()
+    rect = fitz.Rect(0, 0, 150, 30)
+    fitter.fit("Repeated caption text for cache check", rect)
+    misses = fitter.stats["misses"]
+    fitter.fit("Repeated caption text for cache check", rect)
+    assert fitter.stats["misses"] == misses
+    assert fitter.stats["hits"] > 0
+    print(f"✓ Cache stats: {fitter.stats}")
+
+
+def test_cyrillic_written_once_per_document():
+    """Cyrillic text is extractable and the font is embedded once for all pages."""
+    fitter = TextFitter()
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page(width=300, height=200)
+        fitter.write(page, [
+            (fitz.Rect(20, 20, 280, 60), f"Заголовок {i + 1}"),
+            (fitz.Rect(20, 80, 280, 140), "Подпись к рисунку"),
+        ])
+
+    assert "Заголовок 3" in doc[2].get_text()
+    assert "Подпись к рисунку" in doc[0].get_text()
+
+    font_xrefs = {font[0] for page in doc for font in page.get_fonts()}
+    assert len(font_xrefs) == 1, font_xrefs
+    doc.close()
+    print("✓ Cyrillic text written, font embedded once")
+
+
+def test_layout_written_later_matches_write():
+    """Runs fitted in one place and written elsewhere give the same text as write()."""
+    import json
+
+    placements = [(fitz.Rect(20, 20, 280, 60), "Заголовок из пула"), (fitz.Rect(20, 80, 120, 100), "Long caption " * 5)]
+    direct = fitz.open()
+    TextFitter().write(direct.new_page(width=300, height=200), placements)
+
+    # Runs survive a JSON round trip (cached next to the page, or sent from a worker)
+    runs = json.loads(json.dumps(TextFitter().layout(placements)))
+    later = fitz.open()
+    TextFitter().write_runs(later.new_page(width=300, height=200), runs)
+
+    assert later[0].get_text() == direct[0].get_text()
+    assert "Заголовок из пула" in later[0].get_text()
+    print(f"✓ {len(runs)} text runs fitted once, written into another document")
+
+
+def main():
+    """Run all text fitting tests."""
+    print("Text Fitting Tests")
+    print("=" * 50)
+
+    test_fit_picks_largest_size_that_fits()
+    test_overflow_is_truncated()
+    test_measurements_are_cached()
+    test_cyrillic_written_once_per_document()
+    test_layout_written_later_matches_write()
+
+    print("\n🎉 All text fitting tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
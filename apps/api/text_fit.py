@@ -0,0 +1,241 @@
+"""Font-metric text fitting for overlay boxes.
+
+Text is measured with font metrics, wrapped and the font size is chosen by
+binary search before anything is written, so each page is written once.
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+MAX_FONT_SIZE = 12.0
+MIN_FONT_SIZE = 6.0
+FONT_SIZE_STEP = 0.5
+TEXT_INSET = 2          # Inset of the text area inside the block rect, in points
+ELLIPSIS = "..."
+
+# Unicode fonts with Cyrillic coverage, tried in order when OVERLAY_FONT_FILE is not set
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+]
+FALLBACK_FONT = "helv"  # Base-14 Helvetica, Latin only
+
+
+def find_overlay_font() -> Optional[Path]:
+    """Return the font file for overlay text (OVERLAY_FONT_FILE env or first installed candidate)."""
+    configured = os.getenv("OVERLAY_FONT_FILE")
+    if configured:
+        path = Path(configured)
+        if path.exists():
+            return path
+        logger.warning(f"OVERLAY_FONT_FILE not found: {configured}")
+    for candidate in FONT_CANDIDATES:
+        path = Path(candidate)
+        if path.exists():
+            return path
+    return None
+
+
+def load_overlay_font(font_file: Optional[Path] = None) -> fitz.Font:
+    """Load the overlay font, falling back to Helvetica when no Unicode font is installed."""
+    font_file = font_file or find_overlay_font()
+    if font_file is not None:
+        try:
+            return fitz.Font(fontfile=str(font_file))
+        except Exception as e:
+            logger.warning(f"Failed to load overlay font {font_file}: {e}")
+    logger.warning("No Unicode font found for overlay text, using Helvetica (no Cyrillic)")
+    return fitz.Font(FALLBACK_FONT)
+
+
+class TextFitter:
+    """
+    Fit text into rectangles using font metrics.
+
+    One instance is used per output document: the font is loaded once and
+    embedded once, and word widths are cached per (font, size, text).
+    """
+
+    def __init__(self, font: Optional[fitz.Font] = None, line_height: Optional[float] = None):
+        """
+        Args:
+            font: Font used for measuring and writing (default: load_overlay_font())
+            line_height: Line advance as a multiple of font size (default: font ascender - descender)
+        """
+        self.font = font or load_overlay_font()
+        self.line_height = line_height or max(1.0, self.font.ascender - self.font.descender)
+        self._widths: Dict[Tuple[str, float, str], float] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def text_length(self, text: str, fontsize: float) -> float:
+        """Width of text in points at fontsize (cached)."""
+        key = (self.font.name, fontsize, text)
+        width = self._widths.get(key)
+        if width is not None:
+            self.stats["hits"] += 1
+            return width
+        self.stats["misses"] += 1
+        width = self.font.text_length(text, fontsize=fontsize)
+        self._widths[key] = width
+        return width
+
+    def _split_long_word(self, word: str, fontsize: float, max_width: float) -> List[str]:
+        """Break a word that is wider than the line into character chunks."""
+        parts = []
+        current = ""
+        for ch in word:
+            if current and self.text_length(current + ch, fontsize) > max_width:
+                parts.append(current)
+                current = ch
+            else:
+                current += ch
+        if current:
+            parts.append(current)
+        return parts
+
+    def wrap(self, text: str, fontsize: float, max_width: float) -> List[str]:
+        """
+        Greedy word wrap by measured widths.
+
+        Args:
+            text: Text to wrap (newlines start new lines)
+            fontsize: Font size in points
+            max_width: Available line width in points
+
+        Returns:
+            List of lines
+        """
+        space = self.text_length(" ", fontsize)
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            line_width = 0.0
+            for word in paragraph.split():
+                word_width = self.text_length(word, fontsize)
+                if word_width > max_width:
+                    chunks = self._split_long_word(word, fontsize, max_width)
+                else:
+                    chunks = [word]
+                for chunk in chunks:
+                    chunk_width = word_width if len(chunks) == 1 else self.text_length(chunk, fontsize)
+                    if line and line_width + space + chunk_width <= max_width:
+                        line += " " + chunk
+                        line_width += space + chunk_width
+                    else:
+                        if line:
+                            lines.append(line)
+                        line = chunk
+                        line_width = chunk_width
+            lines.append(line)
+        return lines
+
+    def _max_lines(self, fontsize: float, height: float) -> int:
+        return int(height // (fontsize * self.line_height))
+
+    def fit(self, text: str, rect: fitz.Rect) -> Tuple[float, List[str]]:
+        """
+        Choose the largest font size at which the text fits into rect.
+
+        Font sizes from MIN_FONT_SIZE to MAX_FONT_SIZE in FONT_SIZE_STEP steps
+        are binary-searched. If the text does not fit even at the minimum
+        size it is truncated with an ellipsis.
+
+        Args:
+            text: Text to place
+            rect: Target rectangle (already inset)
+
+        Returns:
+            Tuple of (font size, lines)
+        """
+        steps = int(round((MAX_FONT_SIZE - MIN_FONT_SIZE) / FONT_SIZE_STEP))
+        lo, hi = 0, steps
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            size = MIN_FONT_SIZE + mid * FONT_SIZE_STEP
+            lines = self.wrap(text, size, rect.width)
+            if len(lines) <= self._max_lines(size, rect.height):
+                best = (size, lines)
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        if best is not None:
+            return best
+
+        size = MIN_FONT_SIZE
+        lines = self.wrap(text, size, rect.width)
+        max_lines = max(1, self._max_lines(size, rect.height))
+        lines = lines[:max_lines]
+        last = lines[-1]
+        while last and self.text_length(last + ELLIPSIS, size) > rect.width:
+            last = last[:-1]
+        lines[-1] = last.rstrip() + ELLIPSIS
+        return size, lines
+
+    def layout(self, placements: List[Tuple[fitz.Rect, str]]) -> List[list]:
+        """
+        Fit every (rect, text) pair into text runs without writing anything.
+
+        Args:
+            placements: Rectangles and their replacement text
+
+        Returns:
+            Runs [x, baseline_y, fontsize, line] in points (JSON-serializable,
+            so pages rendered elsewhere can be written into one document later)
+        """
+        runs = []
+        for rect, text in placements:
+            inset_rect = fitz.Rect(
+                rect.x0 + TEXT_INSET,
+                rect.y0 + TEXT_INSET,
+                rect.x1 - TEXT_INSET,
+                rect.y1 - TEXT_INSET
+            )
+            if inset_rect.is_empty:
+                continue
+            size, lines = self.fit(text, inset_rect)
+            baseline = inset_rect.y0 + self.font.ascender * size
+            for line in lines:
+                if line:
+                    runs.append([inset_rect.x0, baseline, size, line])
+                baseline += size * self.line_height
+        return runs
+
+    def write_runs(self, page: fitz.Page, runs: List[list], color=(0, 0, 0)) -> None:
+        """
+        Write runs produced by layout() to the page in one go.
+
+        Args:
+            page: Target page
+            runs: [x, baseline_y, fontsize, line] entries
+            color: Text color (RGB 0..1)
+        """
+        if not runs:
+            return
+        writer = fitz.TextWriter(page.rect)
+        for x, y, size, line in runs:
+            writer.append(fitz.Point(x, y), line, font=self.font, fontsize=size)
+        writer.write_text(page, color=color)
+
+    def write(self, page: fitz.Page, placements: List[Tuple[fitz.Rect, str]], color=(0, 0, 0)) -> None:
+        """
+        Fit every (rect, text) pair and write them to the page in one go.
+
+        Args:
+            page: Target page
+            placements: Rectangles and their replacement text
+            color: Text color (RGB 0..1)
+        """
+        self.write_runs(page, self.layout(placements), color=color)